@@ -19,7 +19,7 @@ Usage::
 __version__ = '1.2.3'
 
 from . import interfaces, currency, validation
-from .validation import validate
+from .validation import validate, validate_many
 from .currency import Currency
 from .validation import ValidatorBase, Base58CheckValidator, EthereumValidator, EosValidator, StellarValidator
 
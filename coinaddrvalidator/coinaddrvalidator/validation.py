@@ -36,6 +36,40 @@ from . import currency
 from coinaddrvalidator.attrs_zope import provides
 
 
+# Bounds for the memoized decoders and for the batch validation results.
+DECODE_CACHE_SIZE = 4096
+RESULT_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _memoized_b58decode(address, charset=None):
+    """Decode a base58 address, return None if it is not decodable."""
+    extras = {'charset': charset} if charset else {}
+    try:
+        return base58check.b58decode(address, **extras)
+    except ValueError:
+        return None
+
+
+def b58decode(address, **extras):
+    """Memoized drop-in for :func:`base58check.b58decode`.
+
+    Validity, network and address type checks of the same request all decode
+    the address, so the decoded payload is shared between them.
+    """
+    decoded = _memoized_b58decode(address, extras.get('charset'))
+    if decoded is None:
+        raise ValueError('Invalid base58 address')
+    return decoded
+
+
+@functools.lru_cache(maxsize=DECODE_CACHE_SIZE)
+def bech32_decode(address):
+    """Memoized :func:`bech32.bech32_decode` returning an immutable payload."""
+    hrp, data = bech32.bech32_decode(address.decode('utf-8'))
+    return hrp, tuple(data) if data is not None else None
+
+
 @provider(INamedSubclassContainer)
 class Validators(metaclass=NamedSubclassContainerBase):
     """Container for all validators."""
@@ -91,7 +125,7 @@ class GRSValidator(ValidatorBase):
         if len(self.request.address) != 34:
             return False
         try:
-            decoded = base58check.b58decode(self.request.address)
+            decoded = b58decode(self.request.address)
         except ValueError:
             return False
 
@@ -123,7 +157,7 @@ class Bech32CheckValidator(ValidatorBase):
     name = 'Bech32Check'
 
     def validate(self):
-        decoded_address = bech32.bech32_decode(self.request.address.decode('utf-8'))
+        decoded_address = bech32_decode(self.request.address)
         data = decoded_address[1]
 
         if self.network == "":
@@ -139,7 +173,7 @@ class Bech32CheckValidator(ValidatorBase):
 
     @property
     def network(self):
-        decoded_address = bech32.bech32_decode(self.request.address.decode('utf-8'))
+        decoded_address = bech32_decode(self.request.address)
         hrp = decoded_address[0]
 
         for name, networks in self.request.currency.networks.items():
@@ -158,7 +192,7 @@ class CosmosValidator(ValidatorBase):
     hrp_table = ("cosmos","cosmospub","cosmosvalcons","cosmosvalconspub","cosmosvaloper","cosmosvaloperpub")
 
     def validate(self):
-        decoded_address = bech32.bech32_decode(self.request.address.decode('utf-8'))
+        decoded_address = bech32_decode(self.request.address)
         hrp = decoded_address[0]
         data = decoded_address[1]
 
@@ -198,7 +232,7 @@ class CosmosValidator(ValidatorBase):
         if len(self.request.address) == 0:
             return ""
 
-        decoded_address = bech32.bech32_decode(self.request.address.decode('utf-8'))
+        decoded_address = bech32_decode(self.request.address)
         hrp = decoded_address[0]
 
         if hrp not in self.hrp_table:
@@ -227,7 +261,7 @@ class Base58CheckValidator(ValidatorBase):
             return False
 
         try:
-            abytes = base58check.b58decode(
+            abytes = b58decode(
                 self.request.address, **self.request.extras)
         except ValueError:
             return False
@@ -294,7 +328,7 @@ class Base58CheckValidator(ValidatorBase):
     def network(self):
         """Return network derived from network version bytes."""
         try:
-            abytes = base58check.b58decode(
+            abytes = b58decode(
                 self.request.address, **self.request.extras)
         except ValueError:
             return ''
@@ -311,7 +345,7 @@ class Base58CheckValidator(ValidatorBase):
         if len(self.request.address) == 0:
             return ''
         try:
-            abytes = base58check.b58decode(
+            abytes = b58decode(
                 self.request.address, **self.request.extras)
         except ValueError:
             return ''
@@ -346,7 +380,7 @@ class DecredValidator(Base58CheckValidator):
             return self.validate_extended(checksum_algo='blake256')
 
         try:
-            decoded_address = base58check.b58decode(self.request.address)
+            decoded_address = b58decode(self.request.address)
         except ValueError:
             return False
 
@@ -383,7 +417,7 @@ class CardanoValidator(Base58CheckValidator):
 
     def validate(self):
         try:
-            decoded_address = base58check.b58decode(self.request.address)
+            decoded_address = b58decode(self.request.address)
         except ValueError:
             return False
 
@@ -717,15 +751,58 @@ def validate(currency_name, address, default_valid=True):
         request = ValidationRequest(currency_name, address)
         return request.execute()
     else:
-        return ValidationResult(
-            name='',
-            ticker=currency_name,
-            address=address if isinstance(address, bytes) else address.encode('utf-8'),
-            valid=default_valid,
-            network='',
-            address_type='address',
-            is_extended=False
-            )
+        return _unsupported_result(currency_name, address, default_valid)
+
+
+def validate_many(currency_name, addresses, default_valid=True):
+    """Validate a batch of addresses of the same currency.
+
+    The currency is resolved once for the whole batch and results are kept in
+    a bounded LRU cache, so repeated addresses are only decoded and checked
+    once across calls.
+
+    :param currency_name str: The name or ticker code of the cryptocurrency.
+    :param addresses iterable: The (bytes, str) crytocurrency addresses to validate.
+    :param default_valid (bool): The default value for validation if network does not supported.
+    :return: a list of populated ValidationResult objects, in input order
+    :rtype: list
+
+    Usage::
+
+      >>> import coinaddr
+      >>> coinaddr.validate_many('btc', [b'1BoatSLRHtKNngkdXEeobR76b53LETtpyT'])
+      [ValidationResult(name='bitcoin', ticker='btc',
+      ...               address=b'1BoatSLRHtKNngkdXEeobR76b53LETtpyT',
+      ...               valid=True, network='main')]
+
+    """
+    currency_name = currency_name.lower()
+    curr = currency.Currencies.get(currency_name)
+    if curr is None:
+        return [_unsupported_result(currency_name, address, default_valid) for address in addresses]
+    return [_execute_cached(curr, address) for address in addresses]
+
+
+@functools.lru_cache(maxsize=RESULT_CACHE_SIZE)
+def _execute_cached(curr, address):
+    """Execute a validation request, keyed by currency instance and address.
+
+    Keying by the instance rather than its name keeps overridden currencies
+    from being served stale results.
+    """
+    return ValidationRequest(curr.name, address).execute()
+
+
+def _unsupported_result(currency_name, address, default_valid):
+    return ValidationResult(
+        name='',
+        ticker=currency_name,
+        address=address if isinstance(address, bytes) else address.encode('utf-8'),
+        valid=default_valid,
+        network='',
+        address_type='address',
+        is_extended=False
+        )
 
 def prefixtodec(prefix):
     total = 0
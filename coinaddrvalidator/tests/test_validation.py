@@ -1,11 +1,13 @@
 import unittest
 
+import attr
+
 from coinaddrvalidator.interfaces import (
     INamedSubclassContainer, IValidator, IValidationRequest, IValidationResult
     )
 from coinaddrvalidator.validation import (
     Validators, ValidatorBase, ValidationRequest, ValidationResult,
-    Base58CheckValidator, EthereumValidator, validate
+    Base58CheckValidator, EthereumValidator, validate, validate_many
     )
 
 
@@ -47,5 +49,26 @@ class TestValidation(unittest.TestCase):
         result = validate("BTC", "12nMGd6bzC8UpyWjd9HeZESZheZ8arttAb", default_valid=False)
         self.assertTrue(result.valid)
 
+    def test_validate_many(self):
+        addresses = [
+            b'12nMGd6bzC8UpyWjd9HeZESZheZ8arttAb',
+            'bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq',
+            b'not_an_address',
+            b'12nMGd6bzC8UpyWjd9HeZESZheZ8arttAb',
+        ]
+        results = validate_many('BTC', addresses)
+        self.assertEqual(len(results), 4)
+        for address, result in zip(addresses, results):
+            with self.subTest(address=address):
+                self.assertEqual(attr.astuple(result), attr.astuple(validate('btc', address)))
+        self.assertEqual([r.valid for r in results], [True, True, False, True])
+        self.assertEqual(results[1].network, 'main')
+
+    def test_validate_many_unsupported_currency(self):
+        results = validate_many('FTM', ['0x12341', b'0x12342'], default_valid=False)
+        self.assertEqual([r.valid for r in results], [False, False])
+        self.assertEqual([r.address for r in results], [b'0x12341', b'0x12342'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,15 +1,17 @@
 import contextlib
+import logging
 from functools import wraps
 from time import time
 
 import jwt
+from django.conf import settings
 from django.http import HttpRequest, HttpResponse
 from ipware import get_client_ip
 from rest_framework.authentication import get_authorization_header
 from rest_framework.request import Request
 
 from exchange.base.logging import report_exception
-from exchange.base.logstash_logging.loggers import logstash_logger
+from exchange.base.logstash_logging.loggers import api_log_buffer, logstash_handler, logstash_logger
 
 
 def log_api(*, is_internal=False):
@@ -18,7 +20,7 @@ def log_api(*, is_internal=False):
 
     This decorator wraps a view function to log details about incoming API requests and responses,
     including the request path, method, source IP, processing time, and response status. The log is
-    sent to a message broker using the `log_to_broker` function.
+    sent to logstash, through an in-memory buffer shipped in background if `ASYNC_API_LOGGING` is set.
 
     This decorator will inject api_log into the request object, so you can add thing into extras in the body of api.
 
@@ -56,6 +58,9 @@ def log_api(*, is_internal=False):
             log['process_time'] = round((time() - start_time) * 1000)
             log['status'] = str(response.status_code)
 
+            if settings.ASYNC_API_LOGGING and not logstash_handler.is_enabled:
+                return response
+
             with contextlib.suppress(Exception):
                 log['src_service'] = jwt.decode(
                     get_authorization_header(request).split()[1].decode(),
@@ -63,7 +68,11 @@ def log_api(*, is_internal=False):
                 )['service']
 
             try:
-                logstash_logger.info('%s %s', method, path, extra={'params': log, 'index_name': 'api_logger'})
+                extra = {'params': log, 'index_name': 'api_logger'}
+                if settings.ASYNC_API_LOGGING:
+                    api_log_buffer.push(logging.INFO, '%s %s', (method, path), extra)
+                else:
+                    logstash_logger.info('%s %s', method, path, extra=extra)
             except:  # noqa: BLE001
                 report_exception()
 
@@ -27,3 +27,17 @@ class Locker:
                 f'SELECT {lock_function}(%s, %s)',
                 [lock_type, lock_id],
             )
+
+    @classmethod
+    def require_locks(cls, lock_type, lock_ids, shared=False):
+        """Get exclusive PostgreSQL transaction-level advisory locks for many ids, in a deterministic order."""
+        lock_ids = sorted(set(lock_ids))
+        if not lock_ids:
+            return
+        lock_type = getattr(cls.LOCKS, lock_type, deterministic_hash(lock_type) % 2**30)
+        lock_function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {lock_function}(%s, lock_id) FROM (SELECT unnest(%s::int[]) AS lock_id ORDER BY 1) AS ids',
+                [lock_type, lock_ids],
+            )
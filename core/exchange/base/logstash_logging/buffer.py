@@ -0,0 +1,65 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+class LogBuffer:
+    """
+    Bounded in-memory buffer of log records, shipped to a logger by a background thread.
+
+    Request threads only append a tuple to a ring buffer, and formatting and handing records to
+    the logger's handlers is done by a daemon thread every `flush_interval` seconds. When the
+    buffer is full, oldest records are dropped and counted in `dropped`, so a slow or stuck
+    shipper never blocks request threads or grows memory.
+
+    The shipper thread is started lazily, and restarted after fork in worker processes.
+    """
+
+    def __init__(self, logger: logging.Logger, max_size: int = 10_000, flush_interval: float = 1.0):
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._records: Deque[Tuple[int, str, tuple, Dict[str, Any]]] = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+        self._shipper_pid: Optional[int] = None
+
+    def push(self, level: int, msg: str, args: tuple = (), extra: Optional[Dict[str, Any]] = None) -> None:
+        """Add a log record to the buffer, dropping the oldest one if the buffer is full"""
+        if self._shipper_pid != os.getpid():
+            self._start_shipper()
+        if len(self._records) == self._records.maxlen:
+            self.dropped += 1
+        self._records.append((level, msg, args, extra or {}))
+
+    def flush(self) -> int:
+        """Ship all buffered records to the logger, returning the number of shipped records"""
+        count = 0
+        while True:
+            try:
+                level, msg, args, extra = self._records.popleft()
+            except IndexError:
+                return count
+            self.logger.log(level, msg, *args, extra=extra)
+            count += 1
+
+    def _start_shipper(self) -> None:
+        with self._lock:
+            pid = os.getpid()
+            if self._shipper_pid == pid:
+                return
+            thread = threading.Thread(target=self._run_shipper, name='log-buffer-shipper', daemon=True)
+            thread.start()
+            self._shipper_pid = pid
+
+    def _run_shipper(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                from exchange.base.logging import report_exception
+
+                report_exception()
@@ -1,4 +1,5 @@
 import logging
+import time
 from urllib.parse import urlparse, urlunparse
 
 from django.conf import settings
@@ -6,6 +7,8 @@ from logstash_async.formatter import LogstashFormatter
 from logstash_async.handler import AsynchronousLogstashHandler
 from logstash_async.transport import HttpTransport
 
+from exchange.base.logstash_logging.buffer import LogBuffer
+
 
 class CustomHttpTransport(HttpTransport):
     @property
@@ -27,7 +30,11 @@ class CustomHttpTransport(HttpTransport):
         return urlunparse(updated_url)
 
 class CustomAsynchronousLogstashHandler(AsynchronousLogstashHandler):
+    ENABLED_CHECK_INTERVAL = 10  # seconds
+
     _settings = None
+    _is_enabled = None
+    _enabled_checked_at = 0.0
 
     def emit(self, record):
         if self.is_enabled:
@@ -35,12 +42,21 @@ class CustomAsynchronousLogstashHandler(AsynchronousLogstashHandler):
 
     @property
     def is_enabled(self):
+        """Whether logstash logging is enabled, re-read from settings at most once per check interval"""
+        now = time.monotonic()
+        if self._is_enabled is not None and now - self._enabled_checked_at < self.ENABLED_CHECK_INTERVAL:
+            return self._is_enabled
+
         if self._settings is None:
             from exchange.base.models import Settings
 
             self.__class__._settings = Settings
 
-        return self._settings.get_value('is_enabled_logstash_logger', default='false').strip().lower() == 'true'
+        self._is_enabled = (
+            self._settings.get_value('is_enabled_logstash_logger', default='false').strip().lower() == 'true'
+        )
+        self._enabled_checked_at = now
+        return self._is_enabled
 
 
 log_level = logging.INFO
@@ -71,3 +87,5 @@ logstash_handler = CustomAsynchronousLogstashHandler(
 logstash_formatter = LogstashFormatter(extra={'env': settings.ENV})
 logstash_handler.setFormatter(logstash_formatter)
 logstash_logger.addHandler(logstash_handler)
+
+api_log_buffer = LogBuffer(logstash_logger)
@@ -13,6 +13,7 @@ from model_utils import Choices
 from exchange.base.config import EXPLORER_URLS
 from exchange.base.http import get_client_country
 from exchange.base.logstash_logging.mixin import LogModelMixin
+from exchange.base.settings_snapshot import SettingsSnapshot
 
 # noinspection PyUnresolvedReferences
 from exchange.config.config.derived_data import (  # noqa: F401  # pylint: disable=unused-import
@@ -392,6 +393,15 @@ class Settings(models.Model):
         verbose_name = 'تنظیمات سیستم'
         verbose_name_plural = verbose_name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        SettingsSnapshot.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        SettingsSnapshot.invalidate()
+        return result
+
     @classmethod
     def is_cacheable(cls, key: str) -> bool:
         for prefix in cls.CACHEABLE_PREFIXES:
@@ -402,6 +412,10 @@ class Settings(models.Model):
 
     @classmethod
     def get(cls, key, default=None):
+        snapshot = SettingsSnapshot.get_values()
+        if snapshot is not None and key in snapshot:
+            return snapshot[key]
+
         is_cacheable = cls.is_cacheable(key)
 
         if is_cacheable:
@@ -421,6 +435,10 @@ class Settings(models.Model):
     def get_many(cls, keys: List[str], default=None) -> Dict[str, str]:
         from exchange.base.logging import report_exception
 
+        snapshot = SettingsSnapshot.get_values()
+        if snapshot is not None and all(key in snapshot for key in keys):
+            return {key: snapshot[key] for key in keys}
+
         cacheable_keys = [key for key in keys if cls.is_cacheable(key)]
 
         cache_keys = [f'setting_{key}' for key in cacheable_keys]
@@ -439,6 +457,8 @@ class Settings(models.Model):
                 cls.objects.bulk_create(missing_instances, ignore_conflicts=True)
             except InternalError:
                 report_exception()
+            else:
+                SettingsSnapshot.invalidate()
             setting_instances += missing_instances
 
         to_be_cached_settings = {
@@ -463,6 +483,9 @@ class Settings(models.Model):
 
     @classmethod
     def get_value(cls, key, default=None):
+        snapshot = SettingsSnapshot.get_values()
+        if snapshot is not None and key in snapshot:
+            return snapshot[key]
         cache_settings = cls.RELATED_CACHE_KEYS.get(key)
         if cache_settings:
             cached_value = cache.get(cache_settings[0])
@@ -546,6 +569,8 @@ class Settings(models.Model):
                 key=key,
                 value=json.dumps(value),
             )
+        else:
+            SettingsSnapshot.invalidate()
 
     @classmethod
     def get_dict(cls, key):
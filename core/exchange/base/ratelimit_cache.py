@@ -0,0 +1,245 @@
+""" Cache backend for rate limit counters with local buckets and batched sync """
+import functools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from exchange.base.logging import report_exception
+
+_key_limits = threading.local()
+
+
+def set_key_limit(key: str, limit: int) -> None:
+    """Set the limit of the rate limit key that is going to be counted in this thread"""
+    _key_limits.key = key
+    _key_limits.limit = limit
+
+
+def get_key_limit(key: str) -> Optional[int]:
+    if getattr(_key_limits, 'key', None) != key:
+        return None
+    return _key_limits.limit
+
+
+def track_ratelimit_limits() -> None:
+    """Set limits of keys made by django_ratelimit, which only passes keys to the cache"""
+    from django_ratelimit import core
+
+    make_cache_key = core._make_cache_key
+    if getattr(make_cache_key, 'sets_key_limit', False):
+        return
+
+    @functools.wraps(make_cache_key)
+    def _make_cache_key(group, window, rate, value, methods):
+        key = make_cache_key(group, window, rate, value, methods)
+        set_key_limit(key, core._split_rate(rate)[0])
+        return key
+
+    _make_cache_key.sets_key_limit = True
+    core._make_cache_key = _make_cache_key
+
+
+class _Bucket:
+    __slots__ = ('synced', 'pending', 'in_flight', 'expires_at', 'touched')
+
+    def __init__(self, pending: int, expires_at: float):
+        self.synced = 0
+        self.pending = pending
+        # Part of pending hits being pushed, so concurrent pushes do not send them again
+        self.in_flight = 0
+        self.expires_at = expires_at
+        self.touched = True
+
+    @property
+    def count(self) -> int:
+        return self.synced + self.pending
+
+
+class BatchedRateLimitCache(BaseCache):
+    """Rate limit counters kept in process and reconciled with a shared cache in batches
+
+    This backend is meant to be used as `RATELIMIT_USE_CACHE`, so `django_ratelimit` decorators
+    work unchanged. Counters are served from local buckets, and increments are pushed to the
+    shared Redis cache (`TARGET_CACHE` option) in a single pipeline every `SYNC_INTERVAL`
+    seconds, or sooner when a bucket has `MAX_PENDING` unsynced hits. Each sync also refreshes
+    local counts with hits of other processes, so a limit may be exceeded by at most about
+    `MAX_PENDING` hits per process during a sync interval. Keys are passed to the shared
+    cache as is, so key versions are ignored by this backend.
+
+    Hits are only buffered while they are more than `DIRECT_MARGIN` hits below the limit of
+    their key, which is set by `django_ratelimit` when making the key. Within the margin, or if
+    the limit is unknown, each hit is added to the shared cache directly and the global count
+    is returned, so limits are enforced exactly near their edge and small rates, including all
+    auth and OTP limits, are never exceeded. Hits whose sync fails are kept and sent again with
+    the next sync.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.target_alias = options.get('TARGET_CACHE', location or 'default')
+        self.sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        self.max_pending = options.get('MAX_PENDING', 5)
+        self.direct_margin = options.get('DIRECT_MARGIN', 20)
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = time.monotonic()
+        track_ratelimit_limits()
+
+    @property
+    def target(self) -> BaseCache:
+        return caches[self.target_alias]
+
+    def _get_timeout(self, timeout) -> int:
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return int(timeout or 0) or 60
+
+    def _get_bucket(self, key: str, now: float) -> Optional[_Bucket]:
+        bucket = self._buckets.get(key)
+        if bucket and bucket.expires_at <= now:
+            del self._buckets[key]
+            return None
+        return bucket
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._get_timeout(timeout)
+        now = time.monotonic()
+        with self._lock:
+            if self._get_bucket(key, now):
+                return False
+        # Shared counters are created directly, so only the first hit of a window in all processes is added
+        try:
+            added = self.target.add(key, int(value), timeout)
+        except Exception:  # noqa: BLE001 - rate limits should fail open
+            report_exception()
+            added = None
+        with self._lock:
+            if not self._get_bucket(key, now):
+                bucket = self._buckets[key] = _Bucket(0, now + timeout)
+                if added is None:
+                    # Counted locally until the next sync
+                    bucket.pending = int(value)
+                else:
+                    bucket.synced = int(value) if added else 0
+                    bucket.touched = False
+        return added is not False
+
+    def incr(self, key, delta=1, version=None):
+        now = time.monotonic()
+        limit = get_key_limit(key)
+        with self._lock:
+            bucket = self._get_bucket(key, now)
+            if bucket is None:
+                raise ValueError(f"Key '{key}' not found")
+            bucket.pending += delta
+            bucket.touched = True
+            count = bucket.count
+            direct = limit is None or count > limit - self.direct_margin
+            force = bucket.pending >= self.max_pending
+        if direct:
+            return self._push_bucket(key, bucket, now)
+        self._maybe_sync(now, force=force)
+        return count
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            bucket = self._get_bucket(key, time.monotonic())
+            return bucket.count if bucket else default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._get_timeout(timeout)
+        with self._lock:
+            self._buckets.pop(key, None)
+        self.target.set(key, value, timeout)
+
+    def delete(self, key, version=None):
+        with self._lock:
+            deleted = self._buckets.pop(key, None) is not None
+        return self.target.delete(key) or deleted
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def _maybe_sync(self, now: float, force: bool = False) -> None:
+        if not force and now - self._synced_at < self.sync_interval:
+            return
+        # Only one thread syncs at a time, others keep serving local counts meanwhile
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self.sync(now)
+        except Exception:  # noqa: BLE001 - rate limits should fail open
+            report_exception()
+        finally:
+            self._sync_lock.release()
+
+    def sync(self, now: Optional[float] = None) -> None:
+        """Push pending hits of recently touched buckets and pull their global counts"""
+        now = time.monotonic() if now is None else now
+        self._synced_at = now
+        with self._lock:
+            for key in [key for key, bucket in self._buckets.items() if bucket.expires_at <= now]:
+                del self._buckets[key]
+            batch = [(key, bucket) for key, bucket in self._buckets.items() if bucket.touched]
+        if batch:
+            self._push_buckets(batch, now)
+
+    def _push_bucket(self, key: str, bucket: _Bucket, now: float) -> int:
+        """Push pending hits of a bucket right away, returning its global count"""
+        try:
+            self._push_buckets([(key, bucket)], now)
+        except Exception:  # noqa: BLE001 - rate limits should fail open
+            report_exception()
+        with self._lock:
+            return bucket.count
+
+    def _push_buckets(self, buckets: List[Tuple[str, _Bucket]], now: float) -> None:
+        with self._lock:
+            batch = []
+            for key, bucket in buckets:
+                delta = bucket.pending - bucket.in_flight
+                bucket.in_flight += delta
+                bucket.touched = False
+                batch.append((key, delta, max(int(bucket.expires_at - now), 1)))
+
+        try:
+            counts = self._push(batch)
+        except Exception:
+            # Pending hits are kept, to be sent with the next sync
+            with self._lock:
+                for (_, bucket), (_, delta, _) in zip(buckets, batch):
+                    bucket.in_flight -= delta
+                    bucket.touched = True
+            raise
+
+        with self._lock:
+            for (_, bucket), (_, delta, _), count in zip(buckets, batch, counts):
+                bucket.in_flight -= delta
+                bucket.pending -= delta
+                bucket.synced = max(bucket.synced, count - bucket.in_flight)
+
+    def _push(self, batch: List[Tuple[str, int, int]]) -> List[int]:
+        """Add pending hits to shared counters, returning updated global counts"""
+        target = self.target
+        get_client = getattr(getattr(target, 'client', None), 'get_client', None)
+        if get_client is None:
+            # Non-redis caches, mainly used in tests
+            counts = []
+            for key, delta, timeout in batch:
+                target.add(key, 0, timeout)
+                counts.append(target.incr(key, delta) if delta else target.get(key, 0))
+            return counts
+
+        pipeline = get_client(write=True).pipeline(transaction=False)
+        for key, delta, timeout in batch:
+            redis_key = target.make_key(key)
+            pipeline.set(redis_key, 0, ex=timeout, nx=True)
+            pipeline.incrby(redis_key, delta)
+        results = pipeline.execute()
+        return [int(count) for count in results[1::2]]
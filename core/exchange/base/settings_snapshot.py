@@ -0,0 +1,74 @@
+""" Process-local snapshot of the Settings table """
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class SettingsSnapshot:
+    """Versioned in-memory copy of all system settings, shared by threads of a process
+
+    The whole Settings table is loaded into a dict and served without any network
+    round-trip. A version token in cache is bumped after each committed change, and
+    each process checks it at most once per `VERSION_CHECK_INTERVAL` seconds to reload
+    the table when changed. Snapshots are also reloaded after `MAX_AGE` seconds, as a
+    safeguard for changes done through queryset updates.
+    """
+
+    VERSION_KEY = 'settings_snapshot_version'
+    VERSION_CHECK_INTERVAL = 1
+    MAX_AGE = 60
+
+    _lock = threading.Lock()
+    _values: Optional[Dict[str, Optional[str]]] = None
+    _version: Optional[str] = None
+    _loaded_at = 0.0
+    _checked_at = 0.0
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Bump snapshot version once the current DB transaction is committed"""
+
+        def _bump_version():
+            cache.set(cls.VERSION_KEY, uuid.uuid4().hex, None)
+            cls._checked_at = 0.0
+
+        transaction.on_commit(_bump_version)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop the local snapshot, so the next read reloads it"""
+        with cls._lock:
+            cls._values = None
+            cls._version = None
+            cls._loaded_at = cls._checked_at = 0.0
+
+    @classmethod
+    def get_values(cls) -> Optional[Dict[str, Optional[str]]]:
+        """Return the current snapshot as a key to value dict, or None if snapshots are disabled"""
+        if not settings.USE_SETTINGS_SNAPSHOT:
+            return None
+        values = cls._values
+        if values is not None and time.monotonic() - cls._checked_at < cls.VERSION_CHECK_INTERVAL:
+            return values
+        with cls._lock:
+            now = time.monotonic()
+            if cls._values is None or now - cls._checked_at >= cls.VERSION_CHECK_INTERVAL:
+                version = cache.get(cls.VERSION_KEY)
+                if cls._values is None or version != cls._version or now - cls._loaded_at >= cls.MAX_AGE:
+                    cls._load(version, now)
+                cls._checked_at = now
+            return cls._values
+
+    @classmethod
+    def _load(cls, version: Optional[str], now: float) -> None:
+        from exchange.base.models import Settings
+
+        # Version is read before the table, so a concurrent change results in a later reload
+        cls._values = dict(Settings.objects.values_list('key', 'value'))
+        cls._version = version
+        cls._loaded_at = now
@@ -4,11 +4,14 @@ import requests
 from django.core.cache import cache
 
 from exchange.base.models import Settings
+from exchange.base.settings_snapshot import SettingsSnapshot
 from exchange.corporate_banking.utils import ObjectBasedMetricMeasurement
 
 
 def remove_tokens(access_token_settings_key: str, refresh_token_settings_key: str):
     Settings.objects.filter(key__in=[access_token_settings_key, refresh_token_settings_key]).delete()
+    # Queryset deletes bypass Settings.delete, so revoked tokens are dropped from snapshots here
+    SettingsSnapshot.invalidate()
 
     cache.delete(Settings.RELATED_CACHE_KEYS.get(access_token_settings_key)[0])
     cache.delete(Settings.RELATED_CACHE_KEYS.get(refresh_token_settings_key)[0])
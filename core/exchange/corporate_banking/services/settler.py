@@ -1,5 +1,5 @@
 from collections import defaultdict
-from typing import Iterable, List, Optional, Tuple, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from django.db import models, transaction
 from django.db.models import QuerySet
@@ -32,6 +32,7 @@ from exchange.corporate_banking.services.validators import (
 
 
 class Settler:
+    SETTLEMENT_BATCH_SIZE = 100
 
     def __init__(self, settling_pending_deposits: bool = False):
         self.settling_pending_deposits = settling_pending_deposits
@@ -40,12 +41,7 @@ class Settler:
     def settle_statements(self):
         deposits = self._get_deposits_to_settle()
         valid_deposits = self.validate_deposits(deposits)
-        executed_deposits = []
-        for deposit in valid_deposits:
-            try:
-                executed_deposits.append(self.create_deposit(deposit))
-            except:
-                report_exception()
+        executed_deposits = self.create_deposits(valid_deposits)
         self._increase_deposit_metrics([deposit.cobank_statement for deposit in executed_deposits])
         self._log_deposit_lag_metric(executed_deposits)
 
@@ -59,6 +55,10 @@ class Settler:
         validators = self._get_validators(bypass_high_amount, ignore_double_spend)
         valid_statements, requiring_admin_approval, rejected = [], [], []
 
+        deposits = list(deposits)
+        for validator in validators:
+            validator.prefetch(deposits)
+
         for deposit in deposits:
             state, reason = self.examine_deposit(validators, deposit)
             if state == STATEMENT_STATUS.validated:
@@ -112,13 +112,38 @@ class Settler:
                 return STATEMENT_STATUS.rejected, REJECTION_REASONS.other
         return STATEMENT_STATUS.validated, None
 
+    def create_deposits(self, statements: List[CoBankStatement]) -> List[CoBankUserDeposit]:
+        """Create deposits of validated statements, committing each group of them in one DB transaction
+
+        Each deposit is created in its own savepoint, so a failed deposit does not affect others of its group.
+        """
+        bank_accounts = self.get_bank_accounts([statement.source_iban for statement in statements])
+        executed_deposits = []
+        for i in range(0, len(statements), self.SETTLEMENT_BATCH_SIZE):
+            with transaction.atomic():
+                for statement in statements[i : i + self.SETTLEMENT_BATCH_SIZE]:
+                    try:
+                        executed_deposits.append(
+                            self.create_deposit(statement, bank_accounts=bank_accounts.get(statement.source_iban))
+                        )
+                    except:
+                        report_exception()
+        return executed_deposits
+
     @transaction.atomic
-    def create_deposit(self, statement: CoBankStatement, update_fields: Iterable[str] = None):
+    def create_deposit(
+        self,
+        statement: CoBankStatement,
+        update_fields: Iterable[str] = None,
+        bank_accounts: Optional[List[BankAccount]] = None,
+    ):
         update_fields = update_fields if update_fields else []
-        if statement.source_iban:
-            source_bank_account = self.get_bank_account(statement.source_iban)
-        else:
+        if not statement.source_iban:
             raise ValueError('Source IBAN not found')
+        if bank_accounts is not None:
+            source_bank_account = self._select_bank_account(bank_accounts)
+        else:
+            source_bank_account = self.get_bank_account(statement.source_iban)
         deposit = CoBankUserDeposit.objects.create(
             cobank_statement=statement,
             user=source_bank_account.user,
@@ -131,6 +156,25 @@ class Settler:
         transaction.on_commit(lambda: self.notify(deposit))
         return deposit
 
+    def get_bank_accounts(self, sheba_numbers: Iterable[str]) -> Dict[str, List[BankAccount]]:
+        """Return confirmed bank accounts of each sheba number, loaded in one query"""
+        bank_accounts = {sheba_number: [] for sheba_number in sheba_numbers if sheba_number}
+        for bank_account in (
+            BankAccount.objects.filter(confirmed=True, shaba_number__in=bank_accounts)
+            .select_related('user')
+            .order_by('id')
+        ):
+            bank_accounts[bank_account.shaba_number].append(bank_account)
+        return bank_accounts
+
+    @staticmethod
+    def _select_bank_account(bank_accounts: List[BankAccount]) -> BankAccount:
+        if len({bank_account.user_id for bank_account in bank_accounts}) > 1:
+            raise MultipleBankAccountFound('MultipleBankAccountFound')
+        if not bank_accounts:
+            raise NoBankAccountFound('NoBankAccountFound')
+        return next((bank_account for bank_account in bank_accounts if not bank_account.is_deleted), bank_accounts[0])
+
     def get_bank_account(self, sheba_number: str) -> Optional[BankAccount]:
         bank_accounts = BankAccount.objects.filter(confirmed=True, shaba_number=sheba_number)
         # This should not ever happen because of BankAccountValidator
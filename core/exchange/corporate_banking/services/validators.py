@@ -1,6 +1,7 @@
+from collections import defaultdict
 from datetime import timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
 from django.conf import settings
 from django.db.models import Q, QuerySet
@@ -31,15 +32,53 @@ class Validator:
         validated_obj = self.inner_validator.validate(obj) if self.inner_validator else obj
         return self._validate(validated_obj)
 
+    def prefetch(self, objs: list) -> list:
+        """Preload data needed to validate a batch of objects in a few queries
+
+        Returns the objects that would be passed to the outer validator. Objects of the batch are
+        validated without further queries afterwards, while other objects are validated as usual.
+        """
+        prefetched_objs = self.inner_validator.prefetch(objs) if self.inner_validator else objs
+        return self._prefetch(prefetched_objs)
+
     def _validate(self, obj):
         raise NotImplementedError
 
+    def _prefetch(self, objs: list) -> list:
+        return objs
+
 
 class FeatureFlagValidator(Validator):
     error = FeatureFlagValidationException
 
+    def __init__(self, inner_validator: Optional['Validator'] = None):
+        super().__init__(inner_validator)
+        self.is_check_enabled: Optional[bool] = None
+        self.checked_user_ids: Set[int] = set()
+        self.enabled_user_ids: Set[int] = set()
+
+    def _get_is_check_enabled(self) -> bool:
+        if self.is_check_enabled is not None:
+            return self.is_check_enabled
+        return Settings.get_value('cobank_check_feature_flag', 'yes') != 'no'
+
+    def _prefetch(self, objs: list) -> list:
+        users = [obj if isinstance(obj, User) else obj.user for obj in objs if isinstance(obj, (User, BankAccount))]
+        self.is_check_enabled = Settings.get_value('cobank_check_feature_flag', 'yes') != 'no'
+        if not self.is_check_enabled:
+            return users
+        self.checked_user_ids = {user.id for user in users}
+        self.enabled_user_ids = set(
+            QueueItem.objects.filter(
+                user_id__in=self.checked_user_ids,
+                feature=QueueItem.FEATURES.cobank,
+                status=QueueItem.STATUS.done,
+            ).values_list('user_id', flat=True)
+        )
+        return users
+
     def _validate(self, obj):
-        if Settings.get_value('cobank_check_feature_flag', 'yes') == 'no':
+        if not self._get_is_check_enabled():
             return obj
 
         try:
@@ -50,7 +89,13 @@ class FeatureFlagValidator(Validator):
                 raise Exception
         except Exception:
             raise self.error('UserNotFound')
-        if not QueueItem.objects.filter(user=user, feature=QueueItem.FEATURES.cobank, status=QueueItem.STATUS.done):
+        if user.id in self.checked_user_ids:
+            has_feature = user.id in self.enabled_user_ids
+        else:
+            has_feature = QueueItem.objects.filter(
+                user=user, feature=QueueItem.FEATURES.cobank, status=QueueItem.STATUS.done
+            ).exists()
+        if not has_feature:
             raise self.error('FeatureUnavailable')
         return user
 
@@ -75,6 +120,21 @@ class UserLevelValidator(Validator):
 class BankAccountValidator(Validator):
     error = BankAccountValidationException
 
+    def __init__(self, inner_validator: Optional['Validator'] = None):
+        super().__init__(inner_validator)
+        self.accounts_by_iban: Dict[str, List[BankAccount]] = {}
+
+    def _prefetch(self, objs: list) -> list:
+        ibans = {obj.source_iban for obj in objs if isinstance(obj, CoBankStatement) and obj.source_iban}
+        ibans.update(obj for obj in objs if isinstance(obj, str) and obj)
+        accounts = (
+            BankAccount.objects.filter(shaba_number__in=ibans, confirmed=True).select_related('user').order_by('id')
+        )
+        self.accounts_by_iban = {iban: [] for iban in ibans}
+        for account in accounts:
+            self.accounts_by_iban[account.shaba_number].append(account)
+        return [accounts[0] for accounts in self.accounts_by_iban.values() if accounts]
+
     def _validate(self, obj):
         if not obj:
             raise self.error('EmptyIban')
@@ -84,6 +144,9 @@ class BankAccountValidator(Validator):
             else:
                 raise self.error('EmptyIban')
 
+        if isinstance(obj, str) and obj in self.accounts_by_iban:
+            return self._select_account(self.accounts_by_iban[obj])
+
         account = BankAccount.objects.filter(shaba_number=obj, confirmed=True) if isinstance(obj, str) else obj
         if not account or (not isinstance(account, BankAccount) and not isinstance(account, QuerySet)):
             raise self.error('BankAccountNotFound')
@@ -93,6 +156,13 @@ class BankAccountValidator(Validator):
             return account.filter(is_deleted=False).first() or account.first()
         return account.first() if isinstance(account, QuerySet) else account
 
+    def _select_account(self, accounts: List[BankAccount]) -> BankAccount:
+        if not accounts:
+            raise self.error('BankAccountNotFound')
+        if len({account.user_id for account in accounts}) > 1:
+            raise self.error('SharedBankAccount')
+        return next((account for account in accounts if not account.is_deleted), accounts[0])
+
 
 class DepositAmountValidator(Validator):
     error = AmountValidationException
@@ -139,6 +209,34 @@ class DoubleSpendPreventer(Validator):
 
     error = PossibleDoubleSpendException
 
+    SOURCE_FIELDS = ('source_iban', 'source_account', 'source_card')
+
+    def __init__(self, inner_validator: Optional['Validator'] = None):
+        super().__init__(inner_validator)
+        self.prefetched_statement_ids: Set[int] = set()
+        self.candidates: Dict[tuple, List[CoBankStatement]] = defaultdict(list)
+
+    def _prefetch(self, objs: list) -> list:
+        """Load statements with the same destination, amount and any of the sources of the batch at once"""
+        statements = [obj for obj in objs if isinstance(obj, CoBankStatement) and obj.pk]
+        if not statements:
+            return objs
+        same_source_query_conditions = Q()
+        for field in self.SOURCE_FIELDS:
+            values = {getattr(statement, field) for statement in statements} - {None, ''}
+            if values:
+                same_source_query_conditions |= Q(**{f'{field}__in': values})
+        if same_source_query_conditions:
+            candidates = CoBankStatement.objects.filter(
+                same_source_query_conditions,
+                destination_account__iban__in={statement.destination_account.iban for statement in statements},
+                amount__in={statement.amount for statement in statements},
+            ).select_related('destination_account')
+            for candidate in candidates:
+                self.candidates[(candidate.destination_account.iban, candidate.amount)].append(candidate)
+        self.prefetched_statement_ids = {statement.pk for statement in statements}
+        return objs
+
     def _validate(self, obj):
         if not obj or not isinstance(obj, CoBankStatement):
             return obj
@@ -161,6 +259,13 @@ class DoubleSpendPreventer(Validator):
         return obj
 
     def _find_statements_with_similar_references(self, statement: CoBankStatement):
+        if statement.pk in self.prefetched_statement_ids:
+            return [
+                candidate
+                for candidate in self.candidates.get((statement.destination_account.iban, statement.amount), [])
+                if candidate.pk != statement.pk and self._has_similar_references(statement, candidate)
+            ]
+
         same_source_query_conditions = (
             (Q(source_iban__isnull=False, source_iban=statement.source_iban) & ~Q(source_iban__exact=''))
             | (Q(source_account__isnull=False, source_account=statement.source_account) & ~Q(source_account__exact=''))
@@ -225,6 +330,30 @@ class DoubleSpendPreventer(Validator):
 
         return CoBankStatement.objects.filter(possible_double_spend_query_conditions).exclude(pk=statement.pk)
 
+    def _has_similar_references(self, statement: CoBankStatement, candidate: CoBankStatement) -> bool:
+        """In-memory counterpart of the similar references query for prefetched candidates"""
+        if not any(
+            getattr(statement, field) and getattr(candidate, field) == getattr(statement, field)
+            for field in self.SOURCE_FIELDS
+        ):
+            return False
+
+        if statement.tracing_number and candidate.tracing_number != statement.tracing_number:
+            return False
+
+        api_response = statement.api_response or {}
+        candidate_api_response = candidate.api_response or {}
+
+        def has_same_reference(key: str, candidate_key: str) -> bool:
+            value = api_response.get(key, None)
+            if not value:
+                return True
+            return candidate_key in candidate_api_response and candidate_api_response[candidate_key] == value
+
+        if candidate.destination_account.provider == statement.destination_account.provider:
+            return all(has_same_reference(key, key) for key in ('ref1', 'ref2', 'bankTransactionId'))
+        return has_same_reference('ref1', 'bankTransactionId') and has_same_reference('bankTransactionId', 'ref1')
+
 
 class RefundStatementValidator(Validator):
     error = RefundValidationException
@@ -4,7 +4,8 @@ from exchange.accounts.models import Notification, UserRestriction
 from exchange.base.calendar import ir_now
 from exchange.base.crons import CronJob, Schedule
 from exchange.base.logging import report_exception
-from exchange.credit.helpers import get_user_net_worth, get_user_debt_worth
+from exchange.credit.errors import UnavailablePrice
+from exchange.credit.helpers import UsdtPriceVector, get_users_debt_worth, get_users_net_worth
 from exchange.credit.models import CreditPlan
 
 
@@ -13,11 +14,17 @@ class CreditLimitForAdminNotificationCron(CronJob):
     code = 'credit_limit_notification'
 
     def run(self):
-        credit_plans = CreditPlan.objects.filter(expires_at__gt=ir_now())
+        credit_plans = list(CreditPlan.objects.filter(expires_at__gt=ir_now()))
+        user_ids = {credit_plan.user_id for credit_plan in credit_plans}
+        prices = UsdtPriceVector()
+        net_worths = get_users_net_worth(user_ids, prices)
+        debt_worths = get_users_debt_worth(user_ids, prices)
         for credit_plan in credit_plans:
             try:
-                total_user_balance_worth = get_user_net_worth(credit_plan.user.id)
-                total_user_debt_worth = get_user_debt_worth(credit_plan.user.id)
+                if credit_plan.user_id not in debt_worths:
+                    raise UnavailablePrice(f'Debt price of user {credit_plan.user_id} is not available.')
+                total_user_balance_worth = net_worths[credit_plan.user_id]
+                total_user_debt_worth = debt_worths[credit_plan.user_id]
                 user_assets_worth = total_user_balance_worth - total_user_debt_worth
 
                 def does_user_debt_exceed_ratio(ratio):
@@ -26,11 +33,11 @@ class CreditLimitForAdminNotificationCron(CronJob):
                     )
 
                 if does_user_debt_exceed_ratio(credit_plan.maximum_withdrawal_percentage):
-                    Notification.notify_admins(message=f"عبور از محدودیت برداشت در credit توسط کاربر {credit_plan.user.id}")
+                    Notification.notify_admins(message=f"عبور از محدودیت برداشت در credit توسط کاربر {credit_plan.user_id}")
 
                 if does_user_debt_exceed_ratio(Decimal('0.66')):
                     UserRestriction.freeze_user(credit_plan.user_id)
-                    Notification.notify_admins(message=f"عبور از محدودیت نسبت ۱.۵ دارای به اعتبار کسب شده در credit توسط کاربر {credit_plan.user.id}")
+                    Notification.notify_admins(message=f"عبور از محدودیت نسبت ۱.۵ دارای به اعتبار کسب شده در credit توسط کاربر {credit_plan.user_id}")
 
             except Exception as _:
                 report_exception()
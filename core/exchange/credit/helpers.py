@@ -1,6 +1,6 @@
 import decimal
 import functools
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
 from redis.exceptions import RedisError
 from django.core.cache import cache
@@ -59,10 +59,84 @@ def get_user_debt_worth(user_id: int,) -> decimal.Decimal:
     ) or decimal.Decimal('0')
 
 
+def get_users_net_worth(user_ids: Iterable[int], prices: 'UsdtPriceVector') -> Dict[int, decimal.Decimal]:
+    '''Bulk version of `get_user_net_worth`, returning user id to usdt value of spot assets
+        minus pending withdraws, using one wallet query and one pending withdraws query.
+    '''
+    user_ids = list(user_ids)
+    wallets = Wallet.objects.filter(
+        user_id__in=user_ids, type=Wallet.WALLET_TYPE.spot,
+    ).values_list('id', 'user_id', 'currency', 'balance',)
+    wallet_id_to_withdraw_blocked_balance_map = dict(WithdrawRequest.get_financially_pending_requests().filter(
+        wallet__user_id__in=user_ids, wallet__type=Wallet.WALLET_TYPE.spot,
+    ).values('wallet_id').annotate(total=Sum('amount')).values_list('wallet_id', 'total',))
+    net_worths = {user_id: decimal.Decimal('0') for user_id in user_ids}
+    for wallet_id, user_id, currency, balance in wallets:
+        amount = balance - wallet_id_to_withdraw_blocked_balance_map.get(wallet_id, decimal.Decimal('0'))
+        if money_is_zero(amount):
+            continue
+        net_worths[user_id] += (prices.get(currency) or decimal.Decimal('0')) * amount
+    return net_worths
+
+
+def get_users_debt_worth(user_ids: Iterable[int], prices: 'UsdtPriceVector') -> Dict[int, decimal.Decimal]:
+    '''Bulk version of `get_user_debt_worth`, returning user id to usdt value of total debt.
+        Users with a debt in a currency without available price are not included.
+    '''
+    user_ids = list(user_ids)
+    debt_worths = {user_id: decimal.Decimal('0') for user_id in user_ids}
+    for user_id, currency, amount in models.CreditPlan.get_users_debts(user_ids):
+        if not amount or user_id not in debt_worths:
+            continue
+        price = prices.get(currency)
+        if price is None:
+            del debt_worths[user_id]
+            continue
+        debt_worths[user_id] += price * amount
+    return debt_worths
+
+
+class UsdtPriceVector:
+    '''USDT prices of currencies for a run over many users. Price sources are read from
+        cache once, and each currency price is computed once with `ToUsdtConvertor` rules.
+        ABC margin calls are valued separately, by mark prices of collateral wallets in
+        `asset_backed_credit.services.price.get_batch_total_assets`, which is already batched.
+    '''
+
+    def __init__(self):
+        self._sources = None
+        self._prices: Dict[int, Optional[decimal.Decimal]] = {}
+
+    def _load_sources(self) -> dict:
+        codenames = filter(None, map(get_currency_codename, Currencies._db_values))
+        orderbook_keys = [
+            f'orderbook_{codename.upper()}USDT_best_active_{side}' for codename in codenames for side in ('buy', 'sell')
+        ]
+        return cache.get_many(['settings_prices_binance_futures', 'okx_prices', *orderbook_keys])
+
+    def get(self, currency: int) -> Optional[decimal.Decimal]:
+        '''Return usdt price of the currency, or None if it is not available'''
+        if currency not in self._prices:
+            if self._sources is None:
+                self._sources = self._load_sources()
+            try:
+                self._prices[currency] = ToUsdtConvertor(currency, sources=self._sources).get_price()
+            except errors.UnavailablePrice:
+                self._prices[currency] = None
+        return self._prices[currency]
+
+
 class ToUsdtConvertor:
-    def __init__(self, currency: int):
+    def __init__(self, currency: int, sources: Optional[dict] = None):
         self.currency = currency
         self.currency_codename = get_currency_codename(currency)
+        # Prefetched cache values of price sources, read from cache per price if not given
+        self.sources = sources
+
+    def _get_source(self, key: str):
+        if self.sources is not None:
+            return self.sources.get(key)
+        return cache.get(key)
 
     CLOSE_PRICES_LIMIT = .03
 
@@ -74,16 +148,16 @@ class ToUsdtConvertor:
 
     @property
     def binance_price(self) -> Optional[float]:
-        return (cache.get('settings_prices_binance_futures') or {}).get(self.currency_codename)
+        return (self._get_source('settings_prices_binance_futures') or {}).get(self.currency_codename)
 
     @property
     def okx_price(self) -> Optional[float]:
-        return (cache.get('okx_prices') or {}).get(self.currency_codename)
+        return (self._get_source('okx_prices') or {}).get(self.currency_codename)
 
     @property
     def nobitex_price(self) -> Optional[float]:
-        nobitex_buy_price = cache.get(f'orderbook_{self.currency_codename.upper()}USDT_best_active_buy')
-        nobitex_sell_price = cache.get(f'orderbook_{self.currency_codename.upper()}USDT_best_active_sell')
+        nobitex_buy_price = self._get_source(f'orderbook_{self.currency_codename.upper()}USDT_best_active_buy')
+        nobitex_sell_price = self._get_source(f'orderbook_{self.currency_codename.upper()}USDT_best_active_sell')
         if nobitex_buy_price is not None and nobitex_sell_price is not None:
             nobitex_price = (nobitex_buy_price + nobitex_sell_price) / 2
         else:
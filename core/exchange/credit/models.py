@@ -1,5 +1,5 @@
 import decimal
-from typing import Dict, Union, List
+from typing import Dict, List, Tuple, Union
 
 from django.db import models, transaction
 
@@ -137,6 +137,20 @@ class CreditPlan(models.Model):
             for currency, total_lend, total_repay in transactions_sum
         }
 
+    @classmethod
+    def get_users_debts(cls, user_ids: List[int],) -> List[Tuple[int, int, decimal.Decimal]]:
+        '''returning `(user id, currency, debt value)` of users debts in one query'''
+        transactions_sum = CreditTransaction.objects.filter(plan__user_id__in=user_ids).values(
+            'plan__user_id', 'currency',
+        ).annotate(
+            total_lend=models.Sum('amount', filter=models.Q(tp=CreditTransaction.TYPES.lend),),
+            total_repay=models.Sum('amount', filter=models.Q(tp=CreditTransaction.TYPES.repay),),
+        ).values_list('plan__user_id', 'currency', 'total_lend', 'total_repay',)
+        return [
+            (user_id, currency, (total_lend or decimal.Decimal('0')) - (total_repay or decimal.Decimal('0')))
+            for user_id, currency, total_lend, total_repay in transactions_sum
+        ]
+
     @classmethod
     def get_user_debts_and_usdt_values(cls, user_id: int,) -> Dict[int, Dict[str, decimal.Decimal]]:
         '''returning `currency` to user debt `{amount: 11, value: 22}` map'''
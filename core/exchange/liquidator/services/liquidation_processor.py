@@ -1,14 +1,15 @@
-from datetime import timedelta
-from typing import Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import Q
 from django.utils.timezone import now
 
 from exchange.accounts.models import Notification
 from exchange.base.calendar import ir_now
-from exchange.base.logging import report_exception
+from exchange.base.logging import log_time, report_exception
 from exchange.liquidator.broker_apis import SettlementData, SettlementStatus, SettlementStatusEnum
 from exchange.liquidator.errors import InvalidAPIResponse, SettlementNotFound
 from exchange.liquidator.functions import check_double_spend_in_liquidation
@@ -94,7 +95,24 @@ class InternalLiquidationProcessor:
 
 
 class ExternalLiquidationProcessor:
+    """
+    Updates open external liquidations based on their settlement status in the broker.
+
+    Open liquidations are locked in batches, their settlement statuses are fetched with a bounded
+    number of concurrent requests, and the resulting transitions are saved with a bulk update.
+
+    Only this status polling is batched, since it calls the broker for every open liquidation every
+    few seconds. LiquidationRequestProcessor already reads each state with one locked query and saves
+    with bulk updates, ExternalBrokerStatusChecker makes a single service-level request, and external
+    order creation stays one task per liquidation because it falls back to internal orders per liquidation.
+    """
+
     SLA_TIME: int = 30
+    BATCH_SIZE: int = 100
+    WORKERS: int = 8
+
+    def __init__(self, concurrent: Optional[bool] = None):
+        self.concurrent = not settings.IS_TEST_RUNNER if concurrent is None else concurrent
 
     @transaction.atomic
     def update_status(self, liquidation_id: int):
@@ -102,14 +120,84 @@ class ExternalLiquidationProcessor:
         if not liquidation:
             return None
 
+        previous_status = liquidation.status
+        self._process_liquidation(liquidation)
+        self._log_transition(liquidation, previous_status)
+        return liquidation.save(update_fields=('status', 'filled_amount', 'filled_total_price'))
+
+    def update_statuses(self, created_before: datetime) -> int:
+        """
+        Updates all open external liquidations created before the given time.
+
+        Returns:
+            int: The number of liquidations checked.
+        """
+        liquidation_ids = list(
+            Liquidation.objects.filter(
+                market_type=Liquidation.MARKET_TYPES.external,
+                status=Liquidation.STATUS.open,
+                created_at__lte=created_before,
+            )
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        for i in range(0, len(liquidation_ids), self.BATCH_SIZE):
+            try:
+                self._update_statuses_batch(liquidation_ids[i : i + self.BATCH_SIZE])
+            except Exception:  # noqa: BLE001 - other batches should still be updated
+                report_exception()
+        return len(liquidation_ids)
+
+    @transaction.atomic
+    def _update_statuses_batch(self, liquidation_ids: List[int]):
+        liquidations = list(
+            Liquidation.objects.filter(id__in=liquidation_ids, status=Liquidation.STATUS.open)
+            .order_by('id')
+            .select_for_update(skip_locked=True)
+        )
+        initial_values = {
+            liquidation.pk: (liquidation.status, liquidation.filled_amount, liquidation.filled_total_price)
+            for liquidation in liquidations
+        }
+
+        if self.concurrent and len(liquidations) > 1:
+            with ThreadPoolExecutor(max_workers=self.WORKERS, thread_name_prefix='liquidation_status') as executor:
+                list(executor.map(self._process_liquidation_in_thread, liquidations))
+        else:
+            for liquidation in liquidations:
+                self._process_liquidation(liquidation)
+
+        updated_liquidations = []
+        for liquidation in liquidations:
+            previous_status = initial_values[liquidation.pk][0]
+            if initial_values[liquidation.pk] != (
+                liquidation.status,
+                liquidation.filled_amount,
+                liquidation.filled_total_price,
+            ):
+                updated_liquidations.append(liquidation)
+            self._log_transition(liquidation, previous_status)
+
+        Liquidation.objects.bulk_update(updated_liquidations, fields=('status', 'filled_amount', 'filled_total_price'))
+
+    def _process_liquidation_in_thread(self, liquidation: Liquidation):
+        try:
+            self._process_liquidation(liquidation)
+        finally:
+            connection.close()
+
+    def _process_liquidation(self, liquidation: Liquidation):
+        """
+        Applies the settlement status of a liquidation to it, without saving it.
+        """
         try:
             data = SettlementStatus().request(liquidation=liquidation)
             self._update_liquidation(liquidation, data)
-            return liquidation.save(update_fields=('status', 'filled_amount', 'filled_total_price'))
+            return
 
         except SettlementNotFound:
             liquidation.status = Liquidation.STATUS.ready_to_share
-            return liquidation.save(update_fields=('status',))
+            return
 
         except InvalidAPIResponse:
             Notification.notify_admins(
@@ -125,7 +213,23 @@ class ExternalLiquidationProcessor:
         exceed_sla = liquidation.created_at <= (now() - timedelta(seconds=self.SLA_TIME))
         if exceed_sla:
             liquidation.status = Liquidation.STATUS.overstock
-            liquidation.save(update_fields=('status',))
+
+    @staticmethod
+    def _log_transition(liquidation: Liquidation, previous_status: int):
+        """
+        Logs the time from creation of a liquidation to a change of its status.
+        """
+        if liquidation.status == previous_status or not liquidation.created_at:
+            return
+        duration = int((now() - liquidation.created_at).total_seconds() * 1000)
+        log_time(
+            'liquidator_liquidation_status_change_duration',
+            duration,
+            labels=(
+                Liquidation.STATUS[previous_status].lower().replace(' ', ''),
+                Liquidation.STATUS[liquidation.status].lower().replace(' ', ''),
+            ),
+        )
 
     def _update_liquidation(self, liquidation: Liquidation, data: SettlementData):
         liquidation.filled_amount = data.filled_amount
@@ -52,18 +52,7 @@ def task_check_status_internal_liquidation():
 @shared_task(name='liquidator.core.check_status_external_liquidation')
 @measure_time(metric='liquidator_check_external_liquidations_status_time')
 def task_check_status_external_liquidation():
-    start_time = ir_now() - timedelta(seconds=5)
-    liquidations = (
-        Liquidation.objects.filter(
-            market_type=Liquidation.MARKET_TYPES.external,
-            status=Liquidation.STATUS.open,
-            created_at__lte=start_time,
-        )
-        .order_by('id')
-        .values_list('id', flat=True)
-    )
-    for liquidation_id in liquidations:
-        task_update_status_external_liquidation.delay(liquidation_id)
+    ExternalLiquidationProcessor().update_statuses(created_before=ir_now() - timedelta(seconds=5))
 
 
 @shared_task(name='liquidator.core.update_status_external_liquidation')
@@ -48,6 +48,7 @@ from exchange.market.models import Market, Order, OrderMatching, ReferralFee, Us
 from exchange.market.ws_serializers import serialize_trade_for_user
 from exchange.wallet.estimator import PriceEstimator
 from exchange.wallet.models import Wallet
+from exchange.wallet.snapshot import WalletSnapshot
 from exchange.web_engage.events import OrderMatchedWebEngageEvent
 
 
@@ -377,6 +378,7 @@ class MarketManager:
         uid = user.id
         cache.set(f'user_{uid}_recent_order', True, 100)
         transaction.on_commit(lambda: cache.set(f'user_{uid}_no_order', False, 60))
+        WalletSnapshot.invalidate(uid)
         if order.is_market:
             transaction.on_commit(lambda: cache.set(f'market_{market.id}_market_orders', 1))
         return order, None
@@ -43,6 +43,7 @@ from exchange.base.strings import _t
 from exchange.market.constants import FEE_MAX_DIGITS, ORDER_MAX_DIGITS, SYSTEM_USERS_VIP_LEVEL, TOTAL_VOLUME_MAX_DIGITS
 from exchange.market.exceptions import ParseMarketError
 from exchange.wallet.models import Transaction, Wallet
+from exchange.wallet.snapshot import WalletSnapshot
 
 ORDER_STATUS = Choices(
     (0, 'new', 'New'),
@@ -442,6 +443,7 @@ class Order(models.Model):
 
         self.status = status
         self.save(update_fields=['status'])
+        WalletSnapshot.invalidate(self.user_id)
 
         last_trade = (
             OrderMatching.objects.filter(sell_order=self).order_by('id').last()
@@ -19,6 +19,12 @@ def graceful_exit_handler(sig, frame):
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-w', '--workers', default=2, type=int,
+            help='Number of threads committing trades concurrently',
+        )
+
     def register_signal_handler(self):
         signal.signal(signal.SIGHUP, graceful_exit_handler)
 
@@ -36,7 +42,7 @@ class Command(BaseCommand):
         """Send start notifications."""
         self.notify_admins(f'Started on {settings.SERVER_NAME} {settings.RELEASE_VERSION}-{settings.CURRENT_COMMIT}')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, workers=2, **kwargs):
         self.register_signal_handler()
         self.send_startup_notice()
 
@@ -45,7 +51,7 @@ class Command(BaseCommand):
                 if SHOULD_EXIT:
                     print('Received SIGHUP')
                     break
-                processor = TradeProcessor(commit_trade=False)
+                processor = TradeProcessor(commit_trade=False, workers=workers)
                 try:
                     processor.do_round()
                     processor.bulk_update_trades()
@@ -1,5 +1,6 @@
 """Trade Processor"""
 import datetime
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
@@ -22,10 +23,14 @@ class TradeProcessor:
     performs the parts of trading logic that can be done outside of the
     matching DB transaction."""
 
-    def __init__(self, batch_size=100, commit_trade=True) -> None:
+    trade_id_cache_key = 'tradeprocessor_last_trade_id'
+
+    def __init__(self, batch_size=100, commit_trade=True, workers=2, max_batches=10) -> None:
         self.batch_size = batch_size
         self.trades_count = 0
         self.commit_trade = commit_trade
+        self.workers = workers
+        self.max_batches = max_batches
         self.trades = []
 
     @measure_function_execution(metric_prefix='tradeprocessor', metric='txids', metrics_flush_interval=10)
@@ -76,25 +81,28 @@ class TradeProcessor:
         return Settings.is_disabled('trade_processor_activation')
 
     @staticmethod
-    def create_wallets(query_dict, wallets):
+    def fetch_wallets(keys):
+        """Load wallets by (user_id, currency, type) keys in a single tuple-IN query"""
+        if not keys:
+            return {}
+        keys = list(keys)
+        values = ', '.join(['(%s, %s, %s)'] * len(keys))
+        wallets = Wallet.objects.raw(
+            f'SELECT * FROM {Wallet._meta.db_table} WHERE (user_id, currency, type) IN (VALUES {values})',
+            [value for key in keys for value in key],
+        )
+        return {(wallet.user_id, wallet.currency, wallet.type): wallet for wallet in wallets}
+
+    @classmethod
+    def create_wallets(cls, query_dict, wallets):
         to_be_create_wallets = [
             Wallet(user_id=key[0], currency=key[1], type=key[2]) for key in query_dict if key not in wallets
         ]
+        if not to_be_create_wallets:
+            return {}
 
-        created_wallets = Wallet.objects.bulk_create(to_be_create_wallets, ignore_conflicts=True)
-        if created_wallets:
-            criteria = Q()
-            for wallet in created_wallets:
-                criteria |= Q(
-                    user_id=wallet.user_id,
-                    currency=wallet.currency,
-                    type=wallet.type,
-                )
-            created_wallets = Wallet.objects.filter(criteria)
-
-        new_wallets = {(wallet.user_id, wallet.currency, wallet.type): wallet for wallet in created_wallets}
-
-        return new_wallets
+        Wallet.objects.bulk_create(to_be_create_wallets, ignore_conflicts=True)
+        return cls.fetch_wallets((wallet.user_id, wallet.currency, wallet.type) for wallet in to_be_create_wallets)
 
     def preload_wallets(self, trades_batch):
         pools = LiquidityPool.objects.in_bulk(field_name='currency')
@@ -125,15 +133,7 @@ class TradeProcessor:
             order_to_provider_id[order.id] = provider_id
             query_dict.add((provider_id, currency, order.wallet_type))
 
-        criteria = Q()
-        for user_id, currency, wallet_type in query_dict:
-            criteria |= Q(
-                user_id=user_id,
-                currency=currency,
-                type=wallet_type,
-            )
-
-        wallets = {(wallet.user_id, wallet.currency, wallet.type): wallet for wallet in Wallet.objects.filter(criteria)}
+        wallets = self.fetch_wallets(query_dict)
         new_wallets = self.create_wallets(query_dict, wallets)
 
         return {**wallets, **new_wallets}, order_to_provider_id
@@ -166,54 +166,132 @@ class TradeProcessor:
         )
 
     @staticmethod
-    def get_deposit_wallets(wallets, order_to_provider_id, trade):
-        sell_deposit_wallet = wallets.get(
-            (order_to_provider_id[trade.sell_order_id], trade.sell_order.dst_currency, trade.sell_order.wallet_type)
+    def get_deposit_wallet_keys(order_to_provider_id, trade):
+        sell_deposit_wallet_key = (
+            order_to_provider_id[trade.sell_order_id],
+            trade.sell_order.dst_currency,
+            trade.sell_order.wallet_type,
         )
-        buy_deposit_wallet = wallets.get(
-            (order_to_provider_id[trade.buy_order_id], trade.buy_order.src_currency, trade.buy_order.wallet_type)
+        buy_deposit_wallet_key = (
+            order_to_provider_id[trade.buy_order_id],
+            trade.buy_order.src_currency,
+            trade.buy_order.wallet_type,
         )
-        return sell_deposit_wallet, buy_deposit_wallet
+        return sell_deposit_wallet_key, buy_deposit_wallet_key
 
-    def do_round(self):
-        """Process a batch of trades"""
-        if self.check_activation():
-            return
-        trade_id_cache_key = 'tradeprocessor_last_trade_id'
-        last_trade_id = cache.get(trade_id_cache_key) or 0
-        trades_batch = self.fetch_trades(last_trade_id)
-        print(f'Processing {len(trades_batch)} trades from T#{last_trade_id}…')
-        count_success = count_fail = 0
+    @classmethod
+    def get_deposit_wallets(cls, wallets, order_to_provider_id, trade):
+        sell_deposit_wallet_key, buy_deposit_wallet_key = cls.get_deposit_wallet_keys(order_to_provider_id, trade)
+        return wallets.get(sell_deposit_wallet_key), wallets.get(buy_deposit_wallet_key)
 
-        if len(trades_batch) == 0:
-            return
+    @classmethod
+    def shard_trades(cls, trades_batch, order_to_provider_id, shards_count):
+        """Split trades into shards so that trades depositing to a common wallet are in the same shard.
 
+        Trades are grouped by connected deposit wallets, and groups are spread over shards by size.
+        Trades keep their id order inside each shard.
+        """
+        parents = {}
+
+        def find(key):
+            while parents.setdefault(key, key) != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        trade_roots = []
+        for trade in trades_batch:
+            sell_key, buy_key = (find(key) for key in cls.get_deposit_wallet_keys(order_to_provider_id, trade))
+            parents[buy_key] = sell_key
+            trade_roots.append(sell_key)
+
+        groups = defaultdict(list)
+        for trade, root in zip(trades_batch, trade_roots):
+            groups[find(root)].append(trade)
+
+        shards = [[] for _ in range(max(shards_count, 1))]
+        for group in sorted(groups.values(), key=len, reverse=True):
+            min(shards, key=len).extend(group)
+        return [shard for shard in shards if shard]
+
+    def load_batch(self, from_trade_id):
+        """Fetch the next batch of trades along with their deposit wallets and cached tx ids
+
+        Note: As this runs while the previous batch is being committed, preloaded wallet balances
+              may be outdated. That is harmless, as only deposits are created here and balances
+              are updated in DB on commit.
+        """
+        trades_batch = list(self.fetch_trades(from_trade_id))
+        if not trades_batch:
+            return trades_batch, {}, {}, {}
         wallets, order_to_provider_id = self.preload_wallets(trades_batch)
         tx_ids_values = self.preload_tx_ids(trades_batch)
+        return trades_batch, wallets, order_to_provider_id, tx_ids_values
+
+    def process_shard(self, shard, wallets, order_to_provider_id, tx_ids_values):
+        results = {}
+        for trade in shard:
+            sell_deposit_wallet, buy_deposit_wallet = self.get_deposit_wallets(wallets, order_to_provider_id, trade)
+            tx_ids = (tx_ids_values.get(trade.tx_ids_cache_key) or '').split(',')
+            results[trade.id] = self.process_trade(trade, sell_deposit_wallet, buy_deposit_wallet, tx_ids)
+        return results
+
+    def do_round(self):
+        """Process batches of trades in a pipeline
+
+        While a batch is being committed by workers, the next one is fetched and its wallets are
+        preloaded. Each worker commits a shard of the batch, and no wallet is shared between shards.
+        The last trade id advances per destination currency, only as far as trades are successfully
+        processed without a gap, and the minimum of them is stored.
+        """
+        if self.check_activation():
+            return
+        last_trade_id = cache.get(self.trade_id_cache_key) or 0
+        count_success = count_fail = 0
 
         last_trade_ids = {currency: last_trade_id for currency in DST_CURRENCIES}
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            futures = []
-            for trade in trades_batch:
-                trade: OrderMatching
-                sell_deposit_wallet, buy_deposit_wallet = self.get_deposit_wallets(wallets, order_to_provider_id, trade)
-                tx_ids = (tx_ids_values.get(trade.tx_ids_cache_key) or '').split(',')
-
-                futures += [executor.submit(self.process_trade, trade, sell_deposit_wallet, buy_deposit_wallet, tx_ids)]
-
-            for future, trade in zip(futures, trades_batch):
-                success = future.result()
-                if success:
-                    count_success += 1
-                else:
-                    count_fail += 1
-                print(f'    {"+" if success else "-"} {trade.id}')
-
-                last_trade_ids[trade.market.dst_currency] = max(trade.id, last_trade_ids[trade.market.dst_currency])
-
-        # Update metrics and last_id for this batch
-        last_trade_id = min(last_trade_ids.values())
-        cache.set(trade_id_cache_key, last_trade_id)
+        failed_currencies = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, ThreadPoolExecutor(max_workers=1) as loader:
+            next_batch = loader.submit(self.load_batch, last_trade_id)
+            for batch_number in range(1, self.max_batches + 1):
+                trades_batch, wallets, order_to_provider_id, tx_ids_values = next_batch.result()
+                print(f'Processing {len(trades_batch)} trades from T#{last_trade_id}…')
+                if len(trades_batch) == 0:
+                    break
+
+                has_next_batch = len(trades_batch) == self.batch_size and batch_number < self.max_batches
+                if has_next_batch:
+                    next_batch = loader.submit(self.load_batch, trades_batch[-1].id)
+
+                futures = [
+                    executor.submit(self.process_shard, shard, wallets, order_to_provider_id, tx_ids_values)
+                    for shard in self.shard_trades(trades_batch, order_to_provider_id, self.workers)
+                ]
+                results = {}
+                for future in futures:
+                    results.update(future.result())
+
+                for trade in trades_batch:
+                    trade: OrderMatching
+                    success = results[trade.id]
+                    dst_currency = trade.market.dst_currency
+                    if success:
+                        count_success += 1
+                        if dst_currency not in failed_currencies:
+                            last_trade_ids[dst_currency] = max(trade.id, last_trade_ids[dst_currency])
+                    else:
+                        count_fail += 1
+                        failed_currencies.add(dst_currency)
+                    print(f'    {"+" if success else "-"} {trade.id}')
+
+                # Persist trade transaction ids of each batch, to keep them in step with created transactions
+                self.bulk_update_trades()
+                last_trade_id = trades_batch[-1].id
+                if not has_next_batch:
+                    break
+
+        # Update metrics and last_id for this round
+        cache.set(self.trade_id_cache_key, min(last_trade_ids.values()))
 
         if count_success:
             metric_incr('metric_trade_processor_runs_total__ok', amount=count_success)
@@ -1,21 +1,163 @@
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
 from django.core.cache import cache
-from django.utils.functional import cached_property
+
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class _ThreadIncrements:
+    """Running totals of counter increments of a thread, only written by the thread itself"""
+
+    __slots__ = ('thread', 'totals', 'flushed')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.totals = defaultdict(int)
+        self.flushed = {}
 
 
 class MetricManager:
-    metrics = set()
+    """Registry of metrics, buffering their observations in process
+
+    Observations only update process-local values. Pending counter increments and gauge values
+    are written to cache every `FLUSH_INTERVAL` seconds by a background thread, where values of
+    all processes are aggregated, so metric updates do not need a cache round-trip each. Pending
+    values are also flushed at exit, and when a Celery worker process shuts down.
+
+    Counter increments are accumulated per thread without a lock, and flushes send the growth of
+    thread totals since the previous flush. Copying a thread's dict in a flush is atomic, so no
+    increment is lost to a concurrent update, while observing only costs a dict update.
+    """
+
+    FLUSH_INTERVAL = 0 if settings.IS_TEST_RUNNER else 10
+    FLUSH_IN_BACKGROUND = not settings.IS_TEST_RUNNER
+
+    metrics = {}
+    _lock = threading.Lock()
+    _local = threading.local()
+    _thread_increments: List[_ThreadIncrements] = []
+    _pending_values = {}
+    _next_flush = 0
+    _flusher_started = False
 
     @classmethod
     def register(cls, metric):
-        cls.metrics.add(metric)
+        cls.metrics[metric.name] = metric
+
+    @classmethod
+    def incr(cls, key: str, amount: int):
+        try:
+            totals = cls._local.increments.totals
+        except AttributeError:
+            totals = cls._register_thread().totals
+        totals[key] += amount
+        if not cls._flusher_started:
+            cls._start_flusher_or_flush()
+
+    @classmethod
+    def set(cls, key: str, value):
+        # Gauges are rarely set, so their values are shared by threads under the lock
+        with cls._lock:
+            cls._pending_values[key] = value
+        if not cls._flusher_started:
+            cls._start_flusher_or_flush()
+
+    @classmethod
+    def _register_thread(cls) -> _ThreadIncrements:
+        increments = cls._local.increments = _ThreadIncrements()
+        with cls._lock:
+            cls._thread_increments.append(increments)
+        return increments
+
+    @classmethod
+    def _start_flusher_or_flush(cls):
+        if not cls.FLUSH_IN_BACKGROUND:
+            if time.monotonic() >= cls._next_flush:
+                cls.flush()
+            return
+        with cls._lock:
+            if cls._flusher_started:
+                return
+            threading.Thread(target=cls._run_flusher, name='metrics-flusher', daemon=True).start()
+            cls._flusher_started = True
+
+    @classmethod
+    def _run_flusher(cls):
+        while True:
+            time.sleep(cls.FLUSH_INTERVAL)
+            try:
+                cls.flush()
+            except Exception:  # noqa: BLE001
+                from exchange.base.logging import report_exception
+
+                report_exception()
+
+    @classmethod
+    def _reset_after_fork(cls):
+        """Drop pending observations inherited by a child process, as the parent flushes them itself"""
+        cls._lock = threading.Lock()
+        cls._flusher_started = False
+        cls._pending_values = {}
+        increments = getattr(cls._local, 'increments', None)
+        cls._thread_increments = [increments] if increments else []
+        if increments:
+            increments.flushed = increments.totals.copy()
+
+    @classmethod
+    def flush(cls):
+        """Write pending observations of this process to cache"""
+        increments = defaultdict(int)
+        with cls._lock:
+            for thread_increments in list(cls._thread_increments):
+                is_alive = thread_increments.thread.is_alive()
+                totals = thread_increments.totals.copy()
+                for key, total in totals.items():
+                    increments[key] += total - thread_increments.flushed.get(key, 0)
+                thread_increments.flushed = totals
+                if not is_alive:
+                    # Finished threads have no more increments
+                    cls._thread_increments.remove(thread_increments)
+            values, cls._pending_values = cls._pending_values, {}
+            cls._next_flush = time.monotonic() + cls.FLUSH_INTERVAL
+        for key, amount in increments.items():
+            if not amount:
+                continue
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                if not cache.add(key, amount, None):
+                    cache.incr(key, amount)
+        if values:
+            cache.set_many(values, None)
+
+    @classmethod
+    def get_values(cls, keys: List[str]) -> Dict[str, int]:
+        cls.flush()
+        return cache.get_many(keys)
+
+    @classmethod
+    def expose(cls) -> str:
+        """Return all metrics in Prometheus text format, reading their values with a single cache call"""
+        metrics = list(cls.metrics.values())
+        values = cls.get_values([key for metric in metrics for key in metric.cache_keys])
+        return ''.join(metric.expose(values) for metric in metrics)
 
 
-def _metric_method(func):
-    def wrapper(*args, **kwargs):
-        self = args[0]
-        self._add
-        return  func(*args, **kwargs)
-    return wrapper
+atexit.register(MetricManager.flush)
+os.register_at_fork(after_in_child=MetricManager._reset_after_fork)
+
+
+@worker_process_shutdown.connect
+def flush_metrics_on_worker_process_shutdown(**kwargs):
+    # Celery prefork children exit with os._exit, skipping atexit handlers
+    MetricManager.flush()
 
 
 class Metric:
@@ -34,54 +176,123 @@ class Metric:
     def cache_key(self):
         return f'metric_{self.name}'
 
-    @_metric_method
-    def get_value(self):
-        return cache.get(self.cache_key)
+    @property
+    def cache_keys(self) -> List[str]:
+        return [self.cache_key]
 
-    @cached_property
-    def _add(self):
-        if cache.get(self.cache_key) is None:
-            cache.set(self.cache_key, 0)
+    def get_value(self):
+        return MetricManager.get_values([self.cache_key]).get(self.cache_key) or 0
 
     def remove(self):
-        cache.delete(self.cache_key)
+        MetricManager.flush()
+        cache.delete_many(self.cache_keys)
+
+    def expose_samples(self, values: dict) -> List[str]:
+        return [f'{self.name} {values.get(self.cache_key) or 0}']
+
+    def expose(self, values: dict) -> str:
+        data = f'# HELP {self.name} {self.description}\n'
+        data += f'# TYPE {self.name} {self.type}\n'
+        for sample in self.expose_samples(values):
+            data += sample + '\n'
+        return data
 
 
 class Counter(Metric):
     def __init__(self, app: str, name: str, description: str):
         super().__init__(app, name, description, 'counter', None)
 
-    @_metric_method
     def inc(self, amount: int = 1):
         if amount < 0:
             raise ValueError
-        cache.incr(self.cache_key, amount)
+        MetricManager.incr(self.cache_key, amount)
 
 
 class Gauge(Metric):
     def __init__(self, app: str, name: str, description: str):
         super().__init__(app, name, description, 'gauge', None)
 
-    @_metric_method
     def set(self, amount: int):
-        cache.incr(self.cache_key, amount)
+        MetricManager.set(self.cache_key, amount)
 
 
 class Summary(Metric):
-    def __init__(self, app: str, name: str, description: str, labels: list = None):
-        self.counts = {label: 0 for label in labels}
-        super().__init__(app, name, description, 'summary', labels)
+    """Count and sum of observations, per label
+
+    Sums are kept in integer units of `1 / SUM_SCALE`, so they can be aggregated with atomic increments.
+    """
+
+    SUM_SCALE = 1000
+
+    def __init__(self, app: str, name: str, description: str, labels: list = None, metric_type: str = 'summary'):
+        super().__init__(app, name, description, metric_type, labels or [None])
+
+    def _check_label(self, label: Optional[str]):
+        if label not in self.labels:
+            raise ValueError(f'Invalid label for metric {self.name}: {label}')
+
+    def _series_key(self, series: str, label: Optional[str], *extra) -> str:
+        return '__'.join(str(part) for part in (f'metric_{self.name}_{series}', label, *extra) if part is not None)
+
+    @staticmethod
+    def _label_selector(label: Optional[str], **extra) -> str:
+        labels = {'label': label, **extra} if label is not None else extra
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+    @property
+    def cache_keys(self) -> List[str]:
+        return [self._series_key(series, label) for label in self.labels for series in ('count', 'sum')]
+
+    def get_value(self, label: str = None):
+        keys = [self._series_key('count', label), self._series_key('sum', label)]
+        values = MetricManager.get_values(keys)
+        return {'count': values.get(keys[0]) or 0, 'sum': (values.get(keys[1]) or 0) / self.SUM_SCALE}
 
-    @_metric_method
     def observe(self, amount: int, label: str = None):
-        pass
+        self._check_label(label)
+        MetricManager.incr(self._series_key('count', label), 1)
+        MetricManager.incr(self._series_key('sum', label), round(amount * self.SUM_SCALE))
+
+    def expose_samples(self, values: dict) -> List[str]:
+        samples = []
+        for label in self.labels:
+            selector = self._label_selector(label)
+            total = (values.get(self._series_key('sum', label)) or 0) / self.SUM_SCALE
+            samples.append(f'{self.name}_count{selector} {values.get(self._series_key("count", label)) or 0}')
+            samples.append(f'{self.name}_sum{selector} {total}')
+        return samples
+
 
+class Histogram(Summary):
+    """Observations counted in cumulative buckets, per label, besides their count and sum"""
 
-class Histogram(Metric):
-    def __init__(self, app: str, name: str, description: str, labels: list = None):
-        self.counts = {label: 0 for label in labels}
-        super().__init__(app, name, description, 'histogram', labels)
+    def __init__(self, app: str, name: str, description: str, labels: list = None, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = sorted(buckets)
+        super().__init__(app, name, description, labels, metric_type='histogram')
+
+    @property
+    def cache_keys(self) -> List[str]:
+        return super().cache_keys + [
+            self._series_key('bucket', label, bucket) for label in self.labels for bucket in self.buckets
+        ]
 
-    @_metric_method
     def observe(self, amount: int, label: str = None):
-        pass
+        super().observe(amount, label)
+        for bucket in self.buckets:
+            if amount <= bucket:
+                # Only the smallest bucket is stored, cumulative counts are calculated on exposition
+                MetricManager.incr(self._series_key('bucket', label, bucket), 1)
+                break
+
+    def expose_samples(self, values: dict) -> List[str]:
+        samples = []
+        for label in self.labels:
+            cumulative_count = 0
+            for bucket in self.buckets:
+                cumulative_count += values.get(self._series_key('bucket', label, bucket)) or 0
+                samples.append(f'{self.name}_bucket{self._label_selector(label, le=bucket)} {cumulative_count}')
+            count = values.get(self._series_key('count', label)) or 0
+            samples.append(f'{self.name}_bucket{self._label_selector(label, le="+Inf")} {count}')
+        return samples + super().expose_samples(values)
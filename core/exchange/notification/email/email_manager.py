@@ -10,6 +10,7 @@ from exchange.base.formatting import f_m
 from exchange.base.helpers import batcher, get_base_api_url
 from exchange.base.logging import metric_incr, report_exception
 from exchange.base.models import Settings
+from exchange.notification.email import email_renderer
 from exchange.notification.email.email_utils import filter_no_send_emails
 from exchange.security.functions import get_emergency_cancel_url
 
@@ -144,7 +145,8 @@ class EmailManager:
     def send_mail_many(cls, mail_kwargs: List[dict]):
         """Sends (and logs) the emails based on config. If email logging or
         broker is enabled, produce schemas to Kafka. If broker is not enabled,
-        actually send the emails via `mail.send_many()`.
+        actually send the emails via `mail.send_many()`. Templated emails are
+        rendered with the cached templates of `email_renderer`.
 
         Args:
             mail_kwargs: the exact kwargs as `mail.send_many`; also the
@@ -157,7 +159,8 @@ class EmailManager:
         if not mail_kwargs:
             return
 
-        mail.send_many(mail_kwargs)
+        email_renderer.send_many([kw for kw in mail_kwargs if isinstance(kw.get('template'), str)])
+        mail.send_many([kw for kw in mail_kwargs if not isinstance(kw.get('template'), str)])
         grouped_metrics = defaultdict(int)
         for kw in mail_kwargs:
             backend = kw.get('backend')
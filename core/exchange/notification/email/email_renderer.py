@@ -0,0 +1,132 @@
+""" Cached rendering of post_office email templates """
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import make_msgid
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template import Context, Template
+from django.utils.html import escape
+from post_office.models import PRIORITY, STATUS, Email, EmailTemplate
+from post_office.settings import get_message_id_enabled, get_message_id_fqdn
+from post_office.signals import email_queued
+from post_office.utils import get_email_template, parse_emails, parse_priority
+
+# Context fields that differ per recipient, substituted into a render shared by all recipients
+PERSONAL_FIELDS = ('anti_phishing_code',)
+RENDERS_CACHE_SIZE = 256
+
+
+@dataclass
+class CompiledEmailTemplate:
+    template: EmailTemplate
+    version: tuple
+    subject: Template
+    content: Template
+    html_content: Template
+
+
+_compiled_templates: Dict[str, CompiledEmailTemplate] = {}
+_renders: 'OrderedDict[tuple, Tuple[str, str, str]]' = OrderedDict()
+_renders_lock = threading.Lock()
+
+
+def get_compiled_template(name: str) -> CompiledEmailTemplate:
+    """Return the parsed email template, which is parsed again only when the template is updated"""
+    template = get_email_template(name)
+    version = (template.pk, template.last_updated)
+    compiled = _compiled_templates.get(name)
+    if compiled is None or compiled.version != version:
+        compiled = CompiledEmailTemplate(
+            template=template,
+            version=version,
+            subject=Template(template.subject),
+            content=Template(template.content),
+            html_content=Template(template.html_content),
+        )
+        _compiled_templates[name] = compiled
+    return compiled
+
+
+def _get_placeholder(field: str) -> str:
+    return f'__personal_field_{field}__'
+
+
+def _get_render_key(compiled: CompiledEmailTemplate, context: dict) -> Optional[tuple]:
+    try:
+        return compiled.version, json.dumps(context, sort_keys=True, cls=DjangoJSONEncoder)
+    except TypeError:
+        return None
+
+
+def render_email(name: str, context: Optional[dict]) -> Tuple[EmailTemplate, str, str, str]:
+    """Render subject, message and html message of an email template
+
+    The template is rendered once per template version and context without personal fields,
+    and personal fields of each recipient are substituted into that shared render.
+    """
+    compiled = get_compiled_template(name)
+    context = dict(context or {})
+    personal_fields = {field: str(context.pop(field)) for field in PERSONAL_FIELDS if context.get(field)}
+    context.update({field: _get_placeholder(field) for field in personal_fields})
+
+    key = _get_render_key(compiled, context)
+    with _renders_lock:
+        rendered = _renders.get(key) if key else None
+        if rendered:
+            _renders.move_to_end(key)
+    if rendered is None:
+        _context = Context(context)
+        rendered = (
+            compiled.subject.render(_context),
+            compiled.content.render(_context),
+            compiled.html_content.render(_context),
+        )
+        if key:
+            with _renders_lock:
+                _renders[key] = rendered
+                if len(_renders) > RENDERS_CACHE_SIZE:
+                    _renders.popitem(last=False)
+
+    for field, value in personal_fields.items():
+        # Like other context values, personal fields are autoescaped
+        rendered = tuple(part.replace(_get_placeholder(field), escape(value)) for part in rendered)
+    return (compiled.template, *rendered)
+
+
+def send_many(kwargs_list: List[dict]):
+    """Queue emails from `post_office.mail.send_many` kwargs, rendering templates by `render_email`
+
+    Emails are created in bulk like `send_many`, without parsing template contents for each email.
+    """
+    emails = []
+    for kwargs in kwargs_list:
+        priority = parse_priority(kwargs.get('priority'))
+        if priority == PRIORITY.now:
+            raise ValueError("send_many() can't be used with priority = 'now'")
+        template, subject, message, html_message = render_email(kwargs['template'], kwargs.get('context'))
+        emails.append(
+            Email(
+                from_email=kwargs.get('sender') or settings.DEFAULT_FROM_EMAIL,
+                to=parse_emails(kwargs.get('recipients')),
+                cc=parse_emails(kwargs.get('cc')),
+                bcc=parse_emails(kwargs.get('bcc')),
+                subject=subject,
+                message=message,
+                html_message=html_message,
+                scheduled_time=kwargs.get('scheduled_time'),
+                expires_at=kwargs.get('expires_at'),
+                message_id=make_msgid(domain=get_message_id_fqdn()) if get_message_id_enabled() else None,
+                headers=kwargs.get('headers'),
+                priority=priority,
+                status=STATUS.queued,
+                backend_alias=kwargs.get('backend') or '',
+                template=template,
+            )
+        )
+    if emails:
+        Email.objects.bulk_create(emails)
+        email_queued.send(sender=Email, emails=emails)
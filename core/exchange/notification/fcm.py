@@ -1,3 +1,6 @@
+from collections import defaultdict
+from typing import List, Tuple
+
 from firebase_admin.messaging import UnregisteredError
 
 from exchange.base.connections import get_fcm  # coupling with core
@@ -28,24 +31,39 @@ def send_batch(notifications):
     return messages, results, last_notification_id
 
 
-def send_batch_fcm_notifications(notifications):
-    messages, results, last_notification_id = send_batch(notifications)
-    if not messages:
-        return last_notification_id
+def get_notification_pushes(notifications) -> list:
+    """Create FCM messages of notifications for active devices of their users, loading devices in one query"""
+    user_devices = defaultdict(list)
+    for device in FCMDevice.objects.filter(user_id__in={n.user_id for n in notifications}, is_active=True):
+        user_devices[device.user_id].append(device)
+    return [
+        device.create_notification_push(notification)
+        for notification in notifications
+        for device in user_devices[notification.user_id]
+    ]
+
 
+def collect_results(messages, responses) -> Tuple[List[int], List[int]]:
+    """Return ids of successfully sent notifications and unregistered devices, and report send metrics"""
     invalid_devices = []
     successful_notifications = []
-    success_count = 0
-    for i, response in enumerate(results.responses):
+    for i, response in enumerate(responses):
         if response.success:
-            success_count += 1
             successful_notifications.append(messages[i].notification_id)
         elif isinstance(response.exception, UnregisteredError):
             invalid_devices.append(messages[i].device.id)
 
-    metric_incr('metric_notification_fcm_count__sent', success_count)
-    metric_incr('metric_notification_fcm_count__failed', len(results.responses) - success_count)
+    metric_incr('metric_notification_fcm_count__sent', len(successful_notifications))
+    metric_incr('metric_notification_fcm_count__failed', len(responses) - len(successful_notifications))
+    return successful_notifications, invalid_devices
+
+
+def send_batch_fcm_notifications(notifications):
+    messages, results, last_notification_id = send_batch(notifications)
+    if not messages:
+        return last_notification_id
 
+    successful_notifications, invalid_devices = collect_results(messages, results.responses)
     if successful_notifications:
         Notification.objects.filter(id__in=successful_notifications).update(sent_to_fcm=True)
     if invalid_devices:
@@ -0,0 +1,142 @@
+""" Concurrent dispatcher of in-app notifications to FCM """
+import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils.timezone import now
+
+from exchange.base.connections import get_fcm  # coupling with core
+from exchange.base.decorators import measure_time  # coupling with core
+from exchange.base.logging import report_exception  # coupling with core
+from exchange.fcm.models import FCMDevice  # coupling with core
+from exchange.notification.fcm import collect_results, get_notification_pushes
+from exchange.notification.models.in_app_notification import InAppNotification as Notification
+
+
+class FCMDispatcher:
+    """Send unsent in-app notifications to FCM with a bounded number of concurrent workers
+
+    The dispatcher assigns consecutive id ranges of unsent notifications to workers, and only
+    claims a new range when a worker is free, so a backlog never piles up in memory. Each worker
+    locks rows of its range with `SKIP LOCKED`, which keeps ranges of concurrent dispatchers
+    disjoint, sends pushes in FCM batches and marks sent notifications in bulk before releasing
+    the rows. Like the previous poller, notifications failed in FCM are passed over and not retried,
+    but ranges failed with an error, e.g. a database error, are sent again in the next dispatch.
+    """
+
+    FCM_BATCH_LIMIT = 500
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        workers: int = 4,
+        start_id: Optional[int] = None,
+        max_age: datetime.timedelta = datetime.timedelta(minutes=30),
+        concurrent: Optional[bool] = None,
+    ):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.start_date = now() - max_age
+        self.concurrent = not settings.IS_TEST_RUNNER if concurrent is None else concurrent
+        if start_id is None:
+            first_notification = (
+                Notification.objects.filter(created_at__gte=self.start_date, sent_to_fcm=False)
+                .order_by('id')
+                .only('id')
+                .first()
+            )
+            start_id = first_notification.id if first_notification else 0
+        self.start_id = start_id
+        self.failed_ranges: List[Tuple[int, int]] = []
+
+    def claim_range(self) -> Optional[Tuple[int, int]]:
+        """Return the id range of the next batch of unsent notifications and move past it"""
+        ids = list(
+            Notification.objects.filter(
+                id__gte=self.start_id,
+                created_at__gte=self.start_date,
+                sent_to_fcm=False,
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[: self.batch_size]
+        )
+        if not ids:
+            return None
+        self.start_id = ids[-1] + 1
+        return ids[0], ids[-1]
+
+    @measure_time(metric='metric_notification_fcm_time', verbose=False)
+    def send_range(self, first_id: int, last_id: int) -> int:
+        """Send unsent notifications of an id range not locked by other dispatchers, returning the number sent"""
+        if self.concurrent:
+            close_old_connections()
+        try:
+            with transaction.atomic():
+                notifications = list(
+                    Notification.objects.select_for_update(skip_locked=True)
+                    .filter(id__gte=first_id, id__lte=last_id, sent_to_fcm=False)
+                    .only('id', 'user_id')
+                )
+                messages = get_notification_pushes(notifications)
+                sent_notifications, invalid_devices = set(), []
+                fcm = get_fcm()
+                for i in range(0, len(messages), self.FCM_BATCH_LIMIT):
+                    batch = messages[i : i + self.FCM_BATCH_LIMIT]
+                    successful, invalid = collect_results(batch, fcm.send_each(batch).responses)
+                    sent_notifications.update(successful)
+                    invalid_devices += invalid
+
+                if sent_notifications:
+                    Notification.objects.filter(id__in=sent_notifications).update(sent_to_fcm=True)
+                if invalid_devices:
+                    FCMDevice.objects.filter(id__in=invalid_devices).update(is_active=False)
+            return len(sent_notifications)
+        finally:
+            if self.concurrent:
+                connection.close()
+
+    def next_range(self, retry_ranges: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """Return the next id range to send, preferring ranges that failed in the previous dispatch"""
+        if retry_ranges:
+            return retry_ranges.pop(0)
+        return self.claim_range()
+
+    def dispatch(self) -> int:
+        """Send all currently unsent notifications, returning the number of notifications sent
+
+        Ranges failed with an error are kept and sent again in the next dispatch.
+        """
+        sent = 0
+        retry_ranges, self.failed_ranges = self.failed_ranges, []
+        if not self.concurrent:
+            while id_range := self.next_range(retry_ranges):
+                try:
+                    sent += self.send_range(*id_range)
+                except Exception:  # noqa: BLE001 - other ranges should still be sent
+                    report_exception()
+                    self.failed_ranges.append(id_range)
+            return sent
+
+        # FCM app is initialized once here, as concurrent initializations in workers conflict
+        get_fcm()
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fcm_dispatcher') as executor:
+            while True:
+                while len(pending) < self.workers:
+                    id_range = self.next_range(retry_ranges)
+                    if not id_range:
+                        break
+                    pending[executor.submit(self.send_range, *id_range)] = id_range
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    id_range = pending.pop(future)
+                    try:
+                        sent += future.result()
+                    except Exception:  # noqa: BLE001 - other ranges should still be sent
+                        report_exception()
+                        self.failed_ranges.append(id_range)
+        return sent
@@ -1,12 +1,9 @@
-import datetime
 import time
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils.timezone import now
 
-from exchange.notification.fcm import send_batch_fcm_notifications
-from exchange.notification.models.in_app_notification import InAppNotification as Notification
+from exchange.notification.fcm_dispatcher import FCMDispatcher
 from exchange.notification.switches import NotificationConfig
 
 
@@ -14,29 +11,23 @@ class Command(BaseCommand):
     help = 'Sends FCM messages'
 
     def add_arguments(self, parser):
-        parser.add_argument('--batch_count', nargs='?', default=100, type=int, help='Number of messages in each batch')
+        parser.add_argument('--batch_count', nargs='?', default=500, type=int, help='Number of messages in each batch')
         parser.add_argument(
             '--delay_time',
             nargs='?',
-            default=5 if settings.IS_PROD else 10,
+            default=1 if settings.IS_PROD else 10,
             type=int,
-            help='Time to delay between each cycle',
+            help='Time to delay between each cycle when there is nothing to send',
         )
         parser.add_argument('--start_id', nargs='?', type=int, help='ID of notification to start from')
+        parser.add_argument('--workers', nargs='?', default=4, type=int, help='Number of concurrent FCM batches')
 
     def handle(self, *args, **options):
-        start_date = now() - datetime.timedelta(minutes=30)
-        start_id = options['start_id']
-        if not start_id:
-            first_notif = (
-                Notification.objects.order_by('id')
-                .filter(
-                    created_at__gte=start_date,
-                    sent_to_fcm=False,
-                )
-                .first()
-            )
-            start_id = first_notif.id if first_notif else 0
+        dispatcher = FCMDispatcher(
+            batch_size=options['batch_count'],
+            workers=options['workers'],
+            start_id=options['start_id'] or None,
+        )
 
         while True:
             if not NotificationConfig.is_notification_broker_enabled():
@@ -46,14 +37,9 @@ class Command(BaseCommand):
                 time.sleep(options['delay_time'])
                 continue
             try:
-                notifications = Notification.objects.order_by('id').filter(
-                    id__gte=start_id,
-                    created_at__gte=start_date,
-                    sent_to_fcm=False,
-                )[: options['batch_count']]
-                print('Sending {} notifications from #{}...'.format(len(notifications), start_id))
-                start_id = send_batch_fcm_notifications(notifications) or start_id
-                self.stdout.write(self.style.SUCCESS('Sent.'))
+                print('Sending notifications from #{}...'.format(dispatcher.start_id))
+                sent = dispatcher.dispatch()
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} notifications.'))
                 time.sleep(options['delay_time'])
             except KeyboardInterrupt:
                 break
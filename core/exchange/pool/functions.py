@@ -1,7 +1,9 @@
-from datetime import date
+from datetime import date, datetime
 from decimal import ROUND_DOWN, Decimal
+from itertools import groupby
+from operator import itemgetter
 from time import sleep
-from typing import List, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from django.db import transaction
 from django.db.models import Count, Exists, F, OuterRef, Q, QuerySet, Sum
@@ -99,13 +101,14 @@ def populate_realized_profits_for_target_pools(from_date: date, target_pools):
         LiquidityPool.objects.bulk_update(pool_dict.values(), ('current_profit',))
 
 
-def day_in_row_factor(days: int):
-    factor = Decimal(Settings.get_value('liquidity_pool_day_in_row_factor', '0.1'))
+def day_in_row_factor(days: int, factor: Optional[Decimal] = None):
+    if factor is None:
+        factor = Decimal(Settings.get_value('liquidity_pool_day_in_row_factor', '0.1'))
     return 1 + factor * (min(days, 31) - 1)
 
 
-def effective_days(days):
-    return days * day_in_row_factor(days)
+def effective_days(days, factor: Optional[Decimal] = None):
+    return days * day_in_row_factor(days, factor)
 
 
 def calculate_user_score(user_delegation: UserDelegation, from_date: date, to_date: date) -> Decimal:
@@ -159,44 +162,105 @@ def calculate_user_score(user_delegation: UserDelegation, from_date: date, to_da
                 + 2   * effective_days(9)
     """
 
-    score = ZERO
     overtime_balance = DelegationTransaction.objects.filter(
         user_delegation=user_delegation,
         created_at__date__gt=to_date,
         transaction__isnull=False,
     ).aggregate(overtime_balance=Coalesce(Sum('amount'), ZERO))['overtime_balance']
 
-    balance = user_delegation.balance - overtime_balance
     delegation_txs = DelegationTransaction.objects.filter(
         user_delegation=user_delegation,
         created_at__date__lte=to_date,
         created_at__date__gte=from_date,
         transaction__isnull=False,
-    ).order_by('-created_at')
+    ).order_by('-created_at').values_list('amount', 'created_at')
+
+    return _calculate_score(user_delegation, overtime_balance, delegation_txs, from_date, to_date)
+
 
+def _calculate_score(
+    user_delegation: UserDelegation,
+    overtime_balance: Decimal,
+    delegation_txs: Iterable[Tuple[Decimal, datetime]],
+    from_date: date,
+    to_date: date,
+    factor: Optional[Decimal] = None,
+) -> Decimal:
+    """Calculate user delegation score from its period transactions, ordered from latest to earliest"""
+    score = ZERO
+    balance = user_delegation.balance - overtime_balance
     min_balance = balance
-    for tx in delegation_txs:
-        balance = balance - tx.amount
+    for amount, created_at in delegation_txs:
+        balance = balance - amount
 
-        if tx.amount > 0 and balance < min_balance:
+        if amount > 0 and balance < min_balance:
             # DANGER! DON'T DO THIS:
-            # delegation_days = (to_date - tx.created_at.date()).days
-            # Because tx.created_at is in utc tz but the to_date is in IR tz.
-            delegation_days = (to_date - tx.created_at.astimezone().date()).days + 1
+            # delegation_days = (to_date - created_at.date()).days
+            # Because created_at is in utc tz but the to_date is in IR tz.
+            delegation_days = (to_date - created_at.astimezone().date()).days + 1
             delegation_amount = min_balance - balance
-            score += delegation_amount * effective_days(delegation_days)
+            score += delegation_amount * effective_days(delegation_days, factor)
             min_balance = balance
 
         if balance <= ZERO:
             break
 
     min_balance_days = (to_date - max(user_delegation.created_at.astimezone().date(), from_date)).days + 1
-    score += min_balance * effective_days(min_balance_days)
+    score += min_balance * effective_days(min_balance_days, factor)
     if score < ZERO:
         raise ValueError('Delegation score cannot be negative')
     return score
 
 
+def calculate_users_score(
+    user_delegations: List[UserDelegation], from_date: date, to_date: date
+) -> Dict[int, Decimal]:
+    """Calculate score of multiple user delegations, using two queries for all of them
+
+    Overtime balances are aggregated in one grouped query, and period transactions of all
+    delegations are read in one scan ordered by delegation, so each delegation is scored
+    in a single streaming pass. Result is a dict from user delegation id to score.
+    """
+    user_delegation_ids = [user_delegation.id for user_delegation in user_delegations]
+    overtime_balances = dict(
+        DelegationTransaction.objects.filter(
+            user_delegation_id__in=user_delegation_ids,
+            created_at__date__gt=to_date,
+            transaction__isnull=False,
+        )
+        .values('user_delegation_id')
+        .annotate(overtime_balance=Sum('amount'))
+        .values_list('user_delegation_id', 'overtime_balance')
+    )
+    delegation_txs = (
+        DelegationTransaction.objects.filter(
+            user_delegation_id__in=user_delegation_ids,
+            created_at__date__lte=to_date,
+            created_at__date__gte=from_date,
+            transaction__isnull=False,
+        )
+        .order_by('user_delegation_id', '-created_at')
+        .values_list('user_delegation_id', 'amount', 'created_at')
+    )
+    txs_by_delegation = {
+        user_delegation_id: [tx[1:] for tx in txs]
+        for user_delegation_id, txs in groupby(delegation_txs.iterator(), key=itemgetter(0))
+    }
+
+    factor = Decimal(Settings.get_value('liquidity_pool_day_in_row_factor', '0.1'))
+    return {
+        user_delegation.id: _calculate_score(
+            user_delegation,
+            overtime_balances.get(user_delegation.id, ZERO),
+            txs_by_delegation.get(user_delegation.id, ()),
+            from_date,
+            to_date,
+            factor,
+        )
+        for user_delegation in user_delegations
+    }
+
+
 def populate_users_delegation_score_on_target_pools(
     from_date: date, to_date: date, target_pools: Union[List[LiquidityPool], QuerySet]
 ) -> None:
@@ -216,27 +280,31 @@ def populate_users_delegation_score_on_target_pools(
             )
         )
         .filter(is_already_done=False)
+        .only('id', 'balance', 'created_at')
+        .order_by('id')
     )
 
     batch_size = 1000
-    total_delegations = user_delegations.count()
-    num_batches = (total_delegations + batch_size - 1) // batch_size
-
-    for _ in range(num_batches):
-        batch_delegations = user_delegations[:batch_size]
-
-        user_delegation_profits = []
-        for user_delegation in batch_delegations:
-            score = calculate_user_score(user_delegation, from_date, to_date)
-            user_delegation_profit = UserDelegationProfit(
-                user_delegation=user_delegation,
-                delegation_score=score,
-                from_date=from_date,
-                to_date=to_date,
-            )
-            user_delegation_profits.append(user_delegation_profit)
-
-        UserDelegationProfit.objects.bulk_create(user_delegation_profits, batch_size=batch_size)
+    last_id = 0
+    while True:
+        batch_delegations = list(user_delegations.filter(id__gt=last_id)[:batch_size])
+        if not batch_delegations:
+            break
+        last_id = batch_delegations[-1].id
+
+        scores = calculate_users_score(batch_delegations, from_date, to_date)
+        UserDelegationProfit.objects.bulk_create(
+            [
+                UserDelegationProfit(
+                    user_delegation=user_delegation,
+                    delegation_score=scores[user_delegation.id],
+                    from_date=from_date,
+                    to_date=to_date,
+                )
+                for user_delegation in batch_delegations
+            ],
+            batch_size=batch_size,
+        )
 
 
 def populate_users_profit_on_target_pools(from_date: date, target_pools: Union[List[LiquidityPool], QuerySet]) -> None:
@@ -256,26 +324,25 @@ def populate_users_profit_on_target_pools(from_date: date, target_pools: Union[L
             .values_list('pool_id', 'current_profit')
         )
 
-        delegation_profits = delegation_profits.filter(amount__isnull=True)
-        udps_count = delegation_profits.count()
+        delegation_profits = delegation_profits.filter(amount__isnull=True).only('id', 'delegation_score')
         batch_size = 1000
-        num_batches = (udps_count + batch_size - 1) // batch_size
-
-        for _ in range(num_batches):
-            batch_base = delegation_profits[:batch_size]
-            batch_udps = []
-
-            for udp in batch_base:
-                if total_scores[udp.pool_id] != 0 and pool_profits.get(udp.pool_id, ZERO) > ZERO:
-                    udp.amount = quantize_number(
-                        udp.delegation_score * pool_profits[udp.pool_id] / total_scores[udp.pool_id],
-                        Decimal(1),
-                        ROUND_DOWN,
-                    )
-                else:
-                    udp.amount = ZERO
-                batch_udps.append(udp)
+        batch_udps = []
+        for udp in delegation_profits.iterator(chunk_size=batch_size):
+            if total_scores[udp.pool_id] != 0 and pool_profits.get(udp.pool_id, ZERO) > ZERO:
+                udp.amount = quantize_number(
+                    udp.delegation_score * pool_profits[udp.pool_id] / total_scores[udp.pool_id],
+                    Decimal(1),
+                    ROUND_DOWN,
+                )
+            else:
+                udp.amount = ZERO
+            batch_udps.append(udp)
 
+            if len(batch_udps) >= batch_size:
+                UserDelegationProfit.objects.bulk_update(batch_udps, ['amount'])
+                batch_udps = []
+
+        if batch_udps:
             UserDelegationProfit.objects.bulk_update(batch_udps, ['amount'])
 
 
@@ -309,19 +376,20 @@ def distribute_user_profit_on_target_pools(from_date: date, target_pools: Union[
         PoolProfit.objects.bulk_update(pool_profits, ('transaction',))
 
     udps = (
-        udps.filter(transaction__isnull=True, from_date=from_date)
-        .select_related('user_delegation')
-        .prefetch_related('user_delegation__pool', 'user_delegation__user')
+        udps.filter(transaction__isnull=True, from_date=from_date, amount__gt=ZERO)
+        .select_related('user_delegation__pool', 'user_delegation__user')
+        .order_by('id')
     )
 
-    for i, udp in enumerate(udps):
+    batch_size = 1000
+    last_id = 0
+    while True:
+        batch_udps = list(udps.filter(id__gt=last_id)[:batch_size])
+        if not batch_udps:
+            break
+        last_id = batch_udps[-1].id
         with transaction.atomic():
-            udp.create_transaction()
-            udp.save(update_fields=('transaction',))
-
-        # To create some time for other parts of system
-        if i % 100 == 0:
-            sleep(0.1)
+            UserDelegationProfit.create_bulk_transactions(batch_udps)
 
 
 def calculate_apr(pool: LiquidityPool, total_score: Decimal, from_date: date, to_date: date) -> Union[Decimal, None]:
@@ -3,7 +3,7 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta
 from decimal import ROUND_DOWN, Decimal, DecimalException
 from time import sleep
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from django.conf import settings
 from django.db import connection, models
@@ -131,6 +131,38 @@ class LiquidityPool(models.Model):
     def unfilled_capacity(self) -> Decimal:
         return self.capacity + self.revoked_capacity - self.filled_capacity
 
+    @classmethod
+    def populate_balances(cls, pools: List['LiquidityPool']) -> None:
+        """Fill `src_wallet`, `unblocked_balance` and `available_balance` of pools with bulk queries
+
+        Wallets of all pools and their blocked balances are read with one aggregate query each,
+        instead of three queries per pool on first access of `available_balance`.
+        """
+        from exchange.usermanagement.block import BalanceBlockManager
+
+        if not pools:
+            return
+        wallets = {
+            (wallet.user_id, wallet.currency): wallet
+            for wallet in Wallet.objects.filter(
+                user_id__in={pool.manager_id for pool in pools},
+                currency__in={pool.currency for pool in pools},
+                type=Wallet.WALLET_TYPE.spot,
+            )
+        }
+        balances_in_order = BalanceBlockManager.get_margin_balances_in_order()
+        balances_in_temporal_assessment = BalanceBlockManager.get_margin_balances_in_temporal_assessment()
+        for pool in pools:
+            wallet = wallets.get((pool.manager_id, pool.currency))
+            if wallet is not None:
+                pool.__dict__['src_wallet'] = wallet
+            in_order = balances_in_order.get(pool.currency, ZERO)
+            if pool.currency in DST_CURRENCIES:
+                in_order += balances_in_temporal_assessment.get(pool.currency, ZERO)
+            unblocked_balance = pool.src_wallet.balance - in_order
+            pool.__dict__['unblocked_balance'] = unblocked_balance
+            pool.__dict__['available_balance'] = max(unblocked_balance - pool.revoked_capacity, ZERO)
+
     @property
     def min_delegation(self) -> Decimal:
         min_delegation_in_rial = Settings.get_decimal(
@@ -910,6 +942,58 @@ class UserDelegationProfit(models.Model):
 
         db_transaction.on_commit(lambda: self.notify())
 
+    @classmethod
+    def create_bulk_transactions(cls, udps: list) -> None:
+        """Transfer profits of multiple user delegations to user wallets at once
+
+        Profits with existing transactions or non-positive amounts are ignored, and
+        profits larger than a single transaction are paid through `create_transaction`.
+        Must be called in an atomic block.
+        """
+        from exchange.wallet.wallet_manager import WalletBulkCreditManager
+
+        validate_transaction_is_atomic()
+        udps = [udp for udp in udps if not udp.transaction_id and udp.amount and udp.amount > ZERO]
+        bulk_udps = []
+        for udp in udps:
+            if udp.amount > TRANSACTION_MAX:
+                udp.create_transaction()
+                udp.save(update_fields=('transaction',))
+            else:
+                bulk_udps.append(udp)
+        if not bulk_udps:
+            return
+
+        credit_manager = WalletBulkCreditManager()
+        for udp in bulk_udps:
+            credit_manager.add_credit(
+                user_id=udp.user_delegation.user_id,
+                currency=RIAL,
+                amount=udp.amount,
+                tp='delegate',
+                description=f'واریز سود استخر {_t(get_currency_codename(udp.user_delegation.pool.currency))}',
+                ref_module='DelegationProfitDst',
+                ref_id=udp.pk,
+            )
+        paid_udps = []
+        for udp, transaction in zip(bulk_udps, credit_manager.commit()):
+            if transaction is not None:
+                udp.transaction = transaction
+                paid_udps.append(udp)
+        if not paid_udps:
+            return
+
+        cls.objects.bulk_update(paid_udps, ('transaction',))
+        UserDelegation.objects.filter(pk__in=[udp.user_delegation_id for udp in paid_udps]).update(
+            total_profit=F('total_profit')
+            + Case(
+                *[When(pk=udp.user_delegation_id, then=udp.amount) for udp in paid_udps],
+                default=ZERO,
+                output_field=models.DecimalField(),
+            )
+        )
+        db_transaction.on_commit(lambda: [udp.notify() for udp in paid_udps])
+
     def _notify(self, message: str, template: str):
         Notification.objects.create(user=self.user_delegation.user, message=message)
         EmailManager.send_email(
@@ -966,10 +1050,16 @@ class PoolUnfilledCapacityAlert(models.Model):
         email_per_pool = defaultdict(list)
         user_notifications = []
 
+        # Pools are joined per notification, so evaluate each pool's unfilled capacity once
+        pools_have_capacity = {}
         for notification in notifications:
-            if PriceEstimator.get_rial_value_by_best_price(
-                notification.pool.unfilled_capacity, notification.pool.currency, 'buy'
-            ) > cls.NOTIFICATION_THRESHOLD and notification.pool.has_provider_access(notification.user):
+            pool = notification.pool
+            if pool.id not in pools_have_capacity:
+                pools_have_capacity[pool.id] = (
+                    PriceEstimator.get_rial_value_by_best_price(pool.unfilled_capacity, pool.currency, 'buy')
+                    > cls.NOTIFICATION_THRESHOLD
+                )
+            if pools_have_capacity[pool.id] and pool.has_provider_access(notification.user):
                 message = (
                     f'ظرفیت استخر {_t(get_currency_codename(notification.pool.currency))} افزایش پیدا کرده است.'
                     f'جهت مشارکت، لطفا به پنل کاربری خود در نوبیتکس و بخش استخر مشارکت مراجعه فرمایید.'
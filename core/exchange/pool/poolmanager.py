@@ -164,7 +164,8 @@ class PoolManager:
     def notify_minimum_available_ratio(cls):
         pools = LiquidityPool.objects.filter(is_active=True)
         subquery = PoolMinimumAvailableRatioAlert.objects.filter(pool=OuterRef("pk"))
-        pools = pools.annotate(has_ratio_alert=Exists(subquery))
+        pools = list(pools.annotate(has_ratio_alert=Exists(subquery)))
+        LiquidityPool.populate_balances(pools)
 
         alerts = []
         activate_pool_alerts = []
@@ -0,0 +1,119 @@
+""" In-memory Price Alert Engine """
+import bisect
+import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from exchange.pricealert.models import PriceAlert
+
+
+class MarketAlertIndex:
+    """Sorted thresholds of active price alerts of one market
+
+    Alerts for rising prices (`param_direction=True`) and falling prices are kept in two lists
+    sorted by threshold, so all alerts crossed by a price are found with a binary search and
+    removed as a contiguous slice.
+    """
+
+    def __init__(self):
+        self.above: List[Tuple[Decimal, int]] = []
+        self.below: List[Tuple[Decimal, int]] = []
+
+    def __len__(self):
+        return len(self.above) + len(self.below)
+
+    def add(self, alert_id: int, direction: bool, value: Decimal) -> None:
+        bisect.insort(self.above if direction else self.below, (value, alert_id))
+
+    def pop_crossed(self, price: Decimal) -> List[int]:
+        """Remove and return ids of alerts crossed by the price"""
+        # Alerts above are crossed by prices not less than the threshold, and vice versa
+        above_end = bisect.bisect_right(self.above, (price, float('inf')))
+        below_start = bisect.bisect_left(self.below, (price,))
+        crossed = [alert_id for _, alert_id in self.above[:above_end]]
+        crossed += [alert_id for _, alert_id in self.below[below_start:]]
+        del self.above[:above_end]
+        del self.below[below_start:]
+        return crossed
+
+
+class PriceAlertEngine:
+    """Detect crossed price alerts of all markets using in-memory threshold indexes
+
+    Active price alerts are loaded into per-market indexes once per `REFRESH_INTERVAL`, and
+    last trade prices of all markets are read with a single cache call on each check. Triggered
+    alerts are removed from indexes until next refresh, when alerts still in their cooldown
+    period are skipped.
+    """
+
+    REFRESH_INTERVAL = datetime.timedelta(seconds=30)
+
+    def __init__(self):
+        self.indexes: Dict[int, MarketAlertIndex] = {}
+        self.refreshed_at: Optional[datetime.datetime] = None
+
+    @staticmethod
+    def is_in_cooldown(alert: PriceAlert, nw: datetime.datetime) -> bool:
+        if alert.is_one_time or not alert.last_alert:
+            return False
+        interval = datetime.timedelta(minutes=max(alert.cooldown or 1440, 15))
+        return alert.last_alert > nw - interval
+
+    def refresh(self) -> None:
+        """Rebuild market indexes from active price alerts"""
+        nw = now()
+        alerts = (
+            PriceAlert.objects.filter(
+                tp=PriceAlert.TYPES.price,
+                param_direction__isnull=False,
+                market__is_active=True,
+            )
+            .only('id', 'market_id', 'param_direction', 'param_value', 'cooldown', 'last_alert')
+            .iterator(chunk_size=5000)
+        )
+        indexes = {}
+        for alert in alerts:
+            if not alert.param_value or self.is_in_cooldown(alert, nw):
+                continue
+            if alert.market_id not in indexes:
+                indexes[alert.market_id] = MarketAlertIndex()
+            indexes[alert.market_id].add(alert.id, alert.param_direction, alert.param_value)
+        self.indexes = indexes
+        self.refreshed_at = nw
+
+    def get_market_prices(self) -> Dict[int, Decimal]:
+        keys = {f'market_{market_id}_last_price': market_id for market_id in self.indexes}
+        prices = cache.get_many(list(keys))
+        return {keys[key]: price for key, price in prices.items() if price}
+
+    def check(self) -> int:
+        """Send notifications of alerts crossed by current market prices, returning the number of alerts"""
+        if self.refreshed_at is None or self.refreshed_at < now() - self.REFRESH_INTERVAL:
+            self.refresh()
+
+        prices = self.get_market_prices()
+        crossed_ids = []
+        for market_id, price in prices.items():
+            crossed_ids += self.indexes[market_id].pop_crossed(price)
+        if not crossed_ids:
+            return 0
+
+        # Alerts may be changed by users after the last refresh
+        alerts = [
+            alert
+            for alert in PriceAlert.objects.filter(id__in=crossed_ids, tp=PriceAlert.TYPES.price).select_related(
+                'market', 'user'
+            )
+            if alert.param_value
+            and alert.market_id in prices
+            and (
+                alert.param_value <= prices[alert.market_id]
+                if alert.param_direction
+                else alert.param_value >= prices[alert.market_id]
+            )
+        ]
+        PriceAlert.send_notifications(alerts)
+        return len(alerts)
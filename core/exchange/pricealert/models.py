@@ -1,6 +1,7 @@
 """ Price Alert Models """
 import datetime
 from decimal import Decimal
+from typing import List
 
 from django.core.cache import cache
 from django.db import models
@@ -83,6 +84,10 @@ class PriceAlert(models.Model):
         # Other types are not implemented yet
         return False
 
+    def get_text_key(self) -> tuple:
+        """Return the parameters that alert texts of a market depend on."""
+        return self.market_id, self.tp, self.param_direction, self.param_value
+
     def get_text(self):
         """Return notification text for this alert."""
         market_price = self.get_current_market_price()
@@ -137,3 +142,42 @@ class PriceAlert(models.Model):
         else:
             self.last_alert = now()
             self.save(update_fields=['last_alert'])
+
+    @classmethod
+    def send_notifications(cls, alerts: List['PriceAlert']) -> None:
+        """Send notifications of many active alerts, with bulk notification and alert updates.
+
+        Alerts with the same parameters share their text, which is only rendered once.
+        """
+        notifications = []
+        texts = {}
+        for alert in alerts:
+            text_key = alert.get_text_key()
+            text = texts.get(text_key)
+            if text is None:
+                text = texts[text_key] = alert.get_text()
+            if alert.channel in [4, 5, 6, 7]:
+                UserSms.objects.create(
+                    user=alert.user,
+                    tp=UserSms.TYPES.price_alert,
+                    to=alert.user.mobile,
+                    text=text,
+                )
+            if alert.channel in [2, 3, 6, 7]:
+                EmailManager.send_email(
+                    alert.user.email,
+                    'template',
+                    data={
+                        'title': 'اعلان تغییر قیمت',
+                        'content': text,
+                    },
+                    priority='medium',
+                )
+            if alert.channel in [1, 3, 5, 7]:
+                notifications.append(Notification(user=alert.user, message=text))
+        if notifications:
+            # Skips the presave signal, but NotificationManager.bulk_create sends to telegram and broker itself
+            Notification.objects.bulk_create(notifications)
+        # Set last alerting time
+        cls.objects.filter(id__in=[alert.id for alert in alerts if alert.is_one_time]).delete()
+        cls.objects.filter(id__in=[alert.id for alert in alerts if not alert.is_one_time]).update(last_alert=now())
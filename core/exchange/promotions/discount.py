@@ -1,12 +1,11 @@
 import datetime
 import json
-import math
 from decimal import Decimal
 from typing import Dict, Iterable, List, Optional, Tuple, Type
 
 import pytz
-from django.db import IntegrityError, transaction
-from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Q, Sum, When
 from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 
@@ -35,9 +34,11 @@ from exchange.promotions.models import (
     default_trade_types,
 )
 from exchange.wallet.models import Transaction, Wallet
+from exchange.wallet.wallet_manager import WalletBulkCreditManager
 
 RESTRICTIONS = [UserRestriction.RESTRICTION.Trading, UserRestriction.RESTRICTION.WithdrawRequestRial]
 BATCH_SIZE = 1000
+SEGMENTATION_BATCH_SIZE = 50000
 
 
 def get_user_discount_batch_file_information(we_ids: List[str], activation_date: datetime.date,
@@ -45,47 +46,52 @@ def get_user_discount_batch_file_information(we_ids: List[str], activation_date:
     """
         This function reads user_discount_batch file and make users dict
         errors of this file, write in details dict
+
+        Each chunk of ids is joined against users, restrictions and active user discounts in a single query.
     """
     details = {}
-    uuids = set()
+    uuids = {}
 
     for user_web_id in we_ids:
         user_web_id = user_web_id.strip()
         if user_web_id:
             try:
-                parse_uuid(user_web_id)
-                uuids.add(user_web_id)
+                uuids[user_web_id] = str(parse_uuid(user_web_id))
             except ParseError:
                 details[user_web_id] = 'invalid_uuid_error'
-    uuids = list(uuids)
-    users_web_id = set()
+    web_ids = list(uuids)
     users = {}
 
-    query_filter_user_discount_date = Q(activation_date__lte=end_date, end_date__gte=activation_date)
-
-    number_of_batch = math.ceil(len(uuids) / BATCH_SIZE)
-    for i in range(number_of_batch):
-        batch_uuids = uuids[i * BATCH_SIZE:(i + 1) * BATCH_SIZE]
-        users_data = User.objects.filter(webengage_cuid__in=batch_uuids).values('id', 'webengage_cuid').annotate(
-            restricted=Exists(UserRestriction.objects.filter(user_id=OuterRef('id'), restriction__in=RESTRICTIONS)),
-            discounted=Exists(
-                UserDiscount.objects.filter(user_id=OuterRef('id'), discount__status=Discount.STATUS.active).filter(
-                    query_filter_user_discount_date)), )
-        for user_data in users_data:
-            web_id_str = str(user_data['webengage_cuid'])
-            if user_data['restricted']:
-                details[web_id_str] = 'user_restriction_error'
-            elif user_data['discounted']:
-                details[web_id_str] = 'active_discount_exist_error'
-            else:
-                users[user_data['id']] = web_id_str
-
-            users_web_id.add(web_id_str)
-
-    # check webengage ids exist in Database
-    for u_id in uuids:
-        if u_id not in users_web_id:
-            details[u_id] = 'webengage_id_error'
+    query = f'''
+        SELECT ids.web_id, u.id,
+            EXISTS (
+                SELECT 1 FROM {UserRestriction._meta.db_table} r
+                WHERE r.user_id = u.id AND r.restriction = ANY(%s)
+            ),
+            EXISTS (
+                SELECT 1 FROM {UserDiscount._meta.db_table} ud
+                JOIN {Discount._meta.db_table} d ON d.id = ud.discount_id
+                WHERE ud.user_id = u.id AND d.status = %s AND ud.activation_date <= %s AND ud.end_date >= %s
+            )
+        FROM unnest(%s::text[], %s::uuid[]) AS ids(web_id, cuid)
+        LEFT JOIN {User._meta.db_table} u ON u.webengage_cuid = ids.cuid
+    '''
+    with connection.cursor() as cursor:
+        for i in range(0, len(web_ids), SEGMENTATION_BATCH_SIZE):
+            batch_web_ids = web_ids[i:i + SEGMENTATION_BATCH_SIZE]
+            cursor.execute(query, [
+                RESTRICTIONS, Discount.STATUS.active, end_date, activation_date,
+                batch_web_ids, [uuids[web_id] for web_id in batch_web_ids],
+            ])
+            for web_id, user_id, restricted, discounted in cursor.fetchall():
+                if user_id is None:
+                    details[web_id] = 'webengage_id_error'
+                elif restricted:
+                    details[web_id] = 'user_restriction_error'
+                elif discounted:
+                    details[web_id] = 'active_discount_exist_error'
+                else:
+                    users[user_id] = web_id
 
     return users, details
 
@@ -94,13 +100,14 @@ def create_user_discount_bulk(user_ids: List[Type[int]], activation_date: dateti
                               end_date: datetime.date, discount_batch_id: int, discount: Discount) -> int:
     """
         This function creates user_discounts and return the number of user_discounts were created
+
+        Rows are inserted from arrays of user ids by `INSERT ... SELECT`, without building model instances.
     """
-    number_of_user_discounts = min(len(user_ids), int(discount.budget_remain / discount.amount_rls))
-    budget_required = discount.amount_rls * number_of_user_discounts
-    user_discounts = [UserDiscount(user_id=user_id, discount_id=discount.id, amount_rls=discount.amount_rls,
-                                   activation_date=activation_date, end_date=end_date,
-                                   discount_batch_id=discount_batch_id)
-                      for user_id in user_ids[:number_of_user_discounts]]
+    query = f'''
+        INSERT INTO {UserDiscount._meta.db_table}
+            (user_id, discount_id, amount_rls, activation_date, end_date, created_at, discount_batch_id)
+        SELECT user_id, %s, %s, %s, %s, %s, %s FROM unnest(%s::int[]) AS user_ids(user_id)
+    '''
 
     number_of_try = 0
     while number_of_try < 100:
@@ -115,7 +122,13 @@ def create_user_discount_bulk(user_ids: List[Type[int]], activation_date: dateti
             try:
                 discount.budget_remain = F('budget_remain') - budget_required
                 discount.save(update_fields=['budget_remain'])
-                UserDiscount.objects.bulk_create(user_discounts[:number_of_user_discounts], batch_size=BATCH_SIZE)
+                created_at = now()
+                with connection.cursor() as cursor:
+                    for i in range(0, number_of_user_discounts, SEGMENTATION_BATCH_SIZE):
+                        cursor.execute(query, [
+                            discount.id, discount.amount_rls, activation_date, end_date, created_at,
+                            discount_batch_id, user_ids[i:min(i + SEGMENTATION_BATCH_SIZE, number_of_user_discounts)],
+                        ])
                 return number_of_user_discounts
             except IntegrityError:
                 number_of_try += 1
@@ -234,8 +247,9 @@ def get_order_matching_amount_per_user(
 
     order_matchings = order_matchings.values_list('buyer_id', 'seller_id', 'buy_fee_amount', 'sell_fee_amount',
                                                   'market__dst_currency', 'rial_value', 'matched_amount',
-                                                  'matched_price')
+                                                  'matched_price').iterator(chunk_size=BATCH_SIZE)
     orders_matching_data = {}
+    user_ids = set(user_ids)
 
     def add_matching_data(user_id: int, fee: Decimal, dst_to_rial: Decimal):
         if user_id in orders_matching_data:
@@ -273,43 +287,78 @@ def create_negative_transaction_for_system_fee_wallet(amount: int, discount_id:
     fee_transaction.commit()
 
 
-def create_transaction_for_user_discount(user_discount: UserDiscount, amount: Decimal) -> None:
+def create_transactions_for_user_discounts(payments: List[Tuple[UserDiscount, int]]) -> None:
     """
-        This function try creating a transaction for discount
+        This function pays discounts of many user_discounts at once, with bulk wallet transactions
+        and one aggregated system-fee transaction per discount
     """
     with transaction.atomic():
-        tr_dst = Wallet.get_user_wallet(user_discount.user, RIAL).create_transaction(
-            tp='discount', amount=amount,
-            description=(
-                f'تخفیف کمپین {user_discount.discount.name} مطابق معاملات شما در 24ساعت گذشته به حساب شما واریز شد.'
-            )
+        discount_transaction_logs = DiscountTransactionLog.objects.bulk_create(
+            [DiscountTransactionLog(user_discount=user_discount, amount=amount) for user_discount, amount in payments]
         )
+        credit_manager = WalletBulkCreditManager()
+        for (user_discount, amount), discount_transaction_log in zip(payments, discount_transaction_logs):
+            credit_manager.add_credit(
+                user_id=user_discount.user_id,
+                currency=RIAL,
+                amount=Decimal(amount),
+                tp='discount',
+                description=(
+                    f'تخفیف کمپین {user_discount.discount.name} مطابق معاملات شما در 24ساعت گذشته به حساب شما واریز شد.'
+                ),
+                ref_module='DiscountDst',
+                ref_id=discount_transaction_log.id,
+            )
 
-        if not tr_dst:
-            report_event('CreateTransactionError', extras={'src': 'CreateTransactionForUserDiscount'})
+        paid_logs = []
+        unpaid_log_ids = []
+        paid_amounts = {}
+        discount_amounts = {}
+        for (user_discount, amount), discount_transaction_log, tr_dst in zip(
+            payments, discount_transaction_logs, credit_manager.commit()
+        ):
+            if not tr_dst:
+                report_event('CreateTransactionError', extras={'src': 'CreateTransactionsForUserDiscounts'})
+                unpaid_log_ids.append(discount_transaction_log.id)
+                continue
+            discount_transaction_log.transaction = tr_dst
+            paid_logs.append(discount_transaction_log)
+            paid_amounts[user_discount.id] = amount
+            discount_amounts[user_discount.discount_id] = discount_amounts.get(user_discount.discount_id, 0) + amount
+
+        if unpaid_log_ids:
+            DiscountTransactionLog.objects.filter(id__in=unpaid_log_ids).delete()
+        if not paid_logs:
             return
 
-        discount_transaction_log = DiscountTransactionLog.objects.create(user_discount=user_discount, amount=amount)
-        tr_dst.commit(ref=Transaction.Ref('DiscountDst', discount_transaction_log.id))
-        discount_transaction_log.transaction = tr_dst
-        discount_transaction_log.save(update_fields=['transaction'])
-
-        user_discount.amount_rls = F('amount_rls') - amount
-        user_discount.save(update_fields=['amount_rls'])
-        create_negative_transaction_for_system_fee_wallet(amount, user_discount.discount_id)
+        DiscountTransactionLog.objects.bulk_update(paid_logs, ['transaction'], batch_size=BATCH_SIZE)
+        UserDiscount.objects.filter(id__in=paid_amounts).update(
+            amount_rls=F('amount_rls')
+            - Case(
+                *[When(id=user_discount_id, then=amount) for user_discount_id, amount in paid_amounts.items()],
+                default=0,
+                output_field=DecimalField(),
+            )
+        )
+        for discount_id, amount in discount_amounts.items():
+            create_negative_transaction_for_system_fee_wallet(amount, discount_id)
 
 
 def calculate_user_discount(user_discounts: List[UserDiscount],
                             matching_fee_per_user: Dict[int, int], percent: int) -> None:
     """
-        This function calculates discount for each active user_discount
+        This function calculates discount for each active user_discount and pays them in batches
     """
+    payments = []
     for user_discount in user_discounts:
         if user_discount.user_id in matching_fee_per_user:
             amount = int(min(matching_fee_per_user[user_discount.user_id] * percent * Decimal('0.01'),
                              user_discount.amount_rls))
             if amount > 0:
-                create_transaction_for_user_discount(user_discount, amount)
+                payments.append((user_discount, amount))
+
+    for i in range(0, len(payments), BATCH_SIZE):
+        create_transactions_for_user_discounts(payments[i:i + BATCH_SIZE])
 
 
 def calculate_discount(
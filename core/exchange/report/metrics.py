@@ -132,6 +132,7 @@ TIME_METRICS_WITH_LABELS = {
     'margin_tasks_process_time': ['task'],
     'cobanking_thirdparty_services_time': ['provider', 'method', 'result'],
     'cobank_deposit_settlement_lag': ['bank'],
+    'liquidator_liquidation_status_change_duration': ['from_status', 'to_status'],
     'matcher_process_time': ['function'],
 }
 
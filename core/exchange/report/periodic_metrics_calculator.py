@@ -1,16 +1,19 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from decimal import Decimal
 from functools import partial
 from typing import Any, ClassVar, Dict, List, Optional
 
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connections
 from django.db.models import Count
 from post_office.models import Email as SentEmail
 
 from exchange.accounts.models import User
-from exchange.base.logging import report_exception
+from exchange.base.logging import report_event, report_exception
 from exchange.base.metrics import broker_on_error
-from exchange.base.models import PRICE_PRECISIONS, RIAL, TETHER, get_currency_codename
+from exchange.base.models import PRICE_PRECISIONS, RIAL, TETHER, get_currency_codename, get_market_symbol
 from exchange.base.producers import metric_producer
 from exchange.broker.broker.schema import MetricSchema
 from exchange.broker.broker.topics import Topics
@@ -21,27 +24,86 @@ from exchange.market.models import Market
 class PeriodicMetricsCalculator:
     IMPORTANT_CURRENCIES: ClassVar[List[str]] = ['btc', 'trx', 'doge', 'shib']
     CELERY_QUEUES: ClassVar[List[str]] = []
+    # Module name to its method, in the order of metrics output
+    MODULES: ClassVar[Dict[str, str]] = {
+        'userLevels': 'set_user_level_metrics',
+        'importantPrices': 'set_important_coins_price_metrics',
+        'marketPrices': 'set_market_prices_metrics',
+        'emails': 'set_email_metrics',
+        'celery': 'set_celery_metrics',
+        'counters': 'set_custom_metrics',
+    }
+    MODULE_TIME_BUDGET = 5  # seconds
 
-    def __init__(self, target: str = 'redis', selected_modules: Optional[List[str]] = None):
+    def __init__(
+        self,
+        target: str = 'redis',
+        selected_modules: Optional[List[str]] = None,
+        concurrent: Optional[bool] = None,
+    ):
         self.target = target
         self.selected_modules = selected_modules
+        self.concurrent = not settings.IS_TEST_RUNNER if concurrent is None else concurrent
         self.__class__.CELERY_QUEUES = self.set_celery_queues()
         self._prices_binance = None
-        self._usdt_price = None
+        self._markets: Optional[List[Market]] = None
+        self._market_values: Dict[str, Any] = {}
+        self._snapshot_lock = threading.Lock()
+        self._module_metrics = threading.local()
         self._metric_prefix: str = 'nobitex_' if target == 'redis' else ''
         self._metrics: List[MetricSchema] = []
 
+    def load_markets_snapshot(self) -> None:
+        """Load markets and their cached prices once, to be shared by all modules"""
+        with self._snapshot_lock:
+            if self._markets is not None:
+                return
+            markets = list(Market.objects.all())
+            keys = [MarkPriceCalculator.CACHE_KEY.format(src_currency=src) for src in {m.src_currency for m in markets}]
+            for market in markets:
+                keys += [
+                    f'market_{market.id}_last_price',
+                    f'market_{market.id}_daily_count',
+                    f'orderbook_{market.symbol}_best_active_sell',
+                    f'orderbook_{market.symbol}_best_active_buy',
+                ]
+            self._market_values = cache.get_many(keys)
+            self._markets = markets
+
+    @property
+    def markets(self) -> List[Market]:
+        if self._markets is None:
+            self.load_markets_snapshot()
+        return self._markets
+
+    def get_last_trade_price(self, market: Market) -> Decimal:
+        return self._market_values.get(f'market_{market.id}_last_price') or Decimal('0')
+
+    def get_mark_price(self, src_currency: int, dst_currency: int) -> Optional[Decimal]:
+        """Same as `MarkPriceCalculator.get_mark_price`, but based on markets snapshot"""
+        usdt_mark_price = self._market_values.get(MarkPriceCalculator.CACHE_KEY.format(src_currency=src_currency))
+        if usdt_mark_price and dst_currency == RIAL:
+            usdt_price = self.usdt_market_price
+            if not usdt_price:
+                return None
+            precision = PRICE_PRECISIONS.get(get_market_symbol(src_currency, dst_currency), Decimal('1E-8'))
+            return (usdt_price * usdt_mark_price).quantize(precision)
+        return usdt_mark_price
+
+    @property
+    def usdt_market_price(self) -> Decimal:
+        """Last trade price of USDTIRT market, like `MarkPriceCalculator.get_usdt_market_price`"""
+        try:
+            for market in self.markets:
+                if market.src_currency == TETHER and market.dst_currency == RIAL:
+                    return self.get_last_trade_price(market)
+        except Exception:  # noqa: BLE001
+            report_exception()
+        return Decimal('0')
+
     @property
-    def usdt_price(self):
-        if self._usdt_price is None:
-            self._usdt_price = 0
-            try:
-                usdt_irr_market = Market.get_for(TETHER, RIAL)
-                if usdt_irr_market:
-                    self._usdt_price = int(usdt_irr_market.get_last_trade_price() or 0)
-            except Exception:  # noqa: BLE001
-                report_exception()
-        return self._usdt_price
+    def usdt_price(self) -> int:
+        return int(self.usdt_market_price)
 
     @property
     def prices_binance(self):
@@ -68,7 +130,10 @@ class PeriodicMetricsCalculator:
         return {metric_name: metric.value}
 
     def add_metric(self, **kwargs):
-        self._metrics.append(MetricSchema(**kwargs))
+        metrics = getattr(self._module_metrics, 'metrics', None)
+        if metrics is None:
+            metrics = self._metrics
+        metrics.append(MetricSchema(**kwargs))
 
     def is_module_selected(self, module: str) -> bool:
         if self.selected_modules is None:
@@ -101,8 +166,7 @@ class PeriodicMetricsCalculator:
             self.add_metric(type='gauge', name=metric, operation='set', value=value)
 
     def set_market_prices_metrics(self) -> None:
-        markets = Market.objects.all()
-        for market in markets:
+        for market in self.markets:
             src = get_currency_codename(market.src_currency)
             dst = get_currency_codename(market.dst_currency)
             symbol = market.symbol
@@ -112,19 +176,19 @@ class PeriodicMetricsCalculator:
             add_market_metric = partial(self.add_metric, type='gauge', operation='set', labels=labels)
             add_market_metric(
                 name=f'{self._metric_prefix}trades_count',
-                value=cache.get(f'market_{market.id}_daily_count', 0),
+                value=self._market_values.get(f'market_{market.id}_daily_count', 0),
             )
             add_market_metric(
                 name=f'{self._metric_prefix}price',
-                value=fmt(market.get_last_trade_price()),
+                value=fmt(self.get_last_trade_price(market)),
             )
             add_market_metric(
                 name=f'{self._metric_prefix}price_sell',
-                value=fmt(cache.get(f'orderbook_{symbol}_best_active_sell')),
+                value=fmt(self._market_values.get(f'orderbook_{symbol}_best_active_sell')),
             )
             add_market_metric(
                 name=f'{self._metric_prefix}price_buy',
-                value=fmt(cache.get(f'orderbook_{symbol}_best_active_buy')),
+                value=fmt(self._market_values.get(f'orderbook_{symbol}_best_active_buy')),
             )
             # Global price
             binance_price = Decimal(self.prices_binance.get(src, 0))
@@ -136,7 +200,7 @@ class PeriodicMetricsCalculator:
                     value=fmt(binance_price),
                 )
 
-            mark_price = MarkPriceCalculator.get_mark_price(
+            mark_price = self.get_mark_price(
                 src_currency=market.src_currency,
                 dst_currency=market.dst_currency,
             )
@@ -177,30 +241,45 @@ class PeriodicMetricsCalculator:
             value=cache.get(f'{self._metric_prefix}tradeprocessor_last_trade_id') or 0,
         )
 
-    def set_metrics(self) -> None:
-        # User metrics
-        if self.is_module_selected('userLevels'):
-            self.set_user_level_metrics()
-
-        # Global price of important coins
-        if self.is_module_selected('importantPrices'):
-            self.set_important_coins_price_metrics()
-
-        # Market trade & price metrics
-        if self.is_module_selected('marketPrices'):
-            self.set_market_prices_metrics()
+    def run_module(self, module: str) -> List[MetricSchema]:
+        """Run a metrics module, returning its own metrics"""
+        self._module_metrics.metrics = []
+        try:
+            getattr(self, self.MODULES[module])()
+        except Exception:  # noqa: BLE001
+            report_exception()
+        finally:
+            metrics, self._module_metrics.metrics = self._module_metrics.metrics, None
+            if self.concurrent:
+                connections.close_all()
+        return metrics
 
-        # Email Metrics
-        if self.is_module_selected('emails'):
-            self.set_email_metrics()
+    def set_metrics(self) -> None:
+        """Calculate metrics of selected modules
 
-        # Celery Tasks Monitoring
-        if self.is_module_selected('celery'):
-            self.set_celery_metrics()
+        In concurrent mode, modules run in parallel and metrics of modules not finished within
+        `MODULE_TIME_BUDGET` seconds are dropped, so one slow query does not delay other metrics.
+        """
+        modules = [module for module in self.MODULES if self.is_module_selected(module)]
+        if not self.concurrent:
+            for module in modules:
+                self._metrics.extend(self.run_module(module))
+            return
 
-        # Other metrics without standard format
-        if self.is_module_selected('counters'):
-            self.set_custom_metrics()
+        executor = ThreadPoolExecutor(max_workers=len(modules) or 1, thread_name_prefix='periodic_metrics')
+        futures = {}
+        try:
+            futures = {module: executor.submit(self.run_module, module) for module in modules}
+            wait(futures.values(), timeout=self.MODULE_TIME_BUDGET)
+        finally:
+            for future in futures.values():
+                future.cancel()
+            executor.shutdown(wait=False)
+        for module, future in futures.items():
+            if future.done() and not future.cancelled():
+                self._metrics.extend(future.result())
+            else:
+                report_event('PeriodicMetricsModuleTimeout', extras={'module': module})
 
     def send_metrics(self):
         """Send periodic metrics to kafka"""
@@ -93,6 +93,10 @@ CACHE_VIP_LEVEL = True
 SEGWIT_ENABLED = True
 MINER_ENABLED = True
 ASYNC_TRADE_COMMIT = not IS_TEST_RUNNER
+USE_WALLET_SNAPSHOT_CACHE = not IS_TEST_RUNNER
+USE_SETTINGS_SNAPSHOT = not IS_TEST_RUNNER
+ASYNC_API_LOGGING = not IS_TEST_RUNNER
+BATCH_WEBENGAGE_EVENTS = not IS_TEST_RUNNER
 PREVENT_INTERNAL_TRADE = IS_PROD
 # Address Types Launch
 ADDRESS_CONTRACT_ENABLED = True
@@ -2120,6 +2124,20 @@ SESSION_COOKIE_HTTPONLY = True
 FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_UPLOAD_SIZE
 RATELIMIT_USE_CACHE = 'w2' if USE_REDIS2 else 'default'
+# Serve rate limit counters from local buckets, syncing them with redis in batches
+USE_RATELIMIT_LOCAL_BUCKETS = not IS_TEST_RUNNER and os.environ.get('RATELIMIT_LOCAL_BUCKETS') != 'no'
+if USE_RATELIMIT_LOCAL_BUCKETS:
+    CACHES['ratelimit'] = {
+        'BACKEND': 'exchange.base.ratelimit_cache.BatchedRateLimitCache',
+        'OPTIONS': {
+            'TARGET_CACHE': RATELIMIT_USE_CACHE,
+            'SYNC_INTERVAL': 0.5,
+            'MAX_PENDING': 5,
+            'DIRECT_MARGIN': 20,
+        },
+    }
+    RATELIMIT_USE_CACHE = 'ratelimit'
+    SILENCED_SYSTEM_CHECKS = ['django_ratelimit.W001']
 RATELIMIT_FAIL_OPEN = True
 RATELIMIT_ENABLE = not IS_TEST_RUNNER
 
@@ -2204,6 +2222,7 @@ CELERY_TASK_ROUTES = {
     # Queue: webengage, for sending events to Web Engage service
     'task_send_user_data_to_web_engage': {'queue': 'webengage'},
     'task_send_event_data_to_web_engage': {'queue': 'webengage'},
+    'web_engage_send_queued_events_beat': {'queue': 'webengage'},
     'task_send_user_referral_data_to_web_engage': {'queue': 'webengage'},
     'task_send_user_campaign_data_to_web_engage': {'queue': 'webengage'},
     'task_send_dsn_to_web_engage': {'queue': 'webengage'},
@@ -26,44 +26,28 @@ class UpdatePlansCron(CronJob):
     schedule = Schedule(run_every_mins=5 if settings.ENV == 'prod' else 1)
     code = 'update_staking_plans_cron'
 
+    # Tasks are chained per plan in this order
+    ACTION_TASKS = (
+        ('stake', stake_assets_task),
+        ('assign_staking_to_users', assign_staking_to_users_task),
+        ('end_its_user_staking', end_users_staking_task),
+        ('release_its_user_assets', release_users_assets_task),
+        ('approve_stake_amount', system_approve_stake_amount_task),
+        ('fetch_rewards', fetch_reward_task),
+        ('announce_rewards', announce_rewards_task),
+        ('pay_rewards', pay_rewards_task),
+        ('create_extend_out_transaction', create_extend_out_transaction_task),
+        ('extend_staking', create_extend_in_transaction_task),
+        ('extend_users_assets', extend_stakings_task),
+        ('create_release_transaction', create_release_transaction_task),
+    )
+
     def run(self):
+        plan_ids_per_action = Plan.get_plan_ids_per_action()
         tasks_per_plan = defaultdict(list)
-
-        for plan_id in Plan.get_plan_ids_to_stake():
-            tasks_per_plan[plan_id].append(stake_assets_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_assign_staking_to_users():
-            tasks_per_plan[plan_id].append(assign_staking_to_users_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_end_its_user_staking():
-            tasks_per_plan[plan_id].append(end_users_staking_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_release_its_user_assets():
-            tasks_per_plan[plan_id].append(release_users_assets_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_approve_stake_amount():
-            tasks_per_plan[plan_id].append(system_approve_stake_amount_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_fetch_rewards():
-            tasks_per_plan[plan_id].append(fetch_reward_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_announce_rewards():
-            tasks_per_plan[plan_id].append(announce_rewards_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_pay_rewards():
-            tasks_per_plan[plan_id].append(pay_rewards_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_create_extend_out_transaction():
-            tasks_per_plan[plan_id].append(create_extend_out_transaction_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_extend_staking():
-            tasks_per_plan[plan_id].append(create_extend_in_transaction_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_extend_users_assets():
-            tasks_per_plan[plan_id].append(extend_stakings_task.si(plan_id))
-
-        for plan_id in Plan.get_plan_ids_to_create_release_transaction():
-            tasks_per_plan[plan_id].append(create_release_transaction_task.si(plan_id))
+        for action, task in self.ACTION_TASKS:
+            for plan_id in plan_ids_per_action.get(action, ()):
+                tasks_per_plan[plan_id].append(task.si(plan_id))
 
         for plan_id, tasks in tasks_per_plan.items():
             chain(*tasks).apply_async()
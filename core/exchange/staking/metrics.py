@@ -18,6 +18,7 @@ class Metrics(enum.Enum):
     PLANS_TO_EXTEND_STAKING_QUERY_TIME = 'query_plansToExtend'
     PLANS_TO_EXTEND_USERS_ASSETS_QUERY_TIME = 'query_plansToExtendUsersAssets'
     PLANS_TO_CREATE_RELEASE_TRANSACTION_QUERY_TIME = 'query_plansToCreateReleaseTransaction'
+    PLANS_STATE_SCAN_QUERY_TIME = 'query_plansStateScan'
     USERS_TO_APPLY_END_REQUESTS_QUERY_TIME = 'query_UsersToApplyInstantEndRequests'
 
     # Waiting for DB lock Metrics:
@@ -6,13 +6,14 @@
     not be deleted or edited.
 """
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 from decimal import ROUND_DOWN, Decimal
-from typing import List
+from typing import Dict, List
 
 from django.core.exceptions import MultipleObjectsReturned
 from django.db import models, transaction
-from django.db.models import Case, F, Q, When
+from django.db.models import Case, Exists, F, OuterRef, Q, When
 from model_utils import Choices
 
 from exchange.accounts.models import User
@@ -868,6 +869,96 @@ class Plan(models.Model):
             .distinct()
         )
 
+    @staticmethod
+    @measure_time(metric=Metrics.PLANS_STATE_SCAN_QUERY_TIME)
+    def get_plan_ids_per_action() -> Dict[str, List[int]]:
+        """Return id of plans pending each lifecycle action, using a single query
+
+        Keys are `stake`, `assign_staking_to_users`, `end_its_user_staking`,
+        `release_its_user_assets`, `approve_stake_amount`, `fetch_rewards`,
+        `announce_rewards`, `pay_rewards`, `create_extend_out_transaction`,
+        `extend_staking`, `extend_users_assets` and `create_release_transaction`,
+        each matching the result of the relevant `get_plan_ids_*` method. Transaction
+        conditions are evaluated as `EXISTS` subqueries per plan instead of joining and
+        deduplicating the whole transaction history, and schedule conditions are
+        evaluated on the loaded plan rows.
+        """
+        from exchange.staking.models import StakingTransaction
+
+        nw = ir_now()
+        plan_transactions = PlanTransaction.objects.filter(plan=OuterRef('pk'))
+        active_plan_transactions = plan_transactions.filter(child=None)
+        active_staking_transactions = StakingTransaction.objects.filter(plan=OuterRef('pk'), child=None)
+        plans = Plan.objects.annotate(
+            has_approval=Exists(plan_transactions.filter(tp=PlanTransaction.TYPES.system_stake_amount_approval)),
+            has_active_approval=Exists(
+                active_plan_transactions.filter(tp=PlanTransaction.TYPES.system_stake_amount_approval),
+            ),
+            has_positive_stake=Exists(plan_transactions.filter(tp=PlanTransaction.TYPES.stake, amount__gt=0)),
+            has_active_stake=Exists(active_plan_transactions.filter(tp=PlanTransaction.TYPES.stake)),
+            has_active_unstake=Exists(active_plan_transactions.filter(tp=PlanTransaction.TYPES.unstake)),
+            has_active_extend_out=Exists(active_plan_transactions.filter(tp=PlanTransaction.TYPES.extend_out)),
+            has_recent_fetched_reward=Exists(
+                plan_transactions.filter(
+                    tp=PlanTransaction.TYPES.fetched_reward,
+                    created_at__gt=nw - timedelta(hours=1),
+                ),
+            ),
+            has_current_announced_reward=Exists(
+                plan_transactions.filter(
+                    Q(created_at__gt=nw - OuterRef('reward_announcement_period'))
+                    | Q(created_at=OuterRef('staked_at') + OuterRef('staking_period')),
+                    tp=PlanTransaction.TYPES.announce_reward,
+                ),
+            ),
+            has_positive_give_reward=Exists(
+                plan_transactions.filter(tp=PlanTransaction.TYPES.give_reward, amount__gt=0),
+            ),
+            has_active_user_stake=Exists(active_staking_transactions.filter(tp=PlanTransaction.TYPES.stake)),
+            has_active_user_unstake=Exists(active_staking_transactions.filter(tp=StakingTransaction.TYPES.unstake)),
+            has_active_user_extend_out=Exists(
+                active_staking_transactions.filter(tp=PlanTransaction.TYPES.extend_out),
+            ),
+        ).only(
+            'id',
+            'opened_at',
+            'request_period',
+            'staked_at',
+            'staking_period',
+            'unstaking_period',
+            'reward_announcement_period',
+            'is_extendable',
+        )
+
+        plan_ids_per_action = defaultdict(list)
+        for plan in plans.order_by('id'):
+            staked = plan.staked_at < nw
+            staking_ended = plan.staked_at < nw - plan.staking_period
+            actions = {
+                'stake': staked and plan.has_active_approval,
+                'assign_staking_to_users': plan.has_positive_stake,
+                'end_its_user_staking': staking_ended and plan.has_active_user_stake,
+                'release_its_user_assets': plan.has_active_user_unstake,
+                'approve_stake_amount': plan.opened_at < nw - plan.request_period and not plan.has_approval,
+                'fetch_rewards': (
+                    staked
+                    and plan.staked_at > nw - plan.staking_period - plan.reward_announcement_period
+                    and not plan.has_recent_fetched_reward
+                ),
+                'announce_rewards': staked and not plan.has_current_announced_reward,
+                'pay_rewards': plan.has_positive_give_reward,
+                'create_extend_out_transaction': staking_ended and plan.has_active_stake,
+                'extend_staking': plan.is_extendable and plan.has_active_extend_out,
+                'extend_users_assets': plan.has_active_user_extend_out and not plan.has_active_extend_out,
+                'create_release_transaction': (
+                    plan.staked_at < nw - plan.staking_period - plan.unstaking_period and plan.has_active_unstake
+                ),
+            }
+            for action, is_pending in actions.items():
+                if is_pending:
+                    plan_ids_per_action[action].append(plan.id)
+        return plan_ids_per_action
+
     @staticmethod
     @measure_time(metric=Metrics.USERS_TO_APPLY_END_REQUESTS_QUERY_TIME)
     def get_user_ids_to_apply_instant_end_requests(plan_id: int) -> List[int]:
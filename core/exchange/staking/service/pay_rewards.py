@@ -1,5 +1,8 @@
+from typing import List
+
 from django.db import transaction
 
+from exchange.base.locker import Locker
 from exchange.base.logging import report_exception
 from exchange.base.models import Settings
 from exchange.staking import errors
@@ -14,7 +17,12 @@ from exchange.staking.models import (
     UserPlan,
     UserPlanWalletTransaction,
 )
+from exchange.wallet.constants import TRANSACTION_MAX
 from exchange.wallet.helpers import RefMod, create_and_commit_transaction
+from exchange.wallet.models import Wallet
+from exchange.wallet.wallet_manager import WalletBulkCreditManager
+
+REWARD_PAYMENT_BATCH_SIZE = 500
 
 
 def pay_all_users_reward(plan_id: int):
@@ -22,11 +30,133 @@ def pay_all_users_reward(plan_id: int):
 
 
 def _create_staking_rewards_transactions(plan_id: int):
-    for user_id in Plan.get_plan_user_ids_to_pay_reward(plan_id):
+    user_ids = list(Plan.get_plan_user_ids_to_pay_reward(plan_id))
+    for i in range(0, len(user_ids), REWARD_PAYMENT_BATCH_SIZE):
+        batch_user_ids = user_ids[i : i + REWARD_PAYMENT_BATCH_SIZE]
         try:
-            notify_or_raise_exception_decorator(_pay_user_reward)(user_id, plan_id)
+            unpaid_user_ids = _pay_users_reward(batch_user_ids, plan_id)
         except Exception:
             report_exception()
+            unpaid_user_ids = batch_user_ids
+
+        # Users not fitting bulk payment are handled one by one to raise the relevant error
+        for user_id in unpaid_user_ids:
+            try:
+                notify_or_raise_exception_decorator(_pay_user_reward)(user_id, plan_id)
+            except Exception:
+                report_exception()
+
+
+def _get_reward_ref_module(plan: Plan) -> RefMod:
+    return {
+        ExternalEarningPlatform.TYPES.staking: RefMod.staking_reward,
+        ExternalEarningPlatform.TYPES.yield_aggregator: RefMod.yield_farming_reward,
+    }.get(plan.external_platform.tp)
+
+
+@transaction.atomic
+def _pay_users_reward(user_ids: List[int], plan_id: int) -> List[int]:
+    """Pay reward of multiple users of a plan with bulk queries
+
+    Runs the same checks as `_pay_user_reward` for all users at once and credits their
+    wallets through `WalletBulkCreditManager`. Users failing any check are not paid
+    and are returned, so they can go through `_pay_user_reward` individually.
+    """
+    Locker.require_locks(f'staking_lock_{plan_id}', user_ids)
+    plan = Plan.get_plan_to_update(plan_id)
+    try:
+        plan_reward_transaction = plan.get_active_transaction_by_tp(PlanTransaction.TYPES.give_reward)
+    except PlanTransaction.DoesNotExist:
+        return user_ids
+
+    announced_rewards = {}
+    duplicate_user_ids = set()
+    for announced_reward in StakingTransaction.objects.filter(
+        user_id__in=user_ids,
+        plan_id=plan_id,
+        child=None,
+        tp=StakingTransaction.TYPES.announce_reward,
+    ):
+        if announced_reward.user_id in announced_rewards:
+            duplicate_user_ids.add(announced_reward.user_id)
+        announced_rewards[announced_reward.user_id] = announced_reward
+    paid_user_ids = set(
+        StakingTransaction.objects.filter(
+            user_id__in=user_ids,
+            plan_id=plan_id,
+            tp=StakingTransaction.TYPES.give_reward,
+        ).values_list('user_id', flat=True),
+    )
+    wallets = {
+        wallet.user_id: wallet
+        for wallet in Wallet.objects.filter(user_id__in=user_ids, currency=plan.currency, type=Wallet.WALLET_TYPE.spot)
+    }
+
+    reward_time = plan.staked_at + plan.staking_period
+    remaining_reward = plan_reward_transaction.amount
+    rewards = []
+    unpaid_user_ids = []
+    for user_id in user_ids:
+        announced_reward = announced_rewards.get(user_id)
+        wallet = wallets.get(user_id)
+        if (
+            announced_reward is None
+            or user_id in duplicate_user_ids
+            or user_id in paid_user_ids
+            or announced_reward.created_at != reward_time
+            or not 0 < announced_reward.amount <= min(remaining_reward, TRANSACTION_MAX)
+            or (wallet is not None and (not wallet.is_active or wallet.balance < 0))
+        ):
+            unpaid_user_ids.append(user_id)
+            continue
+        remaining_reward -= announced_reward.amount
+        rewards.append(announced_reward)
+
+    if not rewards:
+        return unpaid_user_ids
+
+    give_reward_transactions = StakingTransaction.objects.bulk_create(
+        [
+            StakingTransaction(
+                user_id=reward.user_id,
+                plan_id=plan_id,
+                amount=reward.amount,
+                created_at=reward.created_at,
+                tp=StakingTransaction.TYPES.give_reward,
+            )
+            for reward in rewards
+        ]
+    )
+    ref_module = _get_reward_ref_module(plan)
+    credit_manager = WalletBulkCreditManager()
+    for give_reward_transaction in give_reward_transactions:
+        credit_manager.add_credit(
+            user_id=give_reward_transaction.user_id,
+            currency=plan.currency,
+            amount=give_reward_transaction.amount,
+            tp=ref_module.tp(),
+            description=f'پاداش {plan.fa_description}.',
+            ref_module=ref_module.value,
+            ref_id=give_reward_transaction.id,
+        )
+    wallet_transactions = credit_manager.commit()
+    if None in wallet_transactions:
+        raise errors.UserWithNegativeBalanceOrDeactivatedWallet(
+            f'cant pay users reward for plan #{plan_id} in bulk, some users have deactivated wallet.',
+        )
+
+    for give_reward_transaction, wallet_transaction in zip(give_reward_transactions, wallet_transactions):
+        give_reward_transaction.wallet_transaction = wallet_transaction
+        _pay_user_plan_reward(
+            user_id=give_reward_transaction.user_id,
+            plan_id=plan_id,
+            user_reward_deposit_transaction=wallet_transaction,
+        )
+    StakingTransaction.objects.bulk_update(give_reward_transactions, ('wallet_transaction',))
+
+    plan_reward_transaction.amount = remaining_reward
+    plan_reward_transaction.save(update_fields=('amount',))
+    return unpaid_user_ids
 
 
 @transaction.atomic
@@ -70,10 +200,7 @@ def _pay_user_reward(user_id: int, plan_id: int) -> None:
             currency=plan.currency,
             amount=user_last_announced_reward.amount,
             ref_id=user_give_reward_transaction.id,
-            ref_module={
-                ExternalEarningPlatform.TYPES.staking: RefMod.staking_reward,
-                ExternalEarningPlatform.TYPES.yield_aggregator: RefMod.yield_farming_reward,
-            }.get(plan.external_platform.tp),
+            ref_module=_get_reward_ref_module(plan),
             description=f'پاداش {plan.fa_description}.',
         )
     except ValueError as e:
@@ -3,21 +3,23 @@ import datetime
 import time
 from abc import ABC, abstractmethod
 from decimal import Decimal
-from typing import Dict, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import F, Func, Min, Q, Subquery, Sum
+from django.db.models import F, Func, Min, Q, Subquery, Sum, Window
+from django.db.models.functions import RowNumber
 from django.utils.timezone import now
 
 from exchange.accounts.models import Notification
-from exchange.base.constants import MAX_POSITIVE_32_INT
 from exchange.base.decorators import measure_time
+from exchange.base.id_translation import encode_id
 from exchange.base.models import RIAL
 from exchange.base.money import money_is_close, money_is_zero
 from exchange.market.constants import MARKET_ORDER_MAX_PRICE_DIFF
 from exchange.market.models import OrderMatching
 from exchange.shetab.models import ShetabDeposit
+from exchange.system.wallet_flows import WalletFlowAggregator
 from exchange.wallet.models import (
     AutomaticWithdraw,
     BankDeposit,
@@ -109,6 +111,10 @@ class BaseChecker(ABC):
 class OnlineChecker(BaseChecker):
     """Regular checks of Matching engine output"""
 
+    TRANSACTIONS_BATCH_SIZE = 1000
+    MAX_TRANSACTION_BATCHES = 20
+    WALLETS_BATCH_SIZE = 500
+
     def __init__(self, recheck_balances=False, recheck_balances_fast=True, do_check_wallets=True):
         self.last_checked_trade = 0
         self.last_checked_transaction = 0
@@ -241,60 +247,112 @@ class OnlineChecker(BaseChecker):
         print(f'Checking {len(self.wallets_to_check)} wallets...')
         remaining_wallets = set()
         recently_checked_date = now() - datetime.timedelta(minutes=5)
-        checks = 0
+        wallet_ids = []
         for wallet_id in self.wallets_to_check:
             # Skips recently checked wallets
             last_check = self.wallets_last_check.get(wallet_id)
             if last_check and last_check >= recently_checked_date:
                 remaining_wallets.add(wallet_id)
                 continue
-            # Check wallet balance
-            checks += 1
-            wallet = Wallet.objects.get(id=wallet_id)
+            wallet_ids.append(wallet_id)
+
+        for i in range(0, len(wallet_ids), self.WALLETS_BATCH_SIZE):
+            self.check_wallets_batch(wallet_ids[i : i + self.WALLETS_BATCH_SIZE])
+        self.wallets_to_check = remaining_wallets
+        print(f'Checked {len(wallet_ids)} wallets.')
+
+    def check_wallets_batch(self, wallet_ids: List[int]):
+        """Check a batch of wallets, loading wallets and their last transactions in bulk."""
+        wallets = list(
+            Wallet.objects.filter(id__in=wallet_ids)
+            .select_related('user')
+            .only('id', 'balance', 'currency', 'user__username')
+        )
+        last_txs = {}
+        if not self.recheck_balances and self.recheck_balances_fast:
+            last_txs = self.get_wallets_last_transactions(wallets)
+
+        for wallet in wallets:
             if wallet.balance < Decimal('0'):
                 self.notif(wallet, f'Negative balance in {wallet.user.username} wallet')
             # Recheck balance with sum of all wallet's transactions
             if self.recheck_balances:
-                large_wallet_cache_key = f'checker_wallets_is_large_{wallet_id}'
+                large_wallet_cache_key = f'checker_wallets_is_large_{wallet.id}'
                 if not cache.get(large_wallet_cache_key):
                     t0 = time.time()
                     real_balance = wallet.transactions.aggregate(s=Sum('amount'))['s'] or Decimal('0')
                     duration = time.time() - t0
                     if duration > 60:
-                        print(f'Many transactions for Wallet#{wallet_id}')
+                        print(f'Many transactions for Wallet#{wallet.id}')
                         cache.set(large_wallet_cache_key, True, 24 * 3600)
                     if not self.is_close(real_balance, wallet.balance):
                         self.notif(wallet, f'Balance mismatch: {wallet.balance} != {real_balance} in',
                             f'C{wallet.currency} {wallet.user.username}')
             elif self.recheck_balances_fast:
-                if last_check:
-                    last_check = last_check - datetime.timedelta(minutes=1)
-
-                last_txs = (
-                    wallet.transactions.filter(
-                        created_at__gte=last_check or settings.LAST_RECENT_TRANSACTION_DATE,
+                last_tx = last_txs.get(wallet.id)
+                if last_tx and last_tx['balance'] and not self.is_close(last_tx['balance'], last_tx['wallet__balance']):
+                    self.notif(
+                        wallet,
+                        f'Wallet balance mismatch last tx: '
+                        f'{last_tx["wallet__balance"].normalize():f} != {last_tx["balance"].normalize():f} in',
+                        f'C{wallet.currency} {wallet.user.username}',
                     )
-                    .values('id', 'balance', 'wallet__balance')
-                    .order_by('-created_at', '-id')[:5]
-                )
-                if len(last_txs) != 0:
-                    last_tx = sorted(
-                        last_txs,
-                        key=lambda t: t['id'] if t['id'] > 0 else t['id'] + MAX_POSITIVE_32_INT,
-                        reverse=True,
-                    )[0]
-
-                    if last_tx['balance'] and not self.is_close(last_tx['balance'], last_tx['wallet__balance']):
-                        self.notif(
-                            wallet,
-                            f'Wallet balance mismatch last tx: '
-                            f'{last_tx["wallet__balance"].normalize():f} != {last_tx["balance"].normalize():f} in',
-                            f'C{wallet.currency} {wallet.user.username}',
-                        )
-
-            self.wallets_last_check[wallet_id] = now()
-        self.wallets_to_check = remaining_wallets
-        print(f'Checked {checks} wallets.')
+
+            self.wallets_last_check[wallet.id] = now()
+
+    def get_wallets_last_transactions(self, wallets: List[Wallet]) -> Dict[int, dict]:
+        """Return last transaction of each wallet since its last check, using a single query
+
+        Like transaction checks, last 5 transactions by creation time are taken and the one with
+        the largest id is picked, as id and created_at orders are not consistent in some cases.
+        """
+        if not wallets:
+            return {}
+        # Never checked wallets are read in a separate query, so their wider date range
+        # does not widen the scan of recently checked wallets.
+        checked_since = {}
+        unchecked_since = {}
+        for wallet in wallets:
+            last_check = self.wallets_last_check.get(wallet.id)
+            if last_check:
+                checked_since[wallet.id] = last_check - datetime.timedelta(minutes=1)
+            else:
+                unchecked_since[wallet.id] = settings.LAST_RECENT_TRANSACTION_DATE
+
+        last_txs = {}
+        for since_per_wallet in (checked_since, unchecked_since):
+            if not since_per_wallet:
+                continue
+            for tx in self.get_recent_transactions(since_per_wallet):
+                if tx['created_at'] < since_per_wallet[tx['wallet_id']]:
+                    continue
+                last_tx = last_txs.get(tx['wallet_id'])
+                if last_tx is None or self.get_logical_order(tx['id']) > self.get_logical_order(last_tx['id']):
+                    last_txs[tx['wallet_id']] = tx
+        return last_txs
+
+    @staticmethod
+    def get_recent_transactions(since_per_wallet: Dict[int, datetime.datetime]) -> Iterable[dict]:
+        """Return last 5 transactions of each wallet since the earliest of the given dates"""
+        # Newer transactions of each wallet are a prefix of its transactions since the earliest date,
+        # so filtering them after ranking gives the same last 5 transactions as a per wallet query.
+        return (
+            Transaction.objects.filter(wallet_id__in=since_per_wallet, created_at__gte=min(since_per_wallet.values()))
+            .annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('wallet_id'),
+                    order_by=(F('created_at').desc(), F('id').desc()),
+                ),
+            )
+            .filter(row_number__lte=5)
+            .values('id', 'wallet_id', 'created_at', 'balance', 'wallet__balance')
+        )
+
+    @staticmethod
+    def get_logical_order(transaction_id: int) -> int:
+        """Sort key of transaction ids, pushing negative ids after positive ones."""
+        return encode_id(transaction_id)
 
     @staticmethod
     def is_negative_balance_forbidden(transaction: Transaction) -> bool:
@@ -308,7 +366,18 @@ class OnlineChecker(BaseChecker):
         """Check recent transactions to be correct."""
         print('Checking recent transactions...')
         nw = now()
+        checks = 0
+        for _ in range(self.MAX_TRANSACTION_BATCHES):
+            recent_transactions = self.get_recent_transactions(nw)
+            for transaction in recent_transactions:
+                checks += 1
+                self.check_transaction(transaction)
+            if len(recent_transactions) < self.TRANSACTIONS_BATCH_SIZE:
+                break
+        print(f'Checked {checks} transactions.')
 
+    def get_recent_transactions(self, nw: datetime.datetime) -> List[Transaction]:
+        """Get next batch of transactions after the last checked one."""
         if self.last_checked_transaction >= 0:
             id_gt_q = Q(id__lte=0) | Q(id__gt=self.last_checked_transaction)
         else:
@@ -318,73 +387,63 @@ class OnlineChecker(BaseChecker):
             id_gt_q,
             created_at__gte=nw - datetime.timedelta(minutes=15),
             created_at__lte=nw - datetime.timedelta(minutes=1),
-        ).order_by('created_at', 'id')[:200]
+        ).order_by('created_at', 'id')[: self.TRANSACTIONS_BATCH_SIZE]
 
         # Sort by id instead of created_at because order of id and created_at are not consistent in some cases
         # So we using id as reference to logical order. Also pushing the negative ids to the end.
-        recent_transactions = sorted(
-            recent_transactions,
-            key=lambda t: t.pk if t.pk > 0 else t.pk + MAX_POSITIVE_32_INT,
-        )
-
-        checks = 0
-        for transaction in recent_transactions:
-            checks += 1
-            # Generic balance check and store
-            self.last_checked_transaction = transaction.id
-            # Check empty balance
-            if transaction.balance is None:
-                self.notif(transaction, 'None transaction balance')
-                if transaction.wallet_id in self.wallets_last_balance:
-                    del self.wallets_last_balance[transaction.wallet_id]
-                continue
-            last_balance, last_tx_id = self.wallets_last_balance.get(transaction.wallet_id, (None, None))
-            self.wallets_last_balance[transaction.wallet_id] = transaction.balance, transaction.id
-            # Check negative balance
-            if transaction.balance < Decimal('0') and self.is_negative_balance_forbidden(transaction):
-                message = f'Negative transaction balance\ntp: {transaction.get_tp_display()} {transaction.description}'
-                self.notif(transaction, message.rstrip())
-                continue
-            # Check balance change from last known balance
-            if last_balance is None:
-                continue
-            if money_is_close(transaction.balance, last_balance + transaction.amount):
-                continue
-
-            if transaction.id > 0:
-                id_lt_q = Q(id__gte=0) & Q(id__lt=transaction.id)
-            else:
-                id_lt_q = Q(id__gt=0) | Q(id__lt=transaction.id)
-
-            if last_tx_id > 0:
-                id_gte_q = Q(id__lte=0) | Q(id__gte=last_tx_id)
-            else:
-                id_gte_q = Q(id__lte=0) & Q(id__gte=last_tx_id)
+        return sorted(recent_transactions, key=lambda t: self.get_logical_order(t.pk))
+
+    def check_transaction(self, transaction: Transaction):
+        """Check balance of a transaction against the last known balance of its wallet."""
+        # Generic balance check and store
+        self.last_checked_transaction = transaction.id
+        # Check empty balance
+        if transaction.balance is None:
+            self.notif(transaction, 'None transaction balance')
+            if transaction.wallet_id in self.wallets_last_balance:
+                del self.wallets_last_balance[transaction.wallet_id]
+            return
+        last_balance, last_tx_id = self.wallets_last_balance.get(transaction.wallet_id, (None, None))
+        self.wallets_last_balance[transaction.wallet_id] = transaction.balance, transaction.id
+        # Check negative balance
+        if transaction.balance < Decimal('0') and self.is_negative_balance_forbidden(transaction):
+            message = f'Negative transaction balance\ntp: {transaction.get_tp_display()} {transaction.description}'
+            self.notif(transaction, message.rstrip())
+            return
+        # Check balance change from last known balance
+        if last_balance is None:
+            return
+        if money_is_close(transaction.balance, last_balance + transaction.amount):
+            return
 
-            # Just to make sure we get last tx by id and not by created_at
-            # Get last 5 txs and use id to sort them, then pick the last
-            last_transactions = (
-                Transaction.objects.filter(
-                    id_lt_q,
-                    id_gte_q,
-                    wallet_id=transaction.wallet_id,
-                )
-                .order_by('-created_at', '-id')
-            )[:5]
-            if len(last_transactions) == 0:
-                self.notif(transaction, 'Deleted previous transaction', f'W#{transaction.wallet_id} TX#{last_tx_id}')
-                continue
+        if transaction.id > 0:
+            id_lt_q = Q(id__gte=0) & Q(id__lt=transaction.id)
+        else:
+            id_lt_q = Q(id__gt=0) | Q(id__lt=transaction.id)
 
-            last_transaction = sorted(
-                last_transactions,
-                key=lambda t: t.pk if t.pk > 0 else t.pk + MAX_POSITIVE_32_INT,
-                reverse=True,
-            )[0]
+        if last_tx_id > 0:
+            id_gte_q = Q(id__lte=0) | Q(id__gte=last_tx_id)
+        else:
+            id_gte_q = Q(id__lte=0) & Q(id__gte=last_tx_id)
+
+        # Just to make sure we get last tx by id and not by created_at
+        # Get last 5 txs and use id to sort them, then pick the last
+        last_transactions = (
+            Transaction.objects.filter(
+                id_lt_q,
+                id_gte_q,
+                wallet_id=transaction.wallet_id,
+            )
+            .order_by('-created_at', '-id')
+        )[:5]
+        if len(last_transactions) == 0:
+            self.notif(transaction, 'Deleted previous transaction', f'W#{transaction.wallet_id} TX#{last_tx_id}')
+            return
 
-            if not money_is_close(transaction.balance, last_transaction.balance + transaction.amount):
-                self.notif(transaction, 'Invalid transaction balance', f'W#{transaction.wallet_id} TP{transaction.tp}')
+        last_transaction = max(last_transactions, key=lambda t: self.get_logical_order(t.pk))
 
-        print(f'Checked {checks} transactions.')
+        if not money_is_close(transaction.balance, last_transaction.balance + transaction.amount):
+            self.notif(transaction, 'Invalid transaction balance', f'W#{transaction.wallet_id} TP{transaction.tp}')
 
     def check_all(self):
         self.check_recent_trades()
@@ -395,15 +454,17 @@ class OnlineChecker(BaseChecker):
 class DiffChecker(BaseChecker):
     telegram_title = 'Diff Checker'
 
-    def __init__(self, recheck_diff=True, do_check_wallets=True):
+    def __init__(self, recheck_diff=True, do_check_wallets=True, use_flows=True):
         self.last_checked_withdraw = 0
         self.last_checked_transaction = 0
         self.wallets_to_check = set()
         self.wallets_last_check = {}
         self.wallets_last_balance = {}
+        self.flows = WalletFlowAggregator()
         # Options
         self.recheck_diff = recheck_diff
         self.do_check_wallets = do_check_wallets
+        self.use_flows = use_flows
 
     def load_state(self):
         """Load important local variables from cache."""
@@ -590,12 +651,28 @@ class DiffChecker(BaseChecker):
                     self.notif(withdraw, 'Negative withdraw balance')
                     continue
                 if self.recheck_diff:
-                    diff = self.check_wallet_diff(wallet=wallet, check_until_tx=last_transaction)
+                    diff = None
+                    if self.use_flows:
+                        diff = self.flows.get_diff(wallet.id, until_transaction_id=last_transaction.id)
+                    if diff is None:
+                        diff = self.check_wallet_diff(wallet=wallet, check_until_tx=last_transaction)
                     if not money_is_zero(diff):
                         self.notif(withdraw, f'Diff non-zero: {diff}')
                         continue
 
         print(f'Checked {checks} withdraws.')
 
+    @measure_time(metric='checker_check_wallet_flows')
+    def check_wallet_flows(self):
+        """Check diff of all wallets with new transactions, using aggregated wallet flows."""
+        print('Checking wallet flows...')
+        diffs = self.flows.update()
+        non_zero_diffs = [wallet_id for wallet_id, diff in diffs.items() if not money_is_zero(diff)]
+        for wallet in Wallet.objects.filter(id__in=non_zero_diffs):
+            self.notif(wallet, f'Wallet diff non-zero: {diffs[wallet.id]}')
+        print(f'Updated diff of {len(diffs)} wallets.')
+
     def check_all(self):
+        if self.use_flows:
+            self.check_wallet_flows()
         self.check_recent_withdraws()
@@ -5,5 +5,12 @@ from exchange.system.checker import DiffChecker
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-flows',
+            action='store_true',
+            help='Check withdrawing wallets only, without aggregated wallet flows',
+        )
+
     def handle(self, *args, **kwargs):
-        DiffChecker().run()
+        DiffChecker(use_flows=not kwargs['no_flows']).run()
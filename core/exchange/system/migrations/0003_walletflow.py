@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0140_alter_userprofitdaily_unique_together_and_more'),
+        ('system', '0002_auto_20220115_1654'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletFlow',
+            fields=[
+                (
+                    'wallet',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='+',
+                        serialize=False,
+                        to='wallet.wallet',
+                    ),
+                ),
+                ('start_balance', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('balance', models.DecimalField(decimal_places=10, max_digits=30)),
+                ('last_transaction_id', models.BigIntegerField()),
+                ('deposit', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('internal_deposit', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('withdraw', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('internal_withdraw_to', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('buy', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('sell', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('manual', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('gateway', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('refund', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('other', models.DecimalField(decimal_places=10, default=Decimal('0'), max_digits=30)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'جریان کیف پول',
+                'verbose_name_plural': 'جریان کیف پول',
+            },
+        ),
+    ]
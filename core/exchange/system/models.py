@@ -117,3 +117,30 @@ class BotTransaction(models.Model):
         bot_transactions.select_related('transaction')
         transactions = [bot_transaction.transaction for bot_transaction in bot_transactions]
         return transactions
+
+
+class WalletFlow(models.Model):
+    """ Running flow totals of a wallet, maintained by WalletFlowAggregator
+
+        Totals cover transactions of the wallet since it was first aggregated, and
+        start_balance is the wallet balance before its first aggregated transaction.
+    """
+    wallet = models.OneToOneField(Wallet, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    start_balance = models.DecimalField(max_digits=30, decimal_places=10)
+    balance = models.DecimalField(max_digits=30, decimal_places=10)
+    last_transaction_id = models.BigIntegerField()
+    deposit = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    internal_deposit = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    withdraw = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    internal_withdraw_to = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    buy = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    sell = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    manual = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    gateway = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    refund = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    other = models.DecimalField(max_digits=30, decimal_places=10, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'جریان کیف پول'
+        verbose_name_plural = verbose_name
@@ -0,0 +1,247 @@
+""" Running per-wallet flow aggregates, used by DiffChecker """
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from exchange.base.constants import MAX_32_INT
+from exchange.base.id_translation import decode_id, encode_id
+from exchange.base.models import Settings
+from exchange.shetab.models import ShetabDeposit
+from exchange.system.models import WalletFlow
+from exchange.wallet.models import BankDeposit, ConfirmedWalletDeposit, Transaction, WithdrawRequest
+
+
+class WalletFlowAggregator:
+    """Maintain running inflow and outflow totals of wallets by source type
+
+    Transactions are read in batches after a cursor, in logical id order where negative ids,
+    used after ids wrap around, are newer than positive ones. For each batch, deposits,
+    withdraws and internal transfers linked to its transactions are summed per wallet with one
+    query per source table. Totals are stored per wallet in `WalletFlow`, together with the
+    balance before the first aggregated transaction, so the diff of any wallet is calculated
+    in constant time. Totals and the cursor are saved in the same DB transaction, so a batch is
+    never applied twice or skipped. Transactions newer than `SETTLE_DELAY` are left for later
+    runs, so rows committed out of order are not skipped.
+    Only deposit and withdraw transactions are checked against their source records, amounts of
+    all other transaction types (fees, transfers, referrals, staking, ...) are taken as is.
+    """
+
+    BATCH_SIZE = 5000
+    MAX_BATCHES = 20
+    SETTLE_DELAY = datetime.timedelta(minutes=1)
+    CURSOR_KEY = 'diff_checker_flows_last_transaction_order'
+
+    FLOW_TYPES = (
+        'deposit',
+        'internal_deposit',
+        'withdraw',
+        'internal_withdraw_to',
+        'buy',
+        'sell',
+        'manual',
+        'gateway',
+        'refund',
+        'other',
+    )
+    SOURCE_CHECKED_TYPES = (Transaction.TYPE.deposit, Transaction.TYPE.withdraw)
+    TRANSACTION_FLOW_TYPES = {
+        Transaction.TYPE.buy: 'buy',
+        Transaction.TYPE.sell: 'sell',
+        Transaction.TYPE.manual: 'manual',
+        Transaction.TYPE.gateway: 'gateway',
+        Transaction.TYPE.refund: 'refund',
+    }
+    INTERNAL_DEPOSIT_TX_HASH = 'nobitex-internal-W'
+
+    @classmethod
+    def calculate_diff(cls, flows: WalletFlow) -> Decimal:
+        """Return the difference of a wallet balance change and the sum of its known flows
+
+        This is the formula of `DiffChecker.check_wallet_diff` applied to aggregated totals, with
+        amounts of transaction types without a source record check added to the known flows.
+        """
+        balance_change = flows.balance - flows.start_balance
+        net = (
+            flows.deposit
+            - flows.withdraw
+            + abs(flows.buy)
+            - abs(flows.sell)
+            + flows.gateway
+            + flows.manual
+            + flows.refund
+            + flows.other
+        )
+        return balance_change - net + flows.internal_deposit - flows.internal_withdraw_to
+
+    def get_diff(self, wallet_id: int, until_transaction_id: int) -> Optional[Decimal]:
+        """Return diff of a wallet, or None if its flows are not aggregated up to the transaction"""
+        flows = WalletFlow.objects.filter(wallet_id=wallet_id).first()
+        if not flows or encode_id(flows.last_transaction_id) < encode_id(until_transaction_id):
+            return None
+        return self.calculate_diff(flows)
+
+    def get_cursor(self) -> int:
+        """Return logical order of the last aggregated transaction"""
+        cursor = Settings.objects.filter(key=self.CURSOR_KEY).values_list('value', flat=True).first()
+        if cursor is not None:
+            return int(cursor)
+        # Flows of older transactions are unknown, so aggregation starts from now on
+        last_transactions = Transaction.objects.filter(
+            created_at__gte=settings.LAST_RECENT_TRANSACTION_DATE,
+            created_at__lte=now() - self.SETTLE_DELAY,
+        ).order_by('-created_at', '-id')[:5]
+        cursor = max((encode_id(tx.id) for tx in last_transactions), default=0)
+        self.set_cursor(cursor)
+        return cursor
+
+    def set_cursor(self, cursor: int) -> None:
+        Settings.objects.update_or_create(key=self.CURSOR_KEY, defaults={'value': str(cursor)})
+
+    def get_transactions_after(self, cursor: int) -> List[dict]:
+        """Return the next batch of transactions after the cursor, in logical id order
+
+        While the cursor is in positive ids, remaining positive ids are read before negative ids.
+        """
+        transactions = Transaction.objects.filter(
+            created_at__gte=settings.LAST_RECENT_TRANSACTION_DATE,
+        ).values('id', 'wallet_id', 'tp', 'amount', 'balance', 'ref_module', 'ref_id', 'created_at')
+        if cursor > MAX_32_INT:
+            return list(transactions.filter(id__gt=decode_id(cursor), id__lte=0).order_by('id')[: self.BATCH_SIZE])
+        batch = list(transactions.filter(id__gt=cursor).order_by('id')[: self.BATCH_SIZE])
+        if len(batch) < self.BATCH_SIZE:
+            batch += list(transactions.filter(id__lte=0).order_by('id')[: self.BATCH_SIZE - len(batch)])
+        return batch
+
+    def update(self) -> Dict[int, Decimal]:
+        """Aggregate new transactions in batches, returning new diffs of wallets whose diff changed"""
+        cursor = self.get_cursor()
+        diffs = {}
+        for _ in range(self.MAX_BATCHES):
+            settled_before = now() - self.SETTLE_DELAY
+            transactions = self.get_transactions_after(cursor)
+            is_last_batch = len(transactions) < self.BATCH_SIZE
+            for i, tx in enumerate(transactions):
+                if tx['created_at'] > settled_before:
+                    transactions = transactions[:i]
+                    is_last_batch = True
+                    break
+            if transactions:
+                cursor = encode_id(transactions[-1]['id'])
+                with transaction.atomic():
+                    diffs.update(self.apply_batch(transactions))
+                    self.set_cursor(cursor)
+            if is_last_batch:
+                break
+        return diffs
+
+    def apply_batch(self, transactions: List[dict]) -> Dict[int, Decimal]:
+        """Add flows of a batch of transactions to totals of their wallets, returning changed diffs"""
+        batch_flows = self.get_batch_flows(transactions)
+
+        wallets_flows = {
+            flows.wallet_id: flows
+            for flows in WalletFlow.objects.select_for_update().filter(
+                wallet_id__in={tx['wallet_id'] for tx in transactions},
+            )
+        }
+        previous_diffs = {wallet_id: self.calculate_diff(flows) for wallet_id, flows in wallets_flows.items()}
+        new_flows = []
+        for tx in transactions:
+            if tx['balance'] is None:
+                continue
+            flows = wallets_flows.get(tx['wallet_id'])
+            if flows is None:
+                flows = wallets_flows[tx['wallet_id']] = WalletFlow(
+                    wallet_id=tx['wallet_id'],
+                    start_balance=tx['balance'] - tx['amount'],
+                    **{flow_type: Decimal('0') for flow_type in self.FLOW_TYPES},
+                )
+                new_flows.append(flows)
+            flows.balance = tx['balance']
+            flows.last_transaction_id = tx['id']
+            flows.updated_at = now()
+
+        for wallet_id, wallet_batch_flows in batch_flows.items():
+            flows = wallets_flows.get(wallet_id)
+            if flows is None:
+                continue
+            for flow_type, amount in wallet_batch_flows.items():
+                setattr(flows, flow_type, getattr(flows, flow_type) + amount)
+
+        WalletFlow.objects.bulk_create(new_flows)
+        WalletFlow.objects.bulk_update(
+            [flows for wallet_id, flows in wallets_flows.items() if wallet_id in previous_diffs],
+            fields=['balance', 'last_transaction_id', 'updated_at', *self.FLOW_TYPES],
+        )
+        diffs = {}
+        for wallet_id, flows in wallets_flows.items():
+            diff = self.calculate_diff(flows)
+            if diff != previous_diffs.get(wallet_id, Decimal('0')):
+                diffs[wallet_id] = diff
+        return diffs
+
+    def get_batch_flows(self, transactions: List[dict]) -> Dict[int, Dict[str, Decimal]]:
+        """Sum flows of transactions by wallet and source type, using one query per source table"""
+        tx_wallets = {tx['id']: tx['wallet_id'] for tx in transactions}
+        flows = defaultdict(lambda: defaultdict(Decimal))
+
+        for tx in transactions:
+            flow_type = self.TRANSACTION_FLOW_TYPES.get(tx['tp'])
+            if not flow_type and tx['tp'] not in self.SOURCE_CHECKED_TYPES:
+                flow_type = 'other'
+            if flow_type:
+                flows[tx['wallet_id']][flow_type] += tx['amount']
+
+        shetab_deposits = (
+            ShetabDeposit.objects.filter(
+                Q(user_card_number__isnull=False) & ~Q(user_card_number='0000-0000-0000-0000'),
+                Q(nextpay_id__isnull=False) & ~Q(nextpay_id='0'),
+                status_code__in=[
+                    ShetabDeposit.STATUS.pay_success,
+                    ShetabDeposit.STATUS.invalid_card,
+                    ShetabDeposit.STATUS.refunded,
+                ],
+                transaction_id__in=tx_wallets,
+            )
+            .annotate(net_amount=F('amount') - F('fee'))
+            .values_list('transaction_id', 'net_amount')
+        )
+        bank_deposits = (
+            BankDeposit.objects.filter(transaction_id__in=tx_wallets, confirmed=True)
+            .annotate(net_amount=F('amount') - F('fee'))
+            .values_list('transaction_id', 'net_amount')
+        )
+        for tx_id, amount in [*shetab_deposits, *bank_deposits]:
+            flows[tx_wallets[tx_id]]['deposit'] += amount or 0
+
+        crypto_deposits = ConfirmedWalletDeposit.objects.filter(
+            transaction_id__in=tx_wallets,
+            validated=True,
+            confirmed=True,
+        ).values_list('transaction_id', 'amount', 'tx_hash')
+        for tx_id, amount, tx_hash in crypto_deposits:
+            flows[tx_wallets[tx_id]]['deposit'] += amount
+            if self.INTERNAL_DEPOSIT_TX_HASH.lower() in (tx_hash or '').lower():
+                flows[tx_wallets[tx_id]]['internal_deposit'] += amount
+
+        withdraws = WithdrawRequest.objects.filter(transaction_id__in=tx_wallets).values_list('wallet_id', 'amount')
+        for wallet_id, amount in withdraws:
+            flows[wallet_id]['withdraw'] += amount
+
+        internal_transfer_txs = {
+            tx['ref_id']: tx['wallet_id']
+            for tx in transactions
+            if tx['ref_module'] == Transaction.REF_MODULES['InternalTransferDeposit'] and tx['ref_id']
+        }
+        if internal_transfer_txs:
+            internal_withdraws = WithdrawRequest.objects.filter(id__in=internal_transfer_txs).values_list('id', 'amount')
+            for withdraw_id, amount in internal_withdraws:
+                flows[internal_transfer_txs[withdraw_id]]['internal_withdraw_to'] += amount
+
+        return flows
@@ -1,10 +1,17 @@
+import datetime
 from decimal import Decimal
 from enum import Enum
-from typing import Optional
+from typing import Iterator, Optional, Tuple
+
+from django.db import connections, transaction
+from django.db.models import Q, QuerySet
 
 from exchange.accounts.models import BankAccount
+from exchange.base.api import ParseError
 from exchange.base.constants import MAX_PRECISION
+from exchange.base.id_translation import decode_id, encode_id
 from exchange.base.models import RIAL
+from exchange.base.parsers import parse_int, parse_timestamp_microseconds
 from exchange.base.validators import validate_transaction_is_atomic
 
 from .models import Transaction, Wallet, WithdrawRequest
@@ -143,3 +150,60 @@ def create_and_commit_system_user_transaction(
     ref = Transaction.Ref(ref_module=ref_module.value, ref_id=ref_id) if ref_id else None
     transaction.commit(ref=ref, allow_negative_balance=True)
     return transaction
+
+
+TRANSACTION_KEYSET_CHUNK_SIZE = 2000
+
+
+def get_transaction_keyset_filter(created_at: datetime.datetime, tx_id: int) -> Q:
+    """Filter transactions coming after (created_at, id) in `-created_at, -id` order."""
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=tx_id)
+
+
+def encode_transaction_cursor(created_at: datetime.datetime, tx_id: int) -> str:
+    """Build an opaque keyset cursor pointing at the given transaction.
+
+    The cursor is `<created_at microseconds timestamp>_<encoded id>`, and is
+    meant to be passed back as the `cursor` param of transaction history.
+    """
+    timestamp = int(created_at.timestamp()) * 1_000_000 + created_at.microsecond
+    return f'{timestamp}_{encode_id(tx_id)}'
+
+
+def parse_transaction_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime.datetime, int]]:
+    if not cursor:
+        return None
+    timestamp, _, tx_id = str(cursor).partition('_')
+    if not timestamp or not tx_id:
+        raise ParseError(f'Invalid cursor: "{cursor}"')
+    return parse_timestamp_microseconds(timestamp), decode_id(parse_int(tx_id, required=True))
+
+
+def iter_transactions_by_keyset(
+    transactions: QuerySet,
+    chunk_size: int = TRANSACTION_KEYSET_CHUNK_SIZE,
+    using: str = 'default',
+) -> Iterator[dict]:
+    """Yield transaction values of a `-created_at, -id` ordered queryset chunk by chunk.
+
+    Each chunk is fetched in its own short transaction with keyset pagination on
+    (created_at, id), so memory stays constant and no long-running transaction is
+    kept open on the database, regardless of the size of the history.
+    The queryset must be a `values()` queryset containing `id` and `created_at`.
+    """
+    last_key = None
+    while True:
+        chunk = transactions
+        if last_key:
+            chunk = chunk.filter(get_transaction_keyset_filter(*last_key))
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            # Next line will force postgres planner to use index instead of seq scan
+            cursor.execute('SET LOCAL random_page_cost = 0.1;')
+            chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        # Keep the key before yielding, as consumers may alter the rows
+        last_key = chunk[-1]['created_at'], chunk[-1]['id']
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
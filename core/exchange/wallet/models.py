@@ -70,6 +70,7 @@ from exchange.wallet.constants import (
     TRANSACTION_MAX_DIGITS,
     WITHDRAW_MAX_DIGITS,
 )
+from exchange.wallet.snapshot import WalletSnapshot
 
 if TYPE_CHECKING:
     from django.db.models import QuerySet
@@ -467,6 +468,7 @@ class Wallet(models.Model):
                 self.balance, self.balance_blocked = cursor.fetchone()
             except TypeError:  # cannot unpack non-iterable NoneType object
                 raise ValueError('InsufficientBalance')
+        WalletSnapshot.invalidate(self.user_id)
 
     def block(self, amount: Decimal):
         self._change_balance_blocked(amount)
@@ -2459,6 +2461,7 @@ class Transaction(models.Model):
 
             self.wallet.balance = self.balance = updated_balance
             self.save()
+            WalletSnapshot.invalidate(self.wallet.user_id)
 
     def get_type_human_display(self):
         return self.TYPES_HUMAN_DISPLAY.get(self.tp, 'سایر')
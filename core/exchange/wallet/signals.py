@@ -23,6 +23,7 @@ from exchange.wallet.models import (
     Wallet,
     WithdrawRequest,
 )
+from exchange.wallet.snapshot import WalletSnapshot
 from exchange.web_engage.events import DepositWebEngageEvent, MarginTransactionEngageEvent, WithdrawWebEngageEvent
 
 
@@ -89,6 +90,14 @@ def new_withdraw_request_created(sender, instance, created, **kwargs):
             AddressBook.send_addressbook_withdraw_request_affirmation(instance.wallet.user)
 
 
+@receiver(post_save, sender=WithdrawRequest, dispatch_uid='withdraw_request_invalidate_wallet_snapshot')
+def withdraw_request_invalidate_wallet_snapshot(sender, instance, update_fields=None, **kwargs):
+    """Pending withdraws are part of blocked balance in user wallets snapshot"""
+    if update_fields and 'status' not in update_fields and 'transaction' not in update_fields:
+        return
+    WalletSnapshot.invalidate(instance.wallet.user_id)
+
+
 @receiver(pre_save, sender=WithdrawRequest, dispatch_uid='withdraw_status_user_notif')
 def withdraw_status_user_notif(sender, instance, update_fields=None, **kwargs):
     if instance.is_internal_service and instance.is_rial:
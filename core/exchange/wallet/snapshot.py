@@ -0,0 +1,45 @@
+""" Per-user wallet snapshots for wallet list APIs """
+import uuid
+from typing import Callable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class WalletSnapshot:
+    """Cached per-user list of wallet balances, invalidated by a version token
+
+    A snapshot holds `id`, `currency`, `balance` and `blocked` of each wallet of
+    a user, and is stored under a key containing the user's current version. Any
+    change to balances, orders or withdraws bumps the version after DB commit, so
+    the next read rebuilds the snapshot. Snapshots also expire after a short
+    timeout, as a safeguard for changes done through bulk updates.
+    """
+
+    SNAPSHOT_TIMEOUT = 30
+    VERSION_TIMEOUT = 24 * 3600
+
+    @staticmethod
+    def _get_version_key(user_id: int) -> str:
+        return f'user_{user_id}_wallet_snapshot_version'
+
+    @classmethod
+    def invalidate(cls, user_id: int) -> None:
+        """Bump snapshot version of the user once the current DB transaction is committed"""
+        transaction.on_commit(
+            lambda: cache.set(cls._get_version_key(user_id), uuid.uuid4().hex, cls.VERSION_TIMEOUT),
+        )
+
+    @classmethod
+    def get(cls, user_id: int, wallet_type: int, build: Callable[[], List[dict]]) -> List[dict]:
+        """Return the user's wallets snapshot, building and caching it with `build` if missing"""
+        if not settings.USE_WALLET_SNAPSHOT_CACHE:
+            return build()
+        version = cache.get(cls._get_version_key(user_id)) or '0'
+        cache_key = f'user_{user_id}_wallet_snapshot_{wallet_type}_{version}'
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            snapshot = build()
+            cache.set(cache_key, snapshot, cls.SNAPSHOT_TIMEOUT)
+        return snapshot
@@ -1,6 +1,6 @@
 import datetime
 from decimal import Decimal
-from typing import List, Optional, Type
+from typing import Dict, Iterable, Iterator, List, Optional, Type
 
 import requests
 from celery import shared_task
@@ -33,6 +33,7 @@ from exchange.blockchain.models import MAIN_TOKEN_CURRENCIES_INFO
 from exchange.blockchain.utils import BlockchainUtilsMixin
 from exchange.wallet.deposit import refresh_address_deposits
 from exchange.wallet.functions import external_withdraw_log
+from exchange.wallet.helpers import iter_transactions_by_keyset
 from exchange.wallet.models import (
     AvailableHotWalletAddress,
     ConfirmedWalletDeposit,
@@ -390,6 +391,19 @@ def settle_rial_withdraws(withdraws, method, options):
     }
 
 
+def _serialize_history_transactions(transactions: Iterable[dict], user_wallets: Dict[int, int]) -> Iterator[dict]:
+    type_id_map = {v: k for k, v in Transaction.TYPE._identifier_map.items()}
+    for tx in transactions:
+        tx['id'] = encode_id(tx['id'])
+        tx['type'] = Transaction.TYPES_HUMAN_DISPLAY.get(tx['tp'], 'سایر')
+        tx['tp'] = type_id_map.get(tx['tp'], 'etc')
+        tx['currency'] = CURRENCY_CODENAMES.get(user_wallets[tx['wallet_id']], '').lower()
+        tx['createdAt'] = serialize(tx['created_at'])
+        del tx['wallet_id']
+        del tx['created_at']
+        yield tx
+
+
 @shared_task(name='export_transaction_history', max_retries=1)
 def export_transaction_history(
     user_id: int,
@@ -433,21 +447,8 @@ def export_transaction_history(
             'wallet_id',
         )
 
-        # Serialize
         with measure_time_cm('transaction_history_task_query_milliseconds', verbose=False):
-            transactions = list(transactions)
-
-        tx_count = len(transactions)
-        type_id_map = {v: k for k, v in Transaction.TYPE._identifier_map.items()}
-
-        for tx in transactions:
-            tx['id'] = encode_id(tx['id'])
-            tx['type'] = Transaction.TYPES_HUMAN_DISPLAY.get(tx['tp'], 'سایر')
-            tx['tp'] = type_id_map.get(tx['tp'], 'etc')
-            tx['currency'] = CURRENCY_CODENAMES.get(user_wallets[tx['wallet_id']], '').lower()
-            tx['createdAt'] = serialize(tx['created_at'])
-            del tx['wallet_id']
-            del tx['created_at']
+            tx_count = transactions.count()
 
         tps_str = '_'.join(map(str, sorted(tps))) if tps else ''
         transaction_history_file = (
@@ -473,9 +474,14 @@ def export_transaction_history(
         elif transaction_history_file.tx_count == tx_count:
             return
 
-        transaction_history_file.tx_count = len(transactions)
+        transaction_history_file.tx_count = tx_count
         transaction_history_file.save(using=write_db)
 
+    # Rows are fetched and written chunk by chunk to keep memory usage constant for large histories
+    transactions = _serialize_history_transactions(
+        iter_transactions_by_keyset(transactions, using=read_db),
+        user_wallets,
+    )
     headers = ['id', 'createdAt', 'type', 'tp', 'currency', 'amount', 'balance', 'description']
     with measure_time_cm('transaction_history_task_export_milliseconds', verbose=False):
         export_csv(transaction_history_file.disk_path, transactions, headers, encoding='utf-8-sig')
@@ -93,7 +93,6 @@ from exchange.market.models import Order
 from exchange.report.views import admin_access
 from exchange.security.models import AddressBook
 from exchange.shetab.models import ShetabDeposit
-from exchange.usermanagement.block import BalanceBlockManager
 from exchange.wallet.constants import TRANSACTION_MAX
 from exchange.wallet.deposit import refresh_address_deposits, refresh_wallet_deposits
 from exchange.wallet.estimator import PriceEstimator
@@ -110,6 +109,11 @@ from exchange.wallet.forms import (
     UpdateDepositForm,
 )
 from exchange.wallet.functions import create_bulk_transfer, transfer_balance
+from exchange.wallet.helpers import (
+    encode_transaction_cursor,
+    get_transaction_keyset_filter,
+    parse_transaction_cursor,
+)
 from exchange.wallet.models import (
     AvailableDepositAddress,
     BankDeposit,
@@ -124,6 +128,7 @@ from exchange.wallet.models import (
     WithdrawRequestRestriction,
 )
 from exchange.wallet.serializers import serialize_transaction, serialize_wallet_addresses
+from exchange.wallet.snapshot import WalletSnapshot
 from exchange.wallet.tasks import export_transaction_history, task_extract_contract_addresses
 from exchange.wallet.wallet_manager import WalletTransactionManager
 from exchange.wallet.webhooks import (
@@ -197,6 +202,38 @@ def authenticated_wallet_ratelimit_key(group, request):
     return ip_mask(request.META['REMOTE_ADDR']) + wallet_type
 
 
+def build_user_wallets_snapshot(user, wallet_type):
+    """ Return id, balance and blocked balance of user wallets, to be cached in user wallets snapshot
+    """
+    wallets = Wallet.get_user_wallets(user, wallet_type)
+
+    # Calculate blocked balances
+    if wallet_type == Wallet.WALLET_TYPE.spot:
+        block_withdraw = get_user_blocked_withdraws(user.id)
+        if check_user_has_no_order(user.id):
+            block_order = {}
+        else:
+            block_order = get_user_blocked_orders(user.id)
+        for wallet in wallets:
+            wallet.balance_blocked = (
+                block_withdraw.get(wallet.currency, Decimal('0')) + block_order.get(wallet.currency, Decimal('0'))
+            )
+
+    return [
+        {
+            'id': wallet.id,
+            'currency': wallet.currency,
+            'balance': wallet.balance,
+            'blocked': wallet.balance_blocked,
+        }
+        for wallet in wallets
+    ]
+
+
+def get_user_wallets_snapshot(user, wallet_type):
+    return WalletSnapshot.get(user.id, wallet_type, lambda: build_user_wallets_snapshot(user, wallet_type))
+
+
 @ratelimit(key=authenticated_wallet_ratelimit_key, rate='20/2m', block=True)
 @api
 def wallets_list(request):
@@ -205,7 +242,7 @@ def wallets_list(request):
     user = request.user
     uid = user.id
     wallet_type = parse_choices(Wallet.WALLET_TYPE, request.g('type')) or Wallet.WALLET_TYPE.spot
-    wallets = Wallet.get_user_wallets(user, wallet_type)
+    wallets = get_user_wallets_snapshot(user, wallet_type)
 
     # Check cache for wallet addresses
     if wallet_type == Wallet.WALLET_TYPE.spot:
@@ -214,24 +251,12 @@ def wallets_list(request):
         if not cached_wallet_addresses:
             cached_wallet_addresses = {
                 wallet.id: serialize_wallet_addresses(wallet)
-                for wallet in wallets
+                for wallet in Wallet.get_user_wallets(user, wallet_type)
             }
             cache.set(cache_key, cached_wallet_addresses, 3600)
     else:
         cached_wallet_addresses = {}
 
-    # Calculate blocked balances
-    if wallet_type == Wallet.WALLET_TYPE.spot:
-        block_withdraw = get_user_blocked_withdraws(uid)
-        if check_user_has_no_order(uid):
-            block_order = {}
-        else:
-            block_order = get_user_blocked_orders(uid)
-        for wallet in wallets:
-            wallet.balance_blocked = (
-                block_withdraw.get(wallet.currency, Decimal('0')) + block_order.get(wallet.currency, Decimal('0'))
-            )
-
     supported_currencies = set(ALL_CURRENCIES)
     if not is_feature_enabled(user, 'new_coins'):
         supported_currencies -= set(TESTING_CURRENCIES)
@@ -244,24 +269,24 @@ def wallets_list(request):
         # Ignore wallets with unknown currencies. This only happens when:
         #   1. An unknown wallet objects is created for a user
         #   2. The running code is not up-to-date and is missing a new currency
-        if wallet.currency not in supported_currencies:
+        if wallet['currency'] not in supported_currencies:
             continue
 
-        wallet_dict = cached_wallet_addresses.get(wallet.id) or {}
-        wallet_dict['id'] = wallet.id
-        wallet_dict['currency'] = get_currency_codename(wallet.currency)
+        wallet_dict = cached_wallet_addresses.get(wallet['id']) or {}
+        wallet_dict['id'] = wallet['id']
+        wallet_dict['currency'] = get_currency_codename(wallet['currency'])
         # Balance
-        wallet_dict['balance'] = wallet.balance
-        wallet_dict['blockedBalance'] = wallet.balance_blocked
-        wallet_dict['activeBalance'] = wallet.balance - wallet.balance_blocked
+        wallet_dict['balance'] = wallet['balance']
+        wallet_dict['blockedBalance'] = wallet['blocked']
+        wallet_dict['activeBalance'] = wallet['balance'] - wallet['blocked']
         # Value
-        if wallet.balance < MAX_PRECISION:
+        if wallet['balance'] < MAX_PRECISION:
             wallet_dict['rialBalance'] = 0
             wallet_dict['rialBalanceSell'] = 0
         else:
-            buy_price, sell_price = PriceEstimator.get_price_range(wallet.currency)
-            wallet_dict['rialBalance'] = int(buy_price * wallet.balance)
-            wallet_dict['rialBalanceSell'] = int(sell_price * wallet.balance)
+            buy_price, sell_price = PriceEstimator.get_price_range(wallet['currency'])
+            wallet_dict['rialBalance'] = int(buy_price * wallet['balance'])
+            wallet_dict['rialBalanceSell'] = int(sell_price * wallet['balance'])
         serialized_wallets.append(wallet_dict)
 
     return {
@@ -278,39 +303,33 @@ def v2_wallets(request):
     # Filter user wallets
     user = request.user
     wallet_type = parse_choices(Wallet.WALLET_TYPE, request.g('type')) or Wallet.WALLET_TYPE.spot
-    wallets = Wallet.get_user_wallets(user=user, tp=wallet_type)
     currencies = request.g('currencies')
     if currencies:
-        currencies = [parse_currency(c) for c in currencies.split(',')]
-        wallets = wallets.filter(currency__in=currencies)
-    for wallet in wallets:
-        wallet.user = user
-
-    if wallet_type == Wallet.WALLET_TYPE.spot:
-        # Calculate blocked balances
-        if currencies and len(currencies) <= 1:
-            block_withdraw = {w.currency: BalanceBlockManager.get_blocked_balance(w) for w in wallets}
-            block_order = {w.currency: BalanceBlockManager.get_balance_in_order(w) for w in wallets}
-        else:
-            block_withdraw = get_user_blocked_withdraws(user.id)
-            if check_user_has_no_order(user.id):
-                block_order = {}
-            else:
-                block_order = get_user_blocked_orders(user.id)
-
-        for wallet in wallets:
-            wallet.balance_blocked = (
-                block_withdraw.get(wallet.currency, Decimal('0')) + block_order.get(wallet.currency, Decimal('0'))
-            )
+        currencies = {parse_currency(c) for c in currencies.split(',')}
+    if currencies and len(currencies) <= 1:
+        # Blocked balance of a single wallet is calculated directly, so it is never served stale
+        wallets = Wallet.get_user_wallets(user=user, tp=wallet_type).filter(currency__in=currencies)
+        wallets = [
+            {
+                'id': wallet.id,
+                'currency': wallet.currency,
+                'balance': wallet.balance,
+                'blocked': wallet.blocked_balance,
+            }
+            for wallet in wallets
+        ]
+    else:
+        wallets = get_user_wallets_snapshot(user, wallet_type)
+        if currencies:
+            wallets = [wallet for wallet in wallets if wallet['currency'] in currencies]
 
     # Get wallet balances and create response
     data = {}
     for wallet in wallets:
-        currency = wallet.currency
-        data[CURRENCY_CODENAMES[currency]] = {
-            'id': wallet.id,
-            'balance': wallet.balance,
-            'blocked': wallet.balance_blocked,
+        data[CURRENCY_CODENAMES[wallet['currency']]] = {
+            'id': wallet['id'],
+            'balance': wallet['balance'],
+            'blocked': wallet['blocked'],
         }
     return {
         'status': 'ok',
@@ -373,6 +392,7 @@ def user_transaction_history(request):
 
     download_as_csv = parse_bool(request.GET.get('download'))
     from_id = parse_int(request.GET.get('from_id'))
+    cursor_key = parse_transaction_cursor(request.GET.get('cursor'))
     currency = parse_currency(request.GET.get('currency'))
     tps = parse_multi_choices(Transaction.TYPE, request.GET.get('tp'), max_len=25)
     from_date = parse_utc_timestamp(request.GET.get('from'))
@@ -397,6 +417,8 @@ def user_transaction_history(request):
         else:
             from_id_q = Q(id__gt=from_id) & Q(id__lte=0)
         transactions = transactions.filter(from_id_q)
+    if cursor_key:
+        transactions = transactions.filter(get_transaction_keyset_filter(*cursor_key))
     if tps:
         transactions = transactions.filter(tp__in=tps)
     if not download_as_csv:
@@ -415,7 +437,11 @@ def user_transaction_history(request):
         has_next = False
     else:
         with measure_time_cm(metric='transaction_history_pagination'):
-            transactions, has_next = paginate(transactions, request=request, check_next=True)
+            if cursor_key:
+                # Keyset pagination: the cursor replaces the page offset, so deep pages stay fast
+                transactions, has_next = paginate(transactions, page_size=request.g('pageSize'), check_next=True)
+            else:
+                transactions, has_next = paginate(transactions, request=request, check_next=True)
 
     # Serialize
     if download_as_csv:
@@ -424,6 +450,10 @@ def user_transaction_history(request):
     else:
         transactions = list(transactions)
 
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_transaction_cursor(transactions[-1]['created_at'], transactions[-1]['id'])
+
     type_id_map = {v: k for k, v in Transaction.TYPE._identifier_map.items()}
 
     for tx in transactions:
@@ -444,6 +474,7 @@ def user_transaction_history(request):
         'status': 'ok',
         'transactions': transactions,
         'hasNext': has_next,
+        'nextCursor': next_cursor,
     }, json_dumps_params={'ensure_ascii': False})
 
 
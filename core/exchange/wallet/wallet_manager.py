@@ -1,14 +1,19 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 from django.db import connection, transaction
 from django.utils.timezone import now
 
 from exchange.accounts.models import Notification
+from exchange.base.cache import CacheManager
+from exchange.base.constants import MAX_PRECISION, ZERO
 from exchange.base.internal.services import Services
+from exchange.base.logging import report_event
+from exchange.wallet.constants import TRANSACTION_MAX
 from exchange.wallet.exceptions import InsufficientBalanceError
 from exchange.wallet.models import Transaction, Wallet
+from exchange.wallet.snapshot import WalletSnapshot
 
 
 class WalletTransactionManager:
@@ -85,6 +90,7 @@ class WalletTransactionManager:
 
         Transaction.objects.bulk_create(self._transactions)
         self.wallet.balance = updated_balance
+        WalletSnapshot.invalidate(self.wallet.user_id)
 
         self.reinitialize()
         self._starting_balance = updated_balance
@@ -92,3 +98,131 @@ class WalletTransactionManager:
 
     def reinitialize(self):
         self._transactions.clear()
+
+
+class WalletCredit(NamedTuple):
+    user_id: int
+    currency: int
+    amount: Decimal
+    tp: str  # from `Transaction.TYPE`
+    description: str
+    ref_module: Optional[str] = None  # from `Transaction.REF_MODULES` keys
+    ref_id: Optional[int] = None
+
+
+class WalletBulkCreditManager:
+    """Credit wallets of many users, e.g. for reward payouts, with set-based queries
+
+    On commit, missing wallets are created and all affected wallets are locked in id
+    order, so concurrent settlements cannot deadlock. Balances are then updated with a
+    single statement and transactions are inserted in bulk. Credits are expected to be
+    added in chunks of at most a few thousands, each committed in its own DB transaction.
+    """
+
+    def __init__(self, wallet_type: int = Wallet.WALLET_TYPE.spot):
+        self.wallet_type = wallet_type
+        self._credits: List[WalletCredit] = []
+
+    def add_credit(
+        self,
+        user_id: int,
+        currency: int,
+        amount: Decimal,
+        tp: str,
+        description: str,
+        ref_module: Optional[str] = None,
+        ref_id: Optional[int] = None,
+    ):
+        """Add a credit to the bulk list. Does NOT commit it."""
+        amount = Decimal(amount).quantize(MAX_PRECISION)
+        if not ZERO < amount <= TRANSACTION_MAX:
+            raise ValueError('Invalid credit amount')
+        self._credits.append(WalletCredit(user_id, currency, amount, tp, description, ref_module, ref_id))
+
+    @transaction.atomic
+    def commit(self) -> List[Optional[Transaction]]:
+        """Commit all accumulated credits
+
+        Returns:
+            List of created transactions in order of added credits, with `None` for
+            credits of inactive wallets which are skipped.
+        """
+        if not self._credits:
+            return []
+
+        wallets = self._lock_wallets({(credit.user_id, credit.currency) for credit in self._credits})
+        created_at = now()
+        transactions: List[Optional[Transaction]] = []
+        deltas: Dict[int, Decimal] = {}
+        for credit in self._credits:
+            wallet = wallets[credit.user_id, credit.currency]
+            if not wallet.is_active:
+                transactions.append(None)
+                continue
+            transactions.append(
+                Transaction(
+                    wallet=wallet,
+                    tp=getattr(Transaction.TYPE, credit.tp),
+                    amount=credit.amount,
+                    description=credit.description,
+                    created_at=created_at,
+                    ref_module=Transaction.REF_MODULES.get(credit.ref_module),
+                    ref_id=credit.ref_id,
+                )
+            )
+            deltas[wallet.id] = deltas.get(wallet.id, ZERO) + credit.amount
+
+        skipped_count = transactions.count(None)
+        if skipped_count:
+            report_event('WalletBulkCreditSkippedInactiveWallets', extras={'count': skipped_count})
+
+        balances = self._update_balances(deltas)
+        for tx in reversed(transactions):
+            if tx is None:
+                continue
+            tx.balance = balances[tx.wallet_id]
+            balances[tx.wallet_id] -= tx.amount
+
+        Transaction.objects.bulk_create([tx for tx in transactions if tx is not None])
+        for wallet in wallets.values():
+            if wallet.id in deltas:
+                WalletSnapshot.invalidate(wallet.user_id)
+
+        self._credits.clear()
+        return transactions
+
+    def _lock_wallets(self, keys: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Wallet]:
+        keys = list(keys)
+        wallets = self._fetch_wallets(keys)
+        missing_keys = [key for key in keys if key not in wallets]
+        if missing_keys:
+            Wallet.objects.bulk_create(
+                [Wallet(user_id=user_id, currency=currency, type=self.wallet_type) for user_id, currency in missing_keys],
+                ignore_conflicts=True,
+            )
+            for user_id in {user_id for user_id, _ in missing_keys}:
+                CacheManager.invalidate_user_wallets(user_id)
+        return self._fetch_wallets(keys, lock=True)
+
+    def _fetch_wallets(self, keys: List[Tuple[int, int]], *, lock: bool = False) -> Dict[Tuple[int, int], Wallet]:
+        values = ', '.join(['(%s, %s)'] * len(keys))
+        query = (
+            f'SELECT * FROM {Wallet._meta.db_table} WHERE type = %s AND (user_id, currency) IN (VALUES {values})'
+        )
+        if lock:
+            query += ' ORDER BY id FOR UPDATE'
+        wallets = Wallet.objects.raw(query, [self.wallet_type, *(value for key in keys for value in key)])
+        return {(wallet.user_id, wallet.currency): wallet for wallet in wallets}
+
+    @staticmethod
+    def _update_balances(deltas: Dict[int, Decimal]) -> Dict[int, Decimal]:
+        if not deltas:
+            return {}
+        values = ', '.join(['(%s, %s::numeric)'] * len(deltas))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {Wallet._meta.db_table} AS w SET balance = w.balance + v.delta '
+                f'FROM (VALUES {values}) AS v(id, delta) WHERE w.id = v.id RETURNING w.id, w.balance',
+                [value for item in deltas.items() for value in item],
+            )
+            return dict(cursor.fetchall())
@@ -4,6 +4,7 @@ from exchange.accounts.models import User
 from exchange.base.crons import CronJob, Schedule
 from exchange.base.logging import report_event
 from exchange.web_engage.services.esp import cleanup_email_logs
+from exchange.web_engage.services.events import send_queued_events
 from exchange.web_engage.services.ssp import batch_and_send_sms_messages, inquire_sent_batch_sms
 from exchange.web_engage.services.user import get_users_have_trade_last_day, send_user_data_to_webengage
 
@@ -36,6 +37,17 @@ class InquireSentBatchSMSStatus(CronJob):
         inquire_sent_batch_sms()
 
 
+class SendQueuedEvents(CronJob):
+    schedule = Schedule(run_every_mins=1)
+    code = 'web_engage_send_queued_events'
+    celery_beat = True
+    task_name = 'web_engage_send_queued_events_beat'
+    beat_schedule = 10
+
+    def run(self):
+        send_queued_events()
+
+
 class CleanUpEmailLogs(CronJob):
     schedule = Schedule(run_every_mins=120)
     code = 'clean_up_webengage_email_logs'
@@ -1,11 +1,14 @@
 import logging
+import time
 from datetime import datetime
-from typing import Optional
+from typing import FrozenSet, Optional
 
+from django.conf import settings
 from django.utils import timezone
 
 from exchange.base.models import Settings
 from exchange.web_engage.externals.web_engage import call_on_webengage_active
+from exchange.web_engage.services.events import enqueue_event
 from exchange.web_engage.tasks import task_send_event_data_to_web_engage
 from exchange.web_engage.utils import is_webengage_user
 
@@ -15,6 +18,10 @@ logger = logging.getLogger(__name__)
 class WebEngageKnownUserEvent:
     event_name: str
 
+    STOPPED_EVENTS_CHECK_INTERVAL = 30
+    _stopped_events: FrozenSet[str] = frozenset()
+    _stopped_events_checked_at = 0.0
+
     def __init__(self, user, event_time: Optional[datetime] = None, device_kind: Optional[str] = None):
         self.user = user
         self.event_time = event_time or timezone.now()
@@ -23,10 +30,21 @@ class WebEngageKnownUserEvent:
     def _get_data(self) -> dict:
         raise NotImplementedError()
 
+    @classmethod
+    def get_stopped_events(cls) -> FrozenSet[str]:
+        """Return names of stopped events, kept in process for a while when events are batched"""
+        if not settings.BATCH_WEBENGAGE_EVENTS:
+            return frozenset(Settings.get_list("webengage_stopped_events"))
+        now = time.monotonic()
+        if now - cls._stopped_events_checked_at >= cls.STOPPED_EVENTS_CHECK_INTERVAL:
+            WebEngageKnownUserEvent._stopped_events = frozenset(Settings.get_list("webengage_stopped_events"))
+            WebEngageKnownUserEvent._stopped_events_checked_at = now
+        return WebEngageKnownUserEvent._stopped_events
+
     def _is_eligible_for_sending(self) -> bool:
         if not is_webengage_user(self.user):
             return False
-        if self.event_name in Settings.get_list("webengage_stopped_events"):
+        if self.event_name in self.get_stopped_events():
             return False
         return True
 
@@ -45,6 +63,9 @@ class WebEngageKnownUserEvent:
             if self.device_kind is not None:
                 data['eventData'].update({'device_kind': self.device_kind})
 
-            task_send_event_data_to_web_engage.delay(data=data)
+            if settings.BATCH_WEBENGAGE_EVENTS:
+                enqueue_event(data)
+            else:
+                task_send_event_data_to_web_engage.delay(data=data)
         except:
             logger.exception(f"Error processing web engage event {self.event_name}")
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Optional
+from typing import List, Optional
 from uuid import uuid4
 
 import requests
@@ -166,9 +166,14 @@ class WebEngageUpsertUserAPI(WebEngageDataAPI):
 
 
 class WebEngageEventAPI(WebEngageDataAPI):
+    BULK_EVENTS_LIMIT = 25
+
     def send(self, event_data):
         return super().request("/v1/accounts/{license_code}/events", event_data, event_data.get('eventName'))
 
+    def send_bulk(self, events: List[dict]):
+        return super().request("/v1/accounts/{license_code}/bulk-events", {'events': events}, 'bulk_events')
+
 
 web_engage_user_api = WebEngageUpsertUserAPI()
 web_engage_event_api = WebEngageEventAPI()
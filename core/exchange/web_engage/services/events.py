@@ -0,0 +1,43 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django_redis import get_redis_connection
+
+from exchange.web_engage.externals.web_engage import web_engage_event_api
+
+EVENTS_QUEUE_KEY = 'webengage_events_queue'
+# Oldest events are dropped when the queue is not drained, e.g. during a WebEngage outage
+MAX_QUEUE_LENGTH = 500 * 1000
+CLAIM_SIZE = 1000
+MAX_EVENTS_PER_RUN = 50 * 1000
+
+
+def enqueue_event(data: dict) -> None:
+    """Add an event to the shared queue, to be sent to WebEngage in bulk by `send_queued_events`"""
+    pipeline = get_redis_connection('default').pipeline(transaction=False)
+    pipeline.rpush(EVENTS_QUEUE_KEY, json.dumps(data, cls=DjangoJSONEncoder))
+    pipeline.ltrim(EVENTS_QUEUE_KEY, -MAX_QUEUE_LENGTH, -1)
+    pipeline.execute()
+
+
+def send_queued_events(max_events: int = MAX_EVENTS_PER_RUN) -> int:
+    """Send queued events through WebEngage bulk events API, returning the number of events sent
+
+    Each chunk of events is atomically removed from the queue before being sent, so concurrent
+    runs never send the same events. Like single events, failed requests are not retried.
+    """
+    redis = get_redis_connection('default')
+    sent_events = 0
+    while sent_events < max_events:
+        pipeline = redis.pipeline(transaction=True)
+        pipeline.lrange(EVENTS_QUEUE_KEY, 0, CLAIM_SIZE - 1)
+        pipeline.ltrim(EVENTS_QUEUE_KEY, CLAIM_SIZE, -1)
+        raw_events, _ = pipeline.execute()
+        if not raw_events:
+            break
+
+        events = [json.loads(raw_event) for raw_event in raw_events]
+        for i in range(0, len(events), web_engage_event_api.BULK_EVENTS_LIMIT):
+            web_engage_event_api.send_bulk(events[i : i + web_engage_event_api.BULK_EVENTS_LIMIT])
+        sent_events += len(events)
+    return sent_events
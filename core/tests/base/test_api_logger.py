@@ -1,11 +1,18 @@
+import logging
 import unittest
 from time import sleep
-from unittest.mock import patch
+from unittest.mock import MagicMock, PropertyMock, patch
 
 from django.http import HttpRequest, HttpResponse
+from django.test import override_settings
 
 from exchange.base.internal.services import Services
-from exchange.base.logstash_logging.loggers import logstash_logger
+from exchange.base.logstash_logging.buffer import LogBuffer
+from exchange.base.logstash_logging.loggers import (
+    CustomAsynchronousLogstashHandler,
+    api_log_buffer,
+    logstash_logger,
+)
 
 
 class LogApiDecoratorTestCase(unittest.TestCase):
@@ -81,3 +88,61 @@ class LogApiDecoratorTestCase(unittest.TestCase):
         logged_params = kwargs['extra']['params']
         assert logged_params['process_time'] >= 100
 
+    @override_settings(ASYNC_API_LOGGING=True)
+    @patch.object(CustomAsynchronousLogstashHandler, 'is_enabled', new_callable=PropertyMock, return_value=True)
+    @patch.object(api_log_buffer, 'push')
+    def test_log_api_decorator_async_logging(self, mock_push, _):
+        from exchange.base.api_logger import log_api
+
+        @log_api(is_internal=False)
+        def mock_view(request):
+            return HttpResponse(status=201)
+
+        response = mock_view(self.create_mock_request())
+
+        assert response.status_code == 201
+        mock_push.assert_called_once()
+        level, msg, args, extra = mock_push.call_args[0]
+        assert level == logging.INFO
+        assert msg % args == 'GET /test'
+        assert extra['params']['status'] == '201'
+        assert extra['index_name'] == 'api_logger'
+
+    @override_settings(ASYNC_API_LOGGING=True)
+    @patch.object(CustomAsynchronousLogstashHandler, 'is_enabled', new_callable=PropertyMock, return_value=False)
+    @patch.object(api_log_buffer, 'push')
+    def test_log_api_decorator_async_logging_disabled(self, mock_push, _):
+        from exchange.base.api_logger import log_api
+
+        @log_api(is_internal=False)
+        def mock_view(request):
+            return HttpResponse(status=200)
+
+        response = mock_view(self.create_mock_request())
+
+        assert response.status_code == 200
+        mock_push.assert_not_called()
+
+
+class LogBufferTestCase(unittest.TestCase):
+    def test_flush_ships_records_in_order(self):
+        logger = MagicMock()
+        buffer = LogBuffer(logger, max_size=10, flush_interval=60)
+        buffer.push(logging.INFO, '%s %s', ('GET', '/a'), {'params': {'a': 1}})
+        buffer.push(logging.WARNING, 'b')
+
+        assert buffer.flush() == 2
+        assert logger.log.call_args_list[0][0] == (logging.INFO, '%s %s', 'GET', '/a')
+        assert logger.log.call_args_list[0][1] == {'extra': {'params': {'a': 1}}}
+        assert logger.log.call_args_list[1][0] == (logging.WARNING, 'b')
+        assert buffer.flush() == 0
+
+    def test_push_drops_oldest_records_on_overflow(self):
+        logger = MagicMock()
+        buffer = LogBuffer(logger, max_size=2, flush_interval=60)
+        for i in range(5):
+            buffer.push(logging.INFO, str(i))
+
+        assert buffer.dropped == 3
+        assert buffer.flush() == 2
+        assert [call[0][1] for call in logger.log.call_args_list] == ['3', '4']
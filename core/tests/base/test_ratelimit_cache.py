@@ -0,0 +1,118 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from exchange.base.ratelimit_cache import BatchedRateLimitCache, get_key_limit, set_key_limit
+
+
+class BatchedRateLimitCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.local_cache = self._create_cache()
+        set_key_limit('rl:key', 1000)
+
+    @staticmethod
+    def _create_cache(direct_margin=0):
+        options = {'TARGET_CACHE': 'default', 'SYNC_INTERVAL': 60, 'MAX_PENDING': 3, 'DIRECT_MARGIN': direct_margin}
+        return BatchedRateLimitCache(None, {'OPTIONS': options})
+
+    @staticmethod
+    def _hit(rate_limit_cache, key='rl:key'):
+        """Count a hit like django_ratelimit does"""
+        if rate_limit_cache.add(key, 1, 60):
+            return 1
+        return rate_limit_cache.incr(key)
+
+    def test_counts_locally_and_syncs_in_batches(self):
+        assert self.local_cache.add('rl:key', 1, 60)
+        assert cache.get('rl:key') == 1
+        assert not self.local_cache.add('rl:key', 1, 60)
+        assert self.local_cache.incr('rl:key') == 2
+        assert cache.get('rl:key') == 1
+        assert self.local_cache.incr('rl:key') == 3
+        assert cache.get('rl:key') == 1
+        # Reaching max pending hits triggers a sync
+        assert self.local_cache.incr('rl:key') == 4
+        assert cache.get('rl:key') == 4
+        assert self.local_cache.get('rl:key') == 4
+
+    def test_merges_counts_of_other_processes(self):
+        other_cache = self._create_cache()
+        assert self.local_cache.add('rl:key', 1, 60)
+        # The shared counter exists, so the other process counts its first hit by incr
+        assert not other_cache.add('rl:key', 1, 60)
+        assert other_cache.incr('rl:key') == 1
+        other_cache.sync()
+        assert other_cache.get('rl:key') == 2
+        self.local_cache.incr('rl:key')
+        self.local_cache.sync()
+        assert self.local_cache.get('rl:key') == 3
+        assert cache.get('rl:key') == 3
+
+    def test_low_limits_are_not_exceeded_by_multiple_processes(self):
+        set_key_limit('rl:key', 5)
+        processes = [self._create_cache(direct_margin=20) for _ in range(3)]
+        counts = [self._hit(processes[i % len(processes)]) for i in range(10)]
+        # Each hit is counted in the shared cache directly, so a 5/m limit allows exactly 5 hits
+        assert counts == list(range(1, 11))
+        assert len([count for count in counts if count <= 5]) == 5
+        assert cache.get('rl:key') == 10
+
+    def test_missing_and_expired_keys(self):
+        with self.assertRaises(ValueError):
+            self.local_cache.incr('rl:missing')
+        assert self.local_cache.get('rl:missing', 0) == 0
+        with patch('exchange.base.ratelimit_cache.time.monotonic', return_value=1000.0):
+            self.local_cache.add('rl:key', 1, 60)
+        cache.delete('rl:key')
+        with patch('exchange.base.ratelimit_cache.time.monotonic', return_value=1061.0):
+            assert self.local_cache.get('rl:key') is None
+            assert self.local_cache.add('rl:key', 1, 60)
+
+    def test_sync_failure_fails_open(self):
+        self.local_cache.add('rl:key', 1, 60)
+        with patch.object(BatchedRateLimitCache, '_push', side_effect=ConnectionError):
+            for _ in range(5):
+                self.local_cache.incr('rl:key')
+        assert self.local_cache.get('rl:key') == 6
+        # Hits of failed syncs are sent again
+        self.local_cache.sync()
+        assert cache.get('rl:key') == 6
+        assert self.local_cache.get('rl:key') == 6
+
+    def test_direct_push_failure_keeps_hits(self):
+        set_key_limit('rl:key', 5)
+        direct_cache = self._create_cache(direct_margin=20)
+        assert direct_cache.add('rl:key', 1, 60)
+        with patch.object(BatchedRateLimitCache, '_push', side_effect=ConnectionError):
+            assert direct_cache.incr('rl:key') == 2
+        assert cache.get('rl:key') == 1
+        assert direct_cache.incr('rl:key') == 3
+        assert cache.get('rl:key') == 3
+
+    def test_hits_near_limit_are_counted_directly(self):
+        set_key_limit('rl:key', 30)
+        margin_cache = self._create_cache(direct_margin=20)
+        counts = [self._hit(margin_cache) for _ in range(12)]
+        assert counts == list(range(1, 13))
+        # Hits far from the limit are batched, and hits within the margin are added right away
+        assert cache.get('rl:key') == 12
+        margin_cache.sync()
+        assert cache.get('rl:key') == 12
+        set_key_limit('rl:key', 100)
+        self._hit(margin_cache)
+        assert cache.get('rl:key') == 12
+
+    def test_hits_of_unknown_limits_are_counted_directly(self):
+        set_key_limit('rl:other', 1000)
+        assert get_key_limit('rl:key') is None
+        assert self._hit(self.local_cache) == 1
+        assert self._hit(self.local_cache) == 2
+        assert cache.get('rl:key') == 2
+
+    def test_django_ratelimit_keys_limits(self):
+        from django_ratelimit import core
+
+        key = core._make_cache_key('group', 60, '10/m', 'value', None)
+        assert get_key_limit(key) == 10
@@ -1,7 +1,10 @@
+from unittest.mock import patch
+
 from django.core.cache import cache
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from exchange.base.models import Settings
+from exchange.base.settings_snapshot import SettingsSnapshot
 
 
 class SettingsTest(TestCase):
@@ -38,3 +41,48 @@ class SettingsTest(TestCase):
         assert Settings.get_cached_json('test_settings5', default='2') == '2'
         Settings.objects.filter(key='test_settings5').update(value='"3"')
         assert Settings.get_cached_json('test_settings5', default='2') == '3'
+
+
+@override_settings(USE_SETTINGS_SNAPSHOT=True)
+class SettingsSnapshotTest(TestCase):
+    def setUp(self):
+        SettingsSnapshot.clear()
+        cache.delete(SettingsSnapshot.VERSION_KEY)
+        Settings.objects.create(key='test_snapshot_flag', value='yes')
+
+    def tearDown(self):
+        SettingsSnapshot.clear()
+
+    def test_get_from_snapshot(self):
+        assert Settings.get_flag('test_snapshot_flag')
+        with self.assertNumQueries(0):
+            assert Settings.get('test_snapshot_flag') == 'yes'
+            assert Settings.get_value('test_snapshot_flag') == 'yes'
+            assert Settings.get_many(['test_snapshot_flag']) == {'test_snapshot_flag': 'yes'}
+
+    def test_missing_key_falls_back_to_db(self):
+        Settings.get('test_snapshot_flag')
+        with self.captureOnCommitCallbacks(execute=True):
+            assert Settings.get('test_snapshot_missing', default='no') == 'no'
+        assert Settings.objects.get(key='test_snapshot_missing').value == 'no'
+        with self.assertNumQueries(1):
+            assert Settings.get('test_snapshot_missing') == 'no'
+        with self.assertNumQueries(0):
+            assert Settings.get('test_snapshot_missing') == 'no'
+
+    def test_invalidation_on_change(self):
+        assert Settings.get('test_snapshot_flag') == 'yes'
+        with self.captureOnCommitCallbacks(execute=True):
+            Settings.set('test_snapshot_flag', 'no')
+        assert Settings.get('test_snapshot_flag') == 'no'
+        with self.captureOnCommitCallbacks(execute=True):
+            Settings.set_cached_json('test_snapshot_flag', 'yes')
+        assert Settings.get('test_snapshot_flag') == '"yes"'
+
+    def test_version_check_interval(self):
+        assert Settings.get('test_snapshot_flag') == 'yes'
+        Settings.objects.filter(key='test_snapshot_flag').update(value='no')
+        cache.set(SettingsSnapshot.VERSION_KEY, 'changed-by-another-process')
+        assert Settings.get('test_snapshot_flag') == 'yes'
+        with patch.object(SettingsSnapshot, 'VERSION_CHECK_INTERVAL', 0):
+            assert Settings.get('test_snapshot_flag') == 'no'
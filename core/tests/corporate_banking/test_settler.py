@@ -344,6 +344,40 @@ class TestSettler(TestCase):
         # the second one is that one this test is looking for
         assert mock_on_commit.call_count == 2
 
+    @patch('exchange.corporate_banking.services.settler.report_exception')
+    @patch('django.db.transaction.on_commit')
+    def test_create_deposits_in_groups(self, mock_on_commit, mock_report_exception):
+        unknown_iban_statement = CoBankStatement.objects.create(
+            amount=Decimal('20000'),
+            tp=STATEMENT_TYPE.deposit,
+            tracing_number='TRX-002',
+            source_iban='IR500190000000218005998009',
+            destination_account=self.cobank_operational_account,
+            status=STATEMENT_STATUS.validated,
+        )
+        other_statement = CoBankStatement.objects.create(
+            amount=Decimal('30000'),
+            tp=STATEMENT_TYPE.deposit,
+            tracing_number='TRX-003',
+            source_iban=self.user_bank_account.shaba_number,
+            destination_account=self.cobank_operational_account,
+            status=STATEMENT_STATUS.validated,
+        )
+
+        with patch.object(Settler, 'SETTLEMENT_BATCH_SIZE', 2):
+            deposits = self.settler.create_deposits([self.deposit_statement, unknown_iban_statement, other_statement])
+
+        # A failed deposit does not roll back other deposits of its group
+        mock_report_exception.assert_called_once()
+        assert [deposit.cobank_statement for deposit in deposits] == [self.deposit_statement, other_statement]
+        assert set(CoBankUserDeposit.objects.values_list('cobank_statement_id', flat=True)) == {
+            self.deposit_statement.id,
+            other_statement.id,
+        }
+        unknown_iban_statement.refresh_from_db()
+        assert unknown_iban_statement.status == STATEMENT_STATUS.validated
+        assert Wallet.get_user_wallet(self.user, RIAL).balance == Decimal('39996')
+
     @patch('exchange.corporate_banking.models.deposit.create_and_commit_transaction', new_callable=MagicMock)
     @patch('django.db.transaction.on_commit')
     def test_create_no_deposit_without_transaction(self, mock_on_commit, mock_create_and_commit_transaction):
@@ -2,10 +2,13 @@ from unittest.mock import patch
 
 import requests
 import responses
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
 from exchange.base.models import Settings
+from exchange.base.settings_snapshot import SettingsSnapshot
 from exchange.corporate_banking.exceptions import ThirdPartyAuthenticationException
+from exchange.corporate_banking.integrations.base import remove_tokens
 from exchange.corporate_banking.integrations.toman.authenticator import CobankTomanAuthenticator
 
 
@@ -234,3 +237,19 @@ class TestCobankTomanAuthenticator(TestCase):
         assert len(responses.calls) == 2
         assert Settings.get(access_key) == self.sample_successful_toman_response['access_token']
         assert Settings.get(refresh_key) == self.sample_successful_toman_response['refresh_token']
+
+    @override_settings(USE_SETTINGS_SNAPSHOT=True)
+    def test_remove_tokens_invalidates_settings_snapshot(self):
+        access_key = CobankTomanAuthenticator.access_token_settings_key
+        refresh_key = CobankTomanAuthenticator.refresh_token_settings_key
+        SettingsSnapshot.clear()
+        cache.delete(SettingsSnapshot.VERSION_KEY)
+        self.addCleanup(SettingsSnapshot.clear)
+        Settings.set(access_key, 'revoked-access-token')
+        Settings.set(refresh_key, 'revoked-refresh-token')
+        assert Settings.get_value(access_key) == 'revoked-access-token'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_tokens(access_key, refresh_key)
+        assert Settings.get_value(access_key) is None
+        assert Settings.get_value(refresh_key) is None
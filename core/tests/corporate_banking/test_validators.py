@@ -637,6 +637,69 @@ class TestValidators(TestCase):
             assert e.code == 'AmountTooHigh'
 
 
+    @patch('django.conf.settings.NOBITEX_OPTIONS', {'coBankLimits': {'maxDeposit': 1000000, 'minDeposit': 500}})
+    def test_compound_validators_prefetch(self):
+        other_user = User.objects.create(
+            username=f'bob_{random.randint(0, 1000000)}',
+            user_type=User.USER_TYPE_LEVEL1,
+        )
+        BankAccount.objects.create(
+            user=other_user,
+            account_number='654321',
+            shaba_number='IR999999999999999999999994',
+            owner_name=other_user.username,
+            bank_name='something',
+            bank_id=BankAccount.BANK_ID.saman,
+            confirmed=True,
+        )
+        self.statement2.source_iban = 'IR999999999999999999999994'
+        self.statement2.save()
+        statement3 = CoBankStatement.objects.create(
+            amount=Decimal('300000'),
+            tp=STATEMENT_TYPE.deposit,
+            tracing_number='TRX-003',
+            source_iban='IR999999999999999999999995',
+            destination_account=self.cobank_account,
+            provider_statement_id='PROV-003',
+        )
+
+        cache.set('settings_cobank_check_feature_flag', 'yes')
+        validator = UserLevelValidator(FeatureFlagValidator(BankAccountValidator(DepositAmountValidator())))
+        with self.assertNumQueries(2):
+            validator.prefetch([self.statement, self.statement2, statement3])
+        with self.assertNumQueries(0):
+            assert validator.validate(self.statement) == self.user
+            with pytest.raises(FeatureFlagValidationException, match='FeatureUnavailable'):
+                validator.validate(self.statement2)
+            with pytest.raises(BankAccountValidationException, match='BankAccountNotFound'):
+                validator.validate(statement3)
+
+    @patch('exchange.corporate_banking.services.validators.logstash_logger.info')
+    def test_double_spend_preventer_prefetch(self, logger_mock):
+        self.statement2.amount = self.statement.amount
+        self.statement2.source_account = self.statement.source_account
+        self.statement2.tracing_number = self.statement.tracing_number
+        self.statement2.api_response = {'ref1': self.statement.api_response['ref1']}
+        self.statement2.save()
+        statement3 = CoBankStatement.objects.create(
+            amount=self.statement.amount,
+            tp=STATEMENT_TYPE.deposit,
+            tracing_number='TRX-003',
+            source_account=self.statement.source_account,
+            destination_account=self.cobank_account,
+            provider_statement_id='PROV-003',
+            api_response={'ref1': 'ABC333'},
+        )
+
+        validator = DoubleSpendPreventer()
+        with self.assertNumQueries(1):
+            validator.prefetch([self.statement, self.statement2, statement3])
+        with self.assertNumQueries(0):
+            with pytest.raises(PossibleDoubleSpendException, match='RepeatedReferenceCode'):
+                validator.validate(self.statement2)
+            assert validator.validate(statement3) == statement3
+        logger_mock.assert_called_once()
+
 class RefundStatementValidatorTestCase(TestCase):
     def setUp(self):
         self.cobank_operational_account = CoBankAccount.objects.create(
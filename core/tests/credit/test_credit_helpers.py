@@ -9,7 +9,14 @@ from exchange.base.calendar import ir_now
 from exchange.base.models import Currencies
 from exchange.accounts.models import User
 from exchange.wallet.models import Wallet, WithdrawRequest
-from exchange.credit.helpers import get_user_net_worth, get_user_debt_worth, ToUsdtConvertor
+from exchange.credit.helpers import (
+    ToUsdtConvertor,
+    UsdtPriceVector,
+    get_user_debt_worth,
+    get_user_net_worth,
+    get_users_debt_worth,
+    get_users_net_worth,
+)
 from exchange.credit.models import CreditPlan, CreditTransaction
 from exchange.credit import errors
 
@@ -131,6 +138,15 @@ class GetUserNetWorthTest(TestCase):
         get_usdt_price_mock.side_effect = [errors.UnavailablePrice("")] + self.prices[2:3]
         assert get_user_net_worth(self.user_id) == Decimal('2')
 
+    def test_get_users_net_worth(self):
+        other_user_id = User.objects.create_user(username='credit-test-user-2').id
+        Wallet.get_user_wallet(other_user_id, Currencies.btc).create_transaction('manual', Decimal('2')).commit()
+        prices = UsdtPriceVector()
+        prices_map = dict(zip(self.currencies, self.prices))
+        with patch.object(UsdtPriceVector, 'get', side_effect=prices_map.get), self.assertNumQueries(2):
+            net_worths = get_users_net_worth([self.user_id, other_user_id, 1000000], prices)
+        assert net_worths == {self.user_id: Decimal('27'), other_user_id: Decimal('20'), 1000000: Decimal('0')}
+
 
 class GetUserDebtWorthTest(TestCase):
     # Due to Sensitivity lets dont mock responses of DB queries.
@@ -166,6 +182,27 @@ class GetUserDebtWorthTest(TestCase):
         )])
         assert get_user_debt_worth(self.user_id) == Decimal('79')
 
+    def test_get_users_debt_worth(self):
+        CreditTransaction.objects.bulk_create([CreditTransaction(
+            plan=GetUserDebtWorthTest.plan,
+            currency=currency,
+            tp=tp,
+            amount=amount,
+        ) for currency, tp, amount, in (
+            (self.currencies[0], CreditTransaction.TYPES.lend, Decimal('9'),),
+            (self.currencies[0], CreditTransaction.TYPES.repay, Decimal('2'),),
+            (self.currencies[1], CreditTransaction.TYPES.lend, Decimal('3'),),
+        )])
+        prices_map = dict(zip(self.currencies, self.prices))
+        with patch.object(UsdtPriceVector, 'get', side_effect=prices_map.get):
+            assert get_users_debt_worth([self.user_id, 202], UsdtPriceVector()) == {
+                self.user_id: Decimal('79'),
+                202: Decimal('0'),
+            }
+        # Users with debts of unavailable prices are skipped
+        with patch.object(UsdtPriceVector, 'get', side_effect=[None, Decimal('3')]):
+            assert get_users_debt_worth([self.user_id, 202], UsdtPriceVector()) == {202: Decimal('0')}
+
 
 class GetUsdtPriceTest(TestCase):
 
@@ -200,6 +237,16 @@ class GetUsdtPriceTest(TestCase):
         cache.set('okx_prices', okx_prices)
         assert ToUsdtConvertor(Currencies.btc).get_price() == Decimal(cache.get('settings_prices_binance_futures')['btc'])
 
+    def test_price_vector(self):
+        prices = UsdtPriceVector()
+        assert prices.get(Currencies.btc) == ToUsdtConvertor(Currencies.btc).get_price()
+        assert prices.get(Currencies.usdt) == Decimal('1')
+        btc_price = prices.get(Currencies.btc)
+        cache.delete('settings_prices_binance_futures')
+        cache.delete('okx_prices')
+        # Prices are computed once per vector
+        assert prices.get(Currencies.btc) == btc_price
+
     def test_price_is_not_available(self):
         binance_prices = cache.get('settings_prices_binance_futures')
         binance_prices['btc'] *= 1.1
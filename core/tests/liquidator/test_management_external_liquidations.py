@@ -13,6 +13,7 @@ from exchange.base.calendar import ir_now
 from exchange.base.models import RIAL, TETHER, Currencies, get_currency_codename
 from exchange.liquidator.broker_apis import SettlementRequest, SettlementStatus
 from exchange.liquidator.models import Liquidation, LiquidationRequest
+from exchange.liquidator.services import ExternalLiquidationProcessor
 from exchange.liquidator.tasks import (
     task_check_status_external_liquidation,
     task_create_external_order,
@@ -378,3 +379,22 @@ class TestLiquidationRequestProcess(TestCase):
             title=f'‼️Settlement Status- {liquidations[1].symbol}',
             channel='liquidator',
         )
+
+    @responses.activate
+    @patch('exchange.liquidator.services.liquidation_processor.log_time')
+    def test_update_statuses_in_batches(self, log_time_mock):
+        liquidations = self._create_orders_and_check_liquidations()
+        self._order_filled_response(liquidations[0])
+        self._error_not_found_response(liquidations[1])
+
+        processor = ExternalLiquidationProcessor(concurrent=False)
+        processor.BATCH_SIZE = 1
+        assert processor.update_statuses(created_before=IR_NOW + timedelta(minutes=5)) == 2
+
+        liquidations = Liquidation.objects.order_by('id')
+        assert [liquidation.status for liquidation in liquidations] == [Liquidation.STATUS.ready_to_share] * 2
+        assert liquidations[0].filled_amount == liquidations[0].amount
+        assert liquidations[1].filled_amount == 0
+        assert log_time_mock.call_count == 2
+        assert log_time_mock.call_args.args[0] == 'liquidator_liquidation_status_change_duration'
+        assert log_time_mock.call_args.kwargs['labels'] == ('open', 'readytoshare')
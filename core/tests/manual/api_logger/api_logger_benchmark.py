@@ -0,0 +1,78 @@
+"""Microbenchmark of per-request overhead of the `log_api` decorator.
+
+Logs are handed to the real logstash handler, so run a local logstash or ignore shipping errors.
+Only the time spent in request thread is measured.
+
+How to Run:
+>>> PYTHONPATH=. python tests/manual/api_logger/api_logger_benchmark.py
+"""
+
+import os
+import statistics
+import time
+from unittest.mock import PropertyMock, patch
+
+import django
+from django.test import override_settings
+
+# Initialize Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exchange.settings')
+django.setup()
+
+from django.http import HttpRequest, HttpResponse
+
+from exchange.base.api_logger import log_api
+from exchange.base.logstash_logging.loggers import CustomAsynchronousLogstashHandler, api_log_buffer
+
+NUM_REQUESTS = 100 * 1000
+AUTH_HEADER = (
+    'Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJzZXJ2aWNlIjoiYWJjIn0.'
+    'hLhFvSmk-dgnPDZmJUWDNb0V6nUF3HEY3cRG2Gx2Ik8'
+)
+
+
+def view(request):
+    return HttpResponse(status=200)
+
+
+def create_request():
+    request = HttpRequest()
+    request.META['PATH_INFO'] = '/market/orders/list'
+    request.META['REQUEST_METHOD'] = 'POST'
+    request.META['REMOTE_ADDR'] = '127.0.0.1'
+    request.META['HTTP_AUTHORIZATION'] = AUTH_HEADER
+    return request
+
+
+def measure(func, title):
+    request = create_request()
+    timings = []
+    for _ in range(NUM_REQUESTS):
+        start = time.perf_counter_ns()
+        func(request)
+        timings.append((time.perf_counter_ns() - start) / 1000)
+        # Keep buffered records from being dropped or shipped in the middle of measurement
+        api_log_buffer.flush()
+    timings.sort()
+    print(
+        f'{title:<24} mean={statistics.mean(timings):8.2f}us '
+        f'p50={timings[len(timings) // 2]:8.2f}us p99={timings[int(len(timings) * 0.99)]:8.2f}us'
+    )
+
+
+def run():
+    print(f'Calling views {NUM_REQUESTS} times')
+    measure(view, 'no logging')
+    logged_view = log_api(is_internal=False)(view)
+    for is_enabled in (False, True):
+        with patch.object(
+            CustomAsynchronousLogstashHandler, 'is_enabled', new_callable=PropertyMock, return_value=is_enabled
+        ):
+            with override_settings(ASYNC_API_LOGGING=False):
+                measure(logged_view, f'sync, enabled={is_enabled}')
+            with override_settings(ASYNC_API_LOGGING=True):
+                measure(logged_view, f'async, enabled={is_enabled}')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,122 @@
+"""Throughput test of the FCM dispatcher against a local fake FCM endpoint.
+
+The fake endpoint answers each batch after a fixed latency, similar to FCM, and reports a
+configurable share of tokens as unregistered. Test notifications and devices are created for
+existing users of the local database and are removed afterwards.
+
+How to Run:
+>>> PYTHONPATH=. python tests/manual/fcm/fcm_dispatcher_load_test.py
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import django
+import requests
+
+# Initialize Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exchange.settings')
+django.setup()
+
+from firebase_admin.messaging import UnregisteredError
+
+from exchange.accounts.models import User
+from exchange.base import connections
+from exchange.fcm.models import FCMDevice
+from exchange.notification.fcm_dispatcher import FCMDispatcher
+from exchange.notification.models import InAppNotification
+
+NUM_USERS = 1000
+NUM_NOTIFICATIONS = 50 * 1000
+FCM_LATENCY = 0.2  # Seconds per batch
+UNREGISTERED_EVERY = 50  # Every nth device token is reported as unregistered
+TOKEN_PREFIX = 'fake-fcm-'
+FAKE_FCM_ADDRESS = ('127.0.0.1', 8765)
+
+
+class FakeFCMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        tokens = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(FCM_LATENCY)
+        body = json.dumps([not token.endswith('-unregistered') for token in tokens]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMessaging:
+    """Stand-in for `firebase_admin.messaging` sending batches to the fake endpoint"""
+
+    Message = SimpleNamespace
+
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+
+    def send_each(self, messages):
+        results = self.session.post(self.url, json=[message.token for message in messages], timeout=10).json()
+        return SimpleNamespace(
+            responses=[
+                SimpleNamespace(success=success, exception=None if success else UnregisteredError('Unregistered'))
+                for success in results
+            ]
+        )
+
+
+def prepare_data():
+    users = list(User.objects.order_by('id').values_list('id', flat=True)[:NUM_USERS])
+    FCMDevice.objects.bulk_create(
+        [
+            FCMDevice(
+                user_id=user_id,
+                token=f'{TOKEN_PREFIX}{user_id}' + ('-unregistered' if i % UNREGISTERED_EVERY == 0 else ''),
+            )
+            for i, user_id in enumerate(users)
+        ],
+        ignore_conflicts=True,
+    )
+    notifications = InAppNotification.objects.bulk_create(
+        [
+            InAppNotification(user_id=users[i % len(users)], message=f'FCM load test {i}')
+            for i in range(NUM_NOTIFICATIONS)
+        ],
+        batch_size=5000,
+    )
+    return notifications[0].id
+
+
+def cleanup():
+    InAppNotification.objects.filter(message__startswith='FCM load test ').delete()
+    FCMDevice.objects.filter(token__startswith=TOKEN_PREFIX).delete()
+
+
+def run():
+    server = ThreadingHTTPServer(FAKE_FCM_ADDRESS, FakeFCMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connections.clients['fcm'] = FakeMessaging('http://{}:{}/'.format(*FAKE_FCM_ADDRESS))
+
+    try:
+        for workers in (1, 4, 8):
+            start_id = prepare_data()
+            dispatcher = FCMDispatcher(batch_size=500, workers=workers, start_id=start_id, concurrent=True)
+            start_time = time.time()
+            sent = dispatcher.dispatch()
+            duration = time.time() - start_time
+            print(f'workers={workers:<3} sent={sent:<8} duration={duration:8.2f}s rate={sent / duration:10.1f}/s')
+            cleanup()
+    finally:
+        cleanup()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    run()
@@ -1,12 +1,16 @@
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.core.cache import cache
 from django.test import Client, TestCase
+from django.utils.timezone import now
 from rest_framework import status
 
 from exchange.accounts.models import User, Notification, UserSms
+from exchange.base.models import Settings
 from exchange.base.serializers import serialize
 from exchange.market.models import Market
+from exchange.pricealert.engine import MarketAlertIndex, PriceAlertEngine
 from exchange.pricealert.models import PriceAlert
 
 
@@ -109,6 +113,82 @@ class PriceAlertModelTest(TestCase):
             sms.delete() and notification.delete()
 
 
+    @patch('exchange.accounts.models.send_telegram_message.chunks')
+    @patch('exchange.accounts.producer.notification_producer.write_event')
+    def test_price_alert_send_notifications_forwarding(self, producer_write_event, send_telegram_message):
+        Settings.set('is_kafka_enabled', 'true')
+        Settings.set('is_notification_logging_enabled', 'true')
+        User.objects.filter(pk=201).update(telegram_conversation_id='test201')
+        market = self.get_market_with_value('BTCIRT', 2000)
+        alerts = [
+            PriceAlert.objects.create(
+                user_id=201, market_id=market.id, tp=1, param_direction=True, param_value=value, channel=1
+            )
+            for value in (1000, 1500)
+        ]
+        PriceAlert.send_notifications(alerts)
+        # Bulk created notifications are sent to the broker and telegram like single ones
+        assert producer_write_event.call_count == 2
+        assert [len(call.args[0]) for call in send_telegram_message.call_args_list] == [2]
+        notifications = Notification.objects.filter(user_id=201, message__in=[alert.get_text() for alert in alerts])
+        assert notifications.count() == 2
+        assert all(notification.sent_to_telegram for notification in notifications)
+
+class PriceAlertEngineTest(TestCase):
+    def setUp(self):
+        self.market = Market.by_symbol('BTCUSDT')
+        cache.set(f'market_{self.market.id}_last_price', Decimal('30000'))
+
+    def _create_alert(self, direction, value, **kwargs):
+        return PriceAlert.objects.create(
+            user_id=201,
+            market=self.market,
+            tp=PriceAlert.TYPES.price,
+            param_direction=direction,
+            param_value=value,
+            channel=PriceAlert.CHANNELS.notif,
+            **kwargs,
+        )
+
+    def test_market_alert_index(self):
+        index = MarketAlertIndex()
+        for alert_id, (direction, value) in enumerate(
+            [(True, 100), (True, 110), (True, 120), (False, 90), (False, 80), (False, 100)]
+        ):
+            index.add(alert_id, direction, Decimal(value))
+        assert index.pop_crossed(Decimal(100)) == [0, 5]
+        assert index.pop_crossed(Decimal(100)) == []
+        assert sorted(index.pop_crossed(Decimal(115))) == [1]
+        assert sorted(index.pop_crossed(Decimal(85))) == [3]
+        assert len(index) == 2
+
+    def test_price_alert_engine(self):
+        one_time_alert = self._create_alert(True, Decimal('31000'), cooldown=-1)
+        periodic_alert = self._create_alert(False, Decimal('29000'), cooldown=60)
+        self._create_alert(False, Decimal('29000'), cooldown=60, last_alert=now())  # in cooldown
+        not_crossed_alert = self._create_alert(True, Decimal('40000'))
+        engine = PriceAlertEngine()
+        assert engine.check() == 0
+        assert len(engine.indexes[self.market.id]) == 3
+
+        cache.set(f'market_{self.market.id}_last_price', Decimal('31000'))
+        assert engine.check() == 1
+        assert not PriceAlert.objects.filter(id=one_time_alert.id).exists()
+
+        # Price spikes down and is seen in the next check
+        cache.set(f'market_{self.market.id}_last_price', Decimal('28000'))
+        assert engine.check() == 1
+        periodic_alert.refresh_from_db()
+        assert periodic_alert.last_alert
+        assert engine.check() == 0
+        assert Notification.objects.filter(user_id=201, message__contains='BTCUSDT').count() == 2
+
+        # Triggered alerts in cooldown are not loaded again
+        engine.refresh()
+        assert [alert_id for _, alert_id in engine.indexes[self.market.id].above] == [not_crossed_alert.id]
+        assert engine.indexes[self.market.id].below == []
+
+
 class PriceAlertViewTest(TestCase):
     url = '/v2/price-alerts'
 
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.core.cache import cache
 from django.test import TransactionTestCase, override_settings
@@ -142,3 +143,47 @@ class TradeProcessorTest(TransactionTestFastFlushMixin, TransactionTestCase):
         processor.bulk_update_trades()
 
         assert cache.get('tradeprocessor_last_trade_id') == self.trade1.id
+
+    def test_pipelined_batches(self):
+        processor = TradeProcessor(batch_size=1, commit_trade=False, workers=2)
+        processor.do_round()
+        processor.bulk_update_trades()
+
+        assert processor.trades_count == 2
+        for trade in (self.trade1, self.trade2):
+            trade.refresh_from_db()
+            assert trade.sell_deposit_id
+            assert trade.buy_deposit_id
+        assert cache.get('tradeprocessor_last_trade_id') == self.trade1.id
+
+    def test_last_trade_id_stops_at_failed_trade(self):
+        fill_trade_transactions = TradeProcessor.fill_trade_transactions
+
+        def fill_or_fail(processor, trade, *args):
+            if trade.id == self.trade2.id:
+                raise ValueError('Failed')
+            return fill_trade_transactions(processor, trade, *args)
+
+        with patch.object(TradeProcessor, 'fill_trade_transactions', fill_or_fail):
+            processor = TradeProcessor(commit_trade=False)
+            processor.do_round()
+            processor.bulk_update_trades()
+
+        self.trade1.refresh_from_db()
+        self.trade2.refresh_from_db()
+        assert self.trade1.sell_deposit_id
+        assert self.trade2.sell_deposit_id is None
+        assert cache.get('tradeprocessor_last_trade_id') == 0
+
+    def test_shard_trades_by_deposit_wallet(self):
+        trades = list(OrderMatching.objects.select_related('sell_order', 'buy_order').order_by('id'))
+        order_to_provider_id = {order.id: order.user_id for trade in trades for order in (trade.sell_order, trade.buy_order)}
+
+        shards = TradeProcessor.shard_trades(trades, order_to_provider_id, shards_count=2)
+        assert sorted(len(shard) for shard in shards) == [1, 1]
+
+        # Trades depositing to the same wallet are never split between shards
+        order_to_provider_id = {order_id: self.user1.id for order_id in order_to_provider_id}
+        trades[1].sell_order.dst_currency = trades[0].sell_order.dst_currency
+        shards = TradeProcessor.shard_trades(trades, order_to_provider_id, shards_count=2)
+        assert [[trade.id for trade in shard] for shard in shards] == [[self.trade1.id, self.trade2.id]]
@@ -1,7 +1,13 @@
+import threading
+from unittest.mock import patch
+
+from celery.signals import worker_process_shutdown
+
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 
 from exchange.accounts.models import User
-from exchange.metrics.exporter import Counter, Gauge
+from exchange.metrics.exporter import Counter, Gauge, Histogram, MetricManager, Summary
 
 
 @override_settings(MONITORING_USERNAME='user', MONITORING_PASSWORD='pass')  # noqa: S106
@@ -25,6 +31,81 @@ class TestMetrics(TestCase):
         self.gauge_metric.set(10)
         assert self.gauge_metric.get_value() == 10
 
+    @patch.object(MetricManager, 'FLUSH_INTERVAL', 60)
+    def test_counter_observations_are_buffered(self):
+        MetricManager.flush()
+        self.counter_metric.inc()
+        self.counter_metric.inc(2)
+        assert cache.get(self.counter_metric.cache_key) is None
+        assert self.counter_metric.get_value() == 3
+        assert cache.get(self.counter_metric.cache_key) == 3
+
+    @patch.object(MetricManager, 'FLUSH_INTERVAL', 60)
+    def test_counter_observations_of_threads(self):
+        MetricManager.flush()
+        thread = threading.Thread(target=lambda: [self.counter_metric.inc() for _ in range(100)])
+        thread.start()
+        thread.join()
+        self.counter_metric.inc()
+        assert cache.get(self.counter_metric.cache_key) is None
+        assert self.counter_metric.get_value() == 101
+        # Increments of finished threads are flushed once
+        assert all(increments.thread.is_alive() for increments in MetricManager._thread_increments)
+        assert self.counter_metric.get_value() == 101
+
+    @patch.object(MetricManager, 'FLUSH_INTERVAL', 60)
+    def test_inherited_observations_are_dropped_after_fork(self):
+        MetricManager.flush()
+        self.counter_metric.inc(5)
+        self.gauge_metric.set(5)
+        MetricManager._reset_after_fork()
+        self.counter_metric.inc()
+        assert self.counter_metric.get_value() == 1
+        assert self.gauge_metric.get_value() == 0
+
+    @patch.object(MetricManager, 'FLUSH_IN_BACKGROUND', True)
+    @patch.object(MetricManager, '_flusher_started', False)
+    @patch('exchange.metrics.exporter.threading.Thread')
+    def test_observations_are_flushed_in_background(self, thread_mock):
+        MetricManager.flush()
+        self.counter_metric.inc()
+        self.counter_metric.inc()
+        thread_mock.assert_called_once_with(target=MetricManager._run_flusher, name='metrics-flusher', daemon=True)
+        assert cache.get(self.counter_metric.cache_key) is None
+        with patch('exchange.metrics.exporter.time.sleep', side_effect=[None, InterruptedError]):
+            with self.assertRaises(InterruptedError):
+                MetricManager._run_flusher()
+        assert cache.get(self.counter_metric.cache_key) == 2
+        # Celery worker processes flush on shutdown
+        self.counter_metric.inc()
+        worker_process_shutdown.send(sender=None)
+        assert cache.get(self.counter_metric.cache_key) == 3
+
+    def test_summary_metric(self):
+        summary = Summary('accounts', 'login_time', 'login time', labels=['web', 'app'])
+        summary.observe(10, 'web')
+        summary.observe(2.5, 'web')
+        assert summary.get_value('web') == {'count': 2, 'sum': 12.5}
+        assert summary.get_value('app') == {'count': 0, 'sum': 0}
+        with self.assertRaises(ValueError):
+            summary.observe(1, 'api')
+
+    def test_histogram_metric(self):
+        histogram = Histogram('accounts', 'otp_time', 'otp time', buckets=(10, 100))
+        for amount in (5, 10, 50, 500):
+            histogram.observe(amount)
+        data = histogram.expose(MetricManager.get_values(histogram.cache_keys))
+        assert data.split('\n') == [
+            '# HELP accounts_otp_time otp time',
+            '# TYPE accounts_otp_time histogram',
+            'accounts_otp_time_bucket{le="10"} 2',
+            'accounts_otp_time_bucket{le="100"} 3',
+            'accounts_otp_time_bucket{le="+Inf"} 4',
+            'accounts_otp_time_count 4',
+            'accounts_otp_time_sum 565.0',
+            '',
+        ]
+
     def test_monitoring_view_and_authentication(self):
         response = self.client.get('/bitex/prometheus')
         assert response.status_code == 404
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+from django.template import Template
+from django.test import TestCase
+from post_office.models import Email, EmailTemplate
+
+from exchange.notification.email import email_renderer
+from exchange.notification.email.email_manager import EmailManager
+
+
+class TestEmailRenderer(TestCase):
+    def setUp(self):
+        self.template = EmailTemplate.objects.create(
+            name='renderer_test',
+            subject='{{ title }}',
+            content='{{ title }}: {{ content }}',
+            html_content='<p>{{ content }}</p>{% if anti_phishing_code %}<b>{{ anti_phishing_code }}</b>{% endif %}',
+        )
+
+    def test_compiled_template_is_reused_until_updated(self):
+        compiled = email_renderer.get_compiled_template('renderer_test')
+        assert email_renderer.get_compiled_template('renderer_test') is compiled
+
+        self.template.html_content = '<i>{{ content }}</i>'
+        self.template.save()
+        with patch.object(email_renderer, 'get_email_template', return_value=self.template):
+            updated = email_renderer.get_compiled_template('renderer_test')
+            assert updated is not compiled
+            assert email_renderer.render_email('renderer_test', {'content': 'x'})[3] == '<i>x</i>'
+
+    def test_render_once_for_personal_fields(self):
+        context = {'title': 'Alert', 'content': 'Price <changed>'}
+        with patch.object(Template, 'render', autospec=True, side_effect=Template.render) as render_mock:
+            _, subject, message, html_message = email_renderer.render_email(
+                'renderer_test', {**context, 'anti_phishing_code': 'a&b'}
+            )
+            assert subject == 'Alert'
+            assert message == 'Alert: Price &lt;changed&gt;'
+            assert html_message == '<p>Price &lt;changed&gt;</p><b>a&amp;b</b>'
+            render_count = render_mock.call_count
+
+            html_message = email_renderer.render_email('renderer_test', {**context, 'anti_phishing_code': 'c'})[3]
+            assert html_message == '<p>Price &lt;changed&gt;</p><b>c</b>'
+            assert render_mock.call_count == render_count
+
+        # Recipients without personal fields are rendered separately
+        assert email_renderer.render_email('renderer_test', context)[3] == '<p>Price &lt;changed&gt;</p>'
+
+    def test_send_mail_many(self):
+        EmailManager.send_mail_many(
+            [
+                {
+                    'sender': 'noreply@nobitex.ir',
+                    'recipients': 'user@example.com',
+                    'template': 'renderer_test',
+                    'context': {'title': 'Alert', 'content': 'Hello', 'anti_phishing_code': 'code'},
+                    'priority': 'medium',
+                    'backend': 'default',
+                },
+            ]
+        )
+        email = Email.objects.get(to='user@example.com', template=self.template)
+        assert email.subject == 'Alert'
+        assert email.html_message == '<p>Hello</p><b>code</b>'
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+from firebase_admin.messaging import UnregisteredError
+
+from exchange.accounts.models import User
+from exchange.fcm.models import FCMDevice
+from exchange.notification.fcm_dispatcher import FCMDispatcher
+from exchange.notification.models import InAppNotification
+
+
+class FakeMessage(SimpleNamespace):
+    pass
+
+
+class FCMDispatcherTest(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='fcm-user1')
+        self.user2 = User.objects.create_user(username='fcm-user2')
+        self.user3 = User.objects.create_user(username='fcm-user3')
+        self.device1 = FCMDevice.objects.create(user=self.user1, token='token-1')
+        self.unregistered_device = FCMDevice.objects.create(user=self.user1, token='token-unregistered')
+        FCMDevice.objects.create(user=self.user3, token='token-failing')
+        FCMDevice.objects.create(user=self.user3, token='token-inactive', is_active=False)
+
+        self.fcm = MagicMock(Message=FakeMessage, send_each=MagicMock(side_effect=self._send_each))
+        for target in ('exchange.fcm.models.get_fcm', 'exchange.notification.fcm_dispatcher.get_fcm'):
+            patcher = patch(target, return_value=self.fcm)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _send_each(messages):
+        responses = []
+        for message in messages:
+            if message.token == 'token-1':
+                responses.append(SimpleNamespace(success=True, exception=None))
+            elif message.token == 'token-unregistered':
+                responses.append(SimpleNamespace(success=False, exception=UnregisteredError('Unregistered')))
+            else:
+                responses.append(SimpleNamespace(success=False, exception=ValueError('Unavailable')))
+        return SimpleNamespace(responses=responses)
+
+    def test_dispatch(self):
+        notifications = [
+            InAppNotification.objects.create(user=user, message=f'Message {i}')
+            for i, user in enumerate([self.user1, self.user2, self.user3, self.user1])
+        ]
+        dispatcher = FCMDispatcher(batch_size=2, concurrent=False)
+        assert dispatcher.start_id == notifications[0].id
+
+        assert dispatcher.dispatch() == 2
+        # Two ranges are sent, and the device unregistered in the first one is skipped in the second one
+        assert self.fcm.send_each.call_count == 2
+        assert [len(call.args[0]) for call in self.fcm.send_each.call_args_list] == [2, 2]
+        assert list(
+            InAppNotification.objects.filter(id__in=[n.id for n in notifications])
+            .order_by('id')
+            .values_list('sent_to_fcm', flat=True)
+        ) == [True, False, False, True]
+        self.unregistered_device.refresh_from_db()
+        assert not self.unregistered_device.is_active
+
+        # Failed notifications are passed over
+        assert dispatcher.dispatch() == 0
+        assert self.fcm.send_each.call_count == 2
+
+        notification = InAppNotification.objects.create(user=self.user1, message='New message')
+        assert dispatcher.dispatch() == 1
+        notification.refresh_from_db()
+        assert notification.sent_to_fcm
+
+    @patch.object(FCMDispatcher, 'FCM_BATCH_LIMIT', 2)
+    def test_dispatch_large_ranges_in_fcm_batches(self):
+        FCMDevice.objects.create(user=self.user1, token='token-unknown')
+        notification = InAppNotification.objects.create(user=self.user1, message='Message')
+
+        assert FCMDispatcher(concurrent=False).dispatch() == 1
+        assert [len(call.args[0]) for call in self.fcm.send_each.call_args_list] == [2, 1]
+        notification.refresh_from_db()
+        assert notification.sent_to_fcm
+
+    def test_dispatch_retries_failed_ranges(self):
+        notification = InAppNotification.objects.create(user=self.user1, message='Message')
+        dispatcher = FCMDispatcher(concurrent=False)
+
+        with patch('exchange.notification.fcm_dispatcher.get_notification_pushes', side_effect=ValueError), patch(
+            'exchange.notification.fcm_dispatcher.report_exception'
+        ) as report_exception_mock:
+            assert dispatcher.dispatch() == 0
+        report_exception_mock.assert_called_once()
+        assert dispatcher.failed_ranges == [(notification.id, notification.id)]
+
+        assert dispatcher.dispatch() == 1
+        assert dispatcher.failed_ranges == []
+        notification.refresh_from_db()
+        assert notification.sent_to_fcm
@@ -73,6 +73,13 @@ class LiquidityPoolModelTest(TestCase):
         usdt_pool.src_wallet.create_transaction('manual', usdt_pool.capacity).commit()
         assert usdt_pool.available_balance == 9788
 
+        # Bulk computation matches per pool values
+        pools = list(LiquidityPool.objects.filter(id__in=[self.pool.id, usdt_pool.id]).order_by('id'))
+        with self.assertNumQueries(3):
+            LiquidityPool.populate_balances(pools)
+            assert [pool.available_balance for pool in pools] == [Decimal('0.965'), 9788]
+            assert [pool.unblocked_balance for pool in pools] == [self.pool.unblocked_balance, 9788]
+
     def test_user_delegation_limit(self):
         user = User.objects.get(pk=201)
         self.pool.filled_capacity = Decimal('1.4')
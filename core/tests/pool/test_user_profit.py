@@ -19,6 +19,7 @@ from exchange.pool.crons import DistributeUsersProfitCron
 from exchange.pool.errors import NullAmountUDPExists
 from exchange.pool.functions import (
     calculate_user_score,
+    calculate_users_score,
     distribute_user_profit_on_target_pools,
     effective_days,
     populate_users_delegation_score_on_target_pools,
@@ -144,6 +145,31 @@ class TestUserProfit(TestCase):
             ]
         )
 
+    def test_calculate_users_score(self):
+        user2 = User.objects.get(pk=202)
+        user_delegation2 = UserDelegation.objects.create(pool=self.pool, user=user2, balance=Decimal(0))
+        user_delegation2.created_at = self.from_date - timedelta(days=20)
+        user_delegation2.save()
+        self.user_delegation.created_at = self.from_date + timedelta(days=2)
+        self.user_delegation.save()
+        self.create_delegation_tx(Decimal('1.23'), created_at=self.from_date + timedelta(days=2))
+        self.create_delegation_tx(Decimal('0.77'), created_at=self.from_date + timedelta(days=5))
+        self.create_delegation_tx(Decimal('3'), self.from_date - timedelta(days=20), user_delegation2)
+        self.create_delegation_tx(Decimal('-1'), self.from_date + timedelta(days=3), user_delegation2)
+        self.create_delegation_tx(Decimal('2'), self.from_date + timedelta(days=6), user_delegation2)
+        self.create_delegation_tx(Decimal('5'), self.to_date + timedelta(days=2), user_delegation2)
+        self.user_delegation.refresh_from_db()
+        user_delegation2.refresh_from_db()
+
+        from_date, to_date = self.from_date.date(), self.to_date.date()
+        effective_days(1)  # Cache day in row factor setting
+        with self.assertNumQueries(2):
+            scores = calculate_users_score([self.user_delegation, user_delegation2], from_date, to_date)
+        assert scores == {
+            self.user_delegation.id: calculate_user_score(self.user_delegation, from_date, to_date),
+            user_delegation2.id: calculate_user_score(user_delegation2, from_date, to_date),
+        }
+
     def test_calculate_user_score_complex2(self):
         #     amount
         #       ^
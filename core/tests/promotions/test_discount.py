@@ -269,10 +269,11 @@ class TestDiscount(TestCase):
 
         # 1 --> check system wallet and transactions
         assert Wallet.get_fee_collector_wallet(RIAL).balance == (TestDiscount.MAX_SYSTEM_FEE_WALLET - 110093)
+        # One aggregated transaction per paid discount
         query_trans = Q(tp=Transaction.TYPE.discount, wallet_id=self.system_fee_wallet.id)
-        assert Transaction.objects.filter(query_trans).count() == 4
+        assert Transaction.objects.filter(query_trans).count() == 3
         query_trans = Q(tp=Transaction.TYPE.discount)
-        assert Transaction.objects.filter(query_trans).count() == 8
+        assert Transaction.objects.filter(query_trans).count() == 7
 
         # 1 --> check discount transaction log
         query_discount_trans = Q(user_discount_id__in=[self.user_discounts[i].id for i in [5, 6, 9, 10]])
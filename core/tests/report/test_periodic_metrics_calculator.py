@@ -1,6 +1,13 @@
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
 import pytest
 
+from exchange.base.models import RIAL, TETHER, Currencies
 from exchange.broker.broker.schema import MetricSchema
+from exchange.market.markprice import MarkPriceCalculator
+from exchange.market.models import Market
 from exchange.report.periodic_metrics_calculator import PeriodicMetricsCalculator
 
 
@@ -41,3 +48,32 @@ class TestPeriodicMetricsCalculator:
 
     def test_celery_queues_list(self, calculator):
         assert {'celery', 'telegram', 'telegram_admin', 'notif'}.issubset(calculator.CELERY_QUEUES)
+
+    def test_set_metrics_concurrently_drops_slow_modules(self):
+        calculator = PeriodicMetricsCalculator(selected_modules=['importantPrices', 'counters'], concurrent=True)
+
+        def slow_module():
+            time.sleep(0.5)
+            calculator.add_metric(name='slow', type='gauge', value=1, operation='set')
+
+        def fast_module():
+            calculator.add_metric(name='fast', type='gauge', value=2, operation='set')
+
+        with patch.object(calculator, 'set_custom_metrics', slow_module), patch.object(
+            calculator, 'set_important_coins_price_metrics', fast_module
+        ), patch.object(PeriodicMetricsCalculator, 'MODULE_TIME_BUDGET', 0.1), patch(
+            'exchange.report.periodic_metrics_calculator.report_event'
+        ) as report_event_mock:
+            calculator.set_metrics()
+
+        assert [metric.name for metric in calculator._metrics] == ['fast']
+        report_event_mock.assert_called_once_with('PeriodicMetricsModuleTimeout', extras={'module': 'counters'})
+
+    def test_mark_price_uses_unrounded_usdt_price(self, calculator):
+        calculator._markets = [Market(id=1, src_currency=TETHER, dst_currency=RIAL)]
+        calculator._market_values = {
+            'market_1_last_price': Decimal('500000.5'),
+            MarkPriceCalculator.CACHE_KEY.format(src_currency=Currencies.btc): Decimal('60000'),
+        }
+        assert calculator.usdt_price == 500000
+        assert calculator.get_mark_price(Currencies.btc, RIAL) == Decimal('30000030000')
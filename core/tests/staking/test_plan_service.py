@@ -594,6 +594,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
         ids = list(Plan.get_plan_ids_to_stake())
         assert len(ids) == 1
         assert ids[0] == plans[1].id
+        assert Plan.get_plan_ids_per_action()['stake'] == [plans[1].id]
 
     def test_get_plan_ids_to_assign_staking_to_users(self):
         plans = []
@@ -608,6 +609,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             plan=plans[1], tp=PlanTransaction.TYPES.stake, amount=Decimal('0'),
         ),))
         assert set(Plan.get_plan_ids_to_assign_staking_to_users()) == {plans[0].id}
+        assert Plan.get_plan_ids_per_action()['assign_staking_to_users'] == [plans[0].id]
 
     def test_get_plan_ids_to_end_its_user_staking(self):
         plans = []
@@ -637,6 +639,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
         ids = list(Plan.get_plan_ids_to_end_its_user_staking())
         assert len(ids) == 1
         assert ids == [plans[i].id for i in (1,)]
+        assert Plan.get_plan_ids_per_action()['end_its_user_staking'] == ids
 
     def test_get_plan_ids_to_release_its_user_assets(self):
         plans = []
@@ -669,6 +672,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
         )
         ids = list(Plan.get_plan_ids_to_release_its_user_assets())
         assert ids == [plans[i].id for i in (0, 1)]
+        assert Plan.get_plan_ids_per_action()['release_its_user_assets'] == ids
 
     def test_get_plan_ids_to_fetch_rewards(self):
         Plan.objects.all().delete()
@@ -699,6 +703,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             plan=plans[4], tp=PlanTransaction.TYPES.fetched_reward, created_at=ir_now() - timedelta(hours=0.9),
         ),),)
         assert set(Plan.get_plan_ids_to_fetch_rewards()) == {plans[i].id for i in (1, 2, 5,)}
+        assert set(Plan.get_plan_ids_per_action()['fetch_rewards']) == {plans[i].id for i in (1, 2, 5)}
 
     def test_get_plan_ids_to_announce_rewards(self):
         Plan.objects.all().delete()
@@ -725,6 +730,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             plan=plans[4], tp=PlanTransaction.TYPES.announce_reward, created_at=ir_now() - timedelta(days=0.9),
         ),),)
         assert set(Plan.get_plan_ids_to_announce_rewards()) == {plans[i].id for i in (1, 2,)}
+        assert set(Plan.get_plan_ids_per_action()['announce_rewards']) == {plans[i].id for i in (1, 2)}
 
     def test_get_plan_ids_to_pay_rewards(self):
         Plan.objects.all().delete()
@@ -741,6 +747,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             plan=plans[1], tp=PlanTransaction.TYPES.give_reward, amount=Decimal('0'),
         ),),)
         assert set(Plan.get_plan_ids_to_pay_rewards()) == {plans[2].id}
+        assert Plan.get_plan_ids_per_action()['pay_rewards'] == [plans[2].id]
 
     def test_get_plan_ids_to_approve_stake_amount(self):
         Plan.objects.all().delete()
@@ -756,6 +763,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             plan=plans[2], tp=PlanTransaction.TYPES.system_stake_amount_approval,
         )
         assert list(Plan.get_plan_ids_to_approve_stake_amount()) == [plans[1].id]
+        assert Plan.get_plan_ids_per_action()['approve_stake_amount'] == [plans[1].id]
 
     def test_get_plan_ids_to_extend_staking(self):
         Plan.objects.all().delete()
@@ -781,6 +789,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             parent_id=transactions[-1].id,
         )
         assert list(Plan.get_plan_ids_to_extend_staking()) == [plans[0].id]
+        assert Plan.get_plan_ids_per_action()['extend_staking'] == [plans[0].id]
 
     def test_get_plan_ids_create_extend_out_transaction(self):
         Plan.objects.all().delete()
@@ -806,6 +815,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             parent_id=transactions[-1].id,
         )
         assert list(Plan.get_plan_ids_create_extend_out_transaction()) == [plans[0].id]
+        assert Plan.get_plan_ids_per_action()['create_extend_out_transaction'] == [plans[0].id]
 
     def test_get_plan_ids_to_extend_users_assets(self):
         Plan.objects.all().delete()
@@ -831,6 +841,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
             parent_id=transactions[-1].id,
         )
         assert list(Plan.get_plan_ids_create_extend_out_transaction()) == [plans[0].id]
+        assert Plan.get_plan_ids_per_action()['create_extend_out_transaction'] == [plans[0].id]
 
     def test_get_plan_user_ids(self):
         plan_kwargs = self.get_plan_kwargs()
@@ -951,6 +962,7 @@ class PlanServiceQueriesTest(PlanTestDataMixin, TestCase):
                 plan=plans[4], tp=PlanTransaction.TYPES.unstake,
         ),),),)
         assert set(Plan.get_plan_ids_to_create_release_transaction()) == {plans[2].id}
+        assert Plan.get_plan_ids_per_action()['create_release_transaction'] == [plans[2].id]
 
     def test_get_open_plan_ids(self):
         Plan.objects.all().delete()
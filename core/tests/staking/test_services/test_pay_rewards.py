@@ -339,6 +339,43 @@ class PayRewardsTaskNewModelsTests(StakingTestDataMixin, TestCase):
         self.assert_staking_transactions_success()
         self.assert_user_plan_success()
 
+    @patch('exchange.staking.service.pay_rewards._pay_user_reward')
+    def test_pay_all_users_reward_in_bulk(self, mocked_pay_user_reward):
+        self.plan.external_platform.tp = ExternalEarningPlatform.TYPES.staking
+        self.plan.external_platform.save()
+        other_users = [self.create_user() for _ in range(3)]
+        for user in other_users:
+            self.create_staking_transaction(
+                user=user,
+                tp=StakingTransaction.TYPES.announce_reward,
+                plan=self.plan,
+                created_at=self.plan.staked_at + self.plan.staking_period,
+                amount=Decimal('2'),
+            )
+            self.create_staking_transaction(
+                user=user, tp=StakingTransaction.TYPES.stake, plan=self.plan, amount=Decimal('10')
+            )
+        unpaid_user = self.create_user()
+        self.create_staking_transaction(
+            user=unpaid_user, tp=StakingTransaction.TYPES.stake, plan=self.plan, amount=Decimal('10')
+        )
+
+        pay_all_users_reward(self.plan.id)
+
+        mocked_pay_user_reward.assert_called_once_with(unpaid_user.id, self.plan.id)
+        assert PlanTransaction.objects.get(
+            plan=self.plan, tp=PlanTransaction.TYPES.give_reward, child=None
+        ).amount == Decimal('182.5')
+        for user in other_users:
+            give_reward = StakingTransaction.objects.get(
+                user=user, plan=self.plan, tp=StakingTransaction.TYPES.give_reward
+            )
+            assert give_reward.amount == Decimal('2')
+            assert give_reward.wallet_transaction.ref_id == give_reward.id
+            assert give_reward.wallet_transaction.ref_module == 133
+            assert give_reward.wallet_transaction.wallet.balance == Decimal('2')
+        self.assert_user_plan_success()
+
     def test_pay_user_reward_successfully_on_yield_farming_plan_creates_both_models_instances(self):
         self.plan.external_platform.tp = ExternalEarningPlatform.TYPES.yield_aggregator
         self.plan.external_platform.save()
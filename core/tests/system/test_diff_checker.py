@@ -1,4 +1,6 @@
+import datetime
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.core.cache import cache
 from django.test import TestCase, override_settings
@@ -7,6 +9,7 @@ from django.utils.timezone import now
 from exchange.accounts.models import User, BankAccount
 from exchange.base.models import Currencies, ADDRESS_TYPE, Settings
 from exchange.system.checker import DiffChecker
+from exchange.system.wallet_flows import WalletFlowAggregator
 from exchange.wallet.models import Wallet, ConfirmedWalletDeposit
 from exchange.wallet.withdraw import WithdrawProcessor
 from tests.base.utils import create_deposit, create_trade, create_withdraw_request
@@ -71,6 +74,90 @@ class DiffCheckerTest(TestCase):
         diff = DiffChecker.check_wallet_diff(wallet)
         assert diff == Decimal('0.2')
 
+    @patch.object(WalletFlowAggregator, 'SETTLE_DELAY', datetime.timedelta(0))
+    def test_wallet_flows_diff(self):
+        aggregator = WalletFlowAggregator()
+        aggregator.set_cursor(0)
+        wallet = self.setup_scenario()
+        wallet_2 = Wallet.get_user_wallet(self.user2, Currencies.eth)
+        assert wallet.id not in aggregator.update()
+        last_transaction = wallet.transactions.order_by('-id').first()
+        assert aggregator.get_diff(wallet.id, until_transaction_id=last_transaction.id) == Decimal('0')
+        assert aggregator.get_diff(wallet_2.id, until_transaction_id=last_transaction.id) is None
+
+        tr1 = wallet.create_transaction(tp='deposit', amount=Decimal('0.2'))
+        tr1.commit()
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr1.id) is None
+        assert aggregator.update() == {wallet.id: Decimal('0.2')}
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr1.id) == Decimal('0.2')
+        # Unchanged diffs are not reported again
+        tr2 = wallet.create_transaction(tp='manual', amount=Decimal('1.2'))
+        tr2.commit()
+        assert aggregator.update() == {}
+        tr3 = wallet.create_transaction(tp='withdraw', amount=Decimal('-0.2'))
+        tr3.commit()
+        assert aggregator.update() == {wallet.id: Decimal('0')}
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr3.id) == Decimal('0')
+
+    @patch.object(WalletFlowAggregator, 'SETTLE_DELAY', datetime.timedelta(0))
+    def test_wallet_flows_diff_of_other_transaction_types(self):
+        aggregator = WalletFlowAggregator()
+        aggregator.set_cursor(0)
+        wallet = self.setup_scenario()
+        aggregator.update()
+        for tp, amount in (('fee', '-0.001'), ('transfer', '-0.3'), ('referral', '0.002'), ('staking', '-0.1')):
+            wallet.refresh_from_db()
+            tr = wallet.create_transaction(tp=tp, amount=Decimal(amount))
+            tr.commit()
+        assert wallet.id not in aggregator.update()
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr.id) == Decimal('0')
+
+        checker = DiffChecker(use_flows=True)
+        with patch.object(DiffChecker, 'notif') as notif:
+            wallet.refresh_from_db()
+            wallet.create_transaction(tp='fee', amount=Decimal('-0.002')).commit()
+            checker.check_wallet_flows()
+        notif.assert_not_called()
+
+    @patch.object(WalletFlowAggregator, 'SETTLE_DELAY', datetime.timedelta(0))
+    def test_wallet_flows_after_id_wrap_around(self):
+        aggregator = WalletFlowAggregator()
+        aggregator.set_cursor(0)
+        wallet = self.setup_scenario()
+        aggregator.update()
+        # Ids wrap around to negative values, which are newer than all positive ids
+        wallet.refresh_from_db()
+        tr1 = wallet.create_transaction(tp='deposit', amount=Decimal('0.2'))
+        tr1.id = -2_000_000_000
+        tr1.commit()
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr1.id) is None
+        assert aggregator.update() == {wallet.id: Decimal('0.2')}
+        assert aggregator.get_cursor() == tr1.id + 2**32
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr1.id) == Decimal('0.2')
+
+        wallet.refresh_from_db()
+        tr2 = wallet.create_transaction(tp='manual', amount=Decimal('-0.2'))
+        tr2.id = -1_999_999_999
+        tr2.commit()
+        assert aggregator.update() == {}
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr2.id) == Decimal('0.2')
+
+    @patch.object(WalletFlowAggregator, 'SETTLE_DELAY', datetime.timedelta(0))
+    def test_wallet_flows_are_kept_after_cache_clear(self):
+        aggregator = WalletFlowAggregator()
+        aggregator.set_cursor(0)
+        wallet = self.setup_scenario()
+        tr1 = wallet.create_transaction(tp='deposit', amount=Decimal('0.2'))
+        tr1.commit()
+        aggregator.update()
+        cache.clear()
+        # Totals are not re-baselined, so the drift is still reported
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr1.id) == Decimal('0.2')
+        tr2 = wallet.create_transaction(tp='manual', amount=Decimal('0.1'))
+        tr2.commit()
+        assert aggregator.update() == {}
+        assert aggregator.get_diff(wallet.id, until_transaction_id=tr2.id) == Decimal('0.2')
+
     def test_check_diff_when_system_malicious_v2(self):
         wallet = self.setup_scenario()
         wallet.refresh_from_db()
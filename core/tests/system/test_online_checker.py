@@ -178,3 +178,59 @@ class OnlineCheckerTest(TestCase):
         checker = OnlineChecker()
         checker.check_recent_transactions()
         notif_patch.assert_called_with(tx, 'None transaction balance')
+
+    @patch.object(OnlineChecker, 'notif')
+    def test_wallet_balance_check_multiple_wallets(self, notif_patch):
+        wallet1 = Wallet.get_user_wallet(self.user1, Currencies.usdt)
+        wallet2 = Wallet.get_user_wallet(self.user2, Currencies.usdt)
+        wallet3 = Wallet.get_user_wallet(self.user2, Currencies.btc)
+        for wallet in (wallet1, wallet2, wallet3):
+            wallet.create_transaction(tp='deposit', amount='100').commit()
+        # Malicious manipulation
+        wallet2.balance -= 20
+        wallet2.save()
+        checker = OnlineChecker()
+        for wallet in (wallet1, wallet2, wallet3):
+            checker.enqueue_wallet(wallet)
+        with self.assertNumQueries(2):
+            checker.check_wallets()
+        notif_patch.assert_called_once_with(
+            wallet2, 'Wallet balance mismatch last tx: 80 != 100 in', 'C13 user2@example.com'
+        )
+        assert set(checker.wallets_last_check) == {wallet1.id, wallet2.id, wallet3.id}
+
+    @patch.object(OnlineChecker, 'notif')
+    def test_wallet_balance_check_checked_and_unchecked_wallets(self, notif_patch):
+        wallet1 = Wallet.get_user_wallet(self.user1, Currencies.usdt)
+        wallet2 = Wallet.get_user_wallet(self.user2, Currencies.usdt)
+        for wallet in (wallet1, wallet2):
+            wallet.create_transaction(tp='deposit', amount='100').commit()
+        wallet1.balance -= 20
+        wallet1.save()
+        wallet2.balance -= 30
+        wallet2.save()
+        checker = OnlineChecker()
+        checker.wallets_last_check[wallet1.id] = ir_now() - datetime.timedelta(minutes=10)
+        for wallet in (wallet1, wallet2):
+            checker.enqueue_wallet(wallet)
+        # Never checked wallets are read in a separate query, not widening the scan of checked ones
+        with self.assertNumQueries(3):
+            checker.check_wallets()
+        notif_patch.assert_any_call(wallet1, 'Wallet balance mismatch last tx: 80 != 100 in', 'C13 user1@example.com')
+        notif_patch.assert_any_call(wallet2, 'Wallet balance mismatch last tx: 70 != 100 in', 'C13 user2@example.com')
+        assert notif_patch.call_count == 2
+
+    @patch.object(OnlineChecker, 'notif')
+    @patch.object(OnlineChecker, 'TRANSACTIONS_BATCH_SIZE', 2)
+    def test_transaction_balance_check_multiple_batches(self, notif_patch):
+        wallet = Wallet.get_user_wallet(self.user1, Currencies.usdt)
+        txs = []
+        for _ in range(5):
+            tx = wallet.create_transaction(tp='deposit', amount='10', created_at=self.tx_time)
+            tx.commit()
+            txs.append(tx)
+        checker = OnlineChecker()
+        checker.check_recent_transactions()
+        notif_patch.assert_not_called()
+        assert checker.last_checked_transaction == txs[-1].id
+        assert checker.wallets_last_balance[wallet.id] == (txs[-1].balance, txs[-1].id)
@@ -180,6 +180,24 @@ class TransactionHistoryFullTests(TransactionHistoryTestMixin, APITestCase):
         assert json_response['hasNext'] is False
         assert len(json_response['transactions']) == 0
 
+    def test_cursor_pagination(self):
+        response = self.client.get(self.url, data={'pageSize': 100})
+        json_response = json.loads(response.content)
+        assert json_response['status'] == 'ok'
+        expected_ids = [tx['id'] for tx in json_response['transactions']]
+
+        ids = []
+        data = {'pageSize': 25}
+        for _ in range(4):
+            response = self.client.get(self.url, data=data)
+            json_response = json.loads(response.content)
+            assert json_response['status'] == 'ok'
+            assert json_response['hasNext'] is True
+            assert len(json_response['transactions']) == 25
+            ids.extend(tx['id'] for tx in json_response['transactions'])
+            data['cursor'] = json_response['nextCursor']
+        assert ids == expected_ids
+
     def test_id_is_positive(self):
         transaction = Transaction.objects.order_by('-id').all()[0]
         transaction.id = -1
@@ -500,6 +518,7 @@ class TransactionHistoryRequestTests(TransactionHistoryTestMixin, APITestCase):
 
         export_csv.assert_called_once()
         disk_path, transactions, headers = export_csv.call_args[0]
+        transactions = list(transactions)
         send_email.assert_called_once()
 
         assert (
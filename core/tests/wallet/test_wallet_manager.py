@@ -7,7 +7,7 @@ from exchange.accounts.models import User
 from exchange.base.models import Currencies
 from exchange.wallet.exceptions import InsufficientBalanceError
 from exchange.wallet.models import Transaction, Wallet
-from exchange.wallet.wallet_manager import WalletTransactionManager
+from exchange.wallet.wallet_manager import WalletBulkCreditManager, WalletTransactionManager
 
 
 class WalletTransactionManagerTest(TestCase):
@@ -98,3 +98,48 @@ class WalletTransactionManagerTest(TestCase):
         txn = manager._transactions[0]
         assert txn.ref_module == Transaction.REF_MODULES.get('Credit')
         assert txn.ref_id == 123
+
+
+class WalletBulkCreditManagerTest(TestCase):
+    def setUp(self):
+        self.users = list(User.objects.filter(id__in=[201, 202, 203]).order_by('id'))
+        self.wallet = Wallet.get_user_wallet(self.users[0], Currencies.btc)
+        self.wallet.create_transaction('manual', Decimal('100.00')).commit()
+
+    def test_commit_credits(self):
+        manager = WalletBulkCreditManager()
+        for i, user in enumerate(self.users):
+            manager.add_credit(user.id, Currencies.btc, Decimal('1.5'), 'manual', f'Credit {i}', 'DiscountDst', i + 1)
+        manager.add_credit(self.users[0].id, Currencies.usdt, Decimal('3'), 'manual', 'Credit 3', 'DiscountDst', 4)
+        manager.add_credit(self.users[0].id, Currencies.btc, Decimal('2'), 'manual', 'Credit 4', 'DiscountDst', 5)
+
+        transactions = manager.commit()
+
+        assert len(transactions) == 5
+        assert [tx.ref_id for tx in transactions] == [1, 2, 3, 4, 5]
+        assert Transaction.objects.filter(ref_module=Transaction.REF_MODULES['DiscountDst']).count() == 5
+        self.wallet.refresh_from_db()
+        assert self.wallet.balance == Decimal('103.5')
+        assert transactions[0].balance == Decimal('101.5')
+        assert transactions[4].balance == Decimal('103.5')
+        assert Wallet.get_user_wallet(self.users[1], Currencies.btc).balance == Decimal('1.5')
+        assert Wallet.get_user_wallet(self.users[0], Currencies.usdt).balance == Decimal('3')
+        assert len(manager._credits) == 0
+
+    def test_commit_skips_inactive_wallets(self):
+        Wallet.objects.filter(pk=self.wallet.pk).update(is_active=False)
+        manager = WalletBulkCreditManager()
+        manager.add_credit(self.users[0].id, Currencies.btc, Decimal('1'), 'manual', 'Credit')
+        manager.add_credit(self.users[1].id, Currencies.btc, Decimal('1'), 'manual', 'Credit')
+
+        transactions = manager.commit()
+
+        assert transactions[0] is None
+        assert transactions[1].amount == Decimal('1')
+        self.wallet.refresh_from_db()
+        assert self.wallet.balance == Decimal('100')
+
+    def test_add_invalid_credit(self):
+        manager = WalletBulkCreditManager()
+        with pytest.raises(ValueError, match='Invalid credit amount'):
+            manager.add_credit(self.users[0].id, Currencies.btc, Decimal('-1'), 'manual', 'Debit')
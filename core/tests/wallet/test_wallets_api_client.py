@@ -2,6 +2,8 @@ from decimal import Decimal
 from unittest.mock import patch
 
 from django.core.cache import cache
+from django.db.models import F
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -82,6 +84,49 @@ class WalletsApiClientTest(APITestCase):
         for w in user_wallets:
             self.check_wallet_v2(wallets[CURRENCY_CODENAMES[w.currency]], w)
 
+    @override_settings(USE_WALLET_SNAPSHOT_CACHE=True)
+    def test_v2_wallets_snapshot_invalidation(self):
+        cache.clear()
+        wallet_btc = Wallet.get_user_wallet(self.user, Currencies.btc)
+        initial_balance = wallet_btc.balance
+        data = self.client.post('/v2/wallets', {'currencies': 'btc,eth'}).json()
+        assert Decimal(data['wallets']['BTC']['balance']) == initial_balance
+
+        # Served from snapshot until the user's snapshot version is bumped
+        Wallet.objects.filter(id=wallet_btc.id).update(balance=F('balance') + 1)
+        data = self.client.post('/v2/wallets', {'currencies': 'btc,eth'}).json()
+        assert Decimal(data['wallets']['BTC']['balance']) == initial_balance
+
+        with self.captureOnCommitCallbacks(execute=True):
+            wallet_btc.create_transaction(tp='manual', amount=Decimal('0.5')).commit()
+        data = self.client.post('/v2/wallets', {'currencies': 'btc,eth'}).json()
+        assert Decimal(data['wallets']['BTC']['balance']) == initial_balance + Decimal('1.5')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_order(self.user, Currencies.btc, Currencies.rls, '0.2', '123_455_432_1', sell=True)
+        data = self.client.post('/v2/wallets', {'currencies': 'btc,eth'}).json()
+        assert Decimal(data['wallets']['BTC']['blocked']) == Decimal('0.2')
+
+    @override_settings(USE_WALLET_SNAPSHOT_CACHE=True)
+    def test_v2_wallets_single_currency_blocked_balance(self):
+        cache.clear()
+        wallet_btc = Wallet.get_user_wallet(self.user, Currencies.btc)
+        wallet_btc.balance = Decimal('1')
+        wallet_btc.save(update_fields=['balance'])
+        margin_wallet = Wallet.get_user_wallet(self.user, Currencies.usdt, tp=Wallet.WALLET_TYPE.margin)
+        Wallet.objects.filter(id=margin_wallet.id).update(balance=Decimal('100'))
+        self.client.post('/v2/wallets')
+        self.client.post('/v2/wallets', {'type': 'margin'})
+
+        # Snapshots are not invalidated here, but single currency blocked balances are up to date
+        create_withdraw_request(self.user, Currencies.btc, '0.12', status=3)
+        Wallet.objects.filter(id=margin_wallet.id).update(balance_blocked=Decimal('30'))
+        data = self.client.post('/v2/wallets', {'currencies': 'btc'}).json()
+        assert Decimal(data['wallets']['BTC']['blocked']) == Decimal('0.12')
+        data = self.client.post('/v2/wallets', {'currencies': 'usdt', 'type': 'margin'}).json()
+        assert Decimal(data['wallets']['USDT']['balance']) == Decimal('100')
+        assert Decimal(data['wallets']['USDT']['blocked']) == Decimal('30')
+
     def test_v2_wallets_margin_no_margin_wallet(self):
         response = self.client.get('/v2/wallets', {'type': 'margin'})
         data = response.json()
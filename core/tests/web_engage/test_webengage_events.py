@@ -1,11 +1,16 @@
+import json
 from decimal import Decimal
 from unittest import mock
 
+from django.test import override_settings
+from django_redis import get_redis_connection
 from rest_framework.test import APITestCase
 
 from exchange.accounts.models import User
 from exchange.base.models import Settings
 from exchange.web_engage.events import OrderMatchedWebEngageEvent, ReferredUserUpgradedToLevel1WebEngageEvent
+from exchange.web_engage.events.base import WebEngageKnownUserEvent
+from exchange.web_engage.services.events import EVENTS_QUEUE_KEY, send_queued_events
 from exchange.web_engage.services.user import send_user_data_to_webengage
 
 
@@ -81,3 +86,65 @@ class WebEngageEventTest(APITestCase):
 
         send_user_data_to_webengage(user=self.user2)
         assert not task_send_user_data_to_web_engage.called
+
+
+@override_settings(BATCH_WEBENGAGE_EVENTS=True)
+class WebEngageBatchedEventTest(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.get(pk=202)
+        self.redis = get_redis_connection('default')
+        self.redis.delete(EVENTS_QUEUE_KEY)
+        WebEngageKnownUserEvent._stopped_events_checked_at = 0.0
+
+    def tearDown(self) -> None:
+        self.redis.delete(EVENTS_QUEUE_KEY)
+        WebEngageKnownUserEvent._stopped_events_checked_at = 0.0
+
+    def _send_order_event(self):
+        OrderMatchedWebEngageEvent(
+            user=self.user, src_currency=1, dst_currency=2, order_type='b', amount=Decimal(1), trade_type='sth'
+        ).send()
+
+    @mock.patch('exchange.web_engage.externals.web_engage.is_web_engage_active', return_value=True)
+    @mock.patch('exchange.web_engage.events.base.is_webengage_user', return_value=True)
+    @mock.patch('exchange.web_engage.events.base.task_send_event_data_to_web_engage.delay')
+    @mock.patch('exchange.web_engage.externals.web_engage.WebEngageDataAPI.request')
+    def test_events_sent_in_bulk(self, mock_request: mock.MagicMock, mock_delay: mock.MagicMock, *_):
+        Settings.objects.update_or_create(key="webengage_stopped_events", defaults={"value": "[]"})
+        for _ in range(30):
+            self._send_order_event()
+        ReferredUserUpgradedToLevel1WebEngageEvent(user=self.user).send()
+
+        mock_delay.assert_not_called()
+        assert self.redis.llen(EVENTS_QUEUE_KEY) == 31
+        event = json.loads(self.redis.lindex(EVENTS_QUEUE_KEY, 0))
+        assert event['eventName'] == 'order_matched'
+        assert event['userId'] == self.user.get_webengage_id()
+
+        assert send_queued_events() == 31
+        assert self.redis.llen(EVENTS_QUEUE_KEY) == 0
+        assert mock_request.call_count == 2
+        batches = [call.args[1]['events'] for call in mock_request.call_args_list]
+        assert [len(events) for events in batches] == [25, 6]
+        assert batches[1][-1]['eventName'] == 'referred_user_upgraded_to_level_1'
+        assert all(call.args[0] == '/v1/accounts/{license_code}/bulk-events' for call in mock_request.call_args_list)
+
+        assert send_queued_events() == 0
+        assert mock_request.call_count == 2
+
+    @mock.patch('exchange.web_engage.externals.web_engage.is_web_engage_active', return_value=True)
+    @mock.patch('exchange.web_engage.events.base.is_webengage_user', return_value=True)
+    def test_stopped_events_are_cached(self, *_):
+        Settings.objects.update_or_create(key="webengage_stopped_events", defaults={"value": """["order_matched"]"""})
+        self._send_order_event()
+        assert self.redis.llen(EVENTS_QUEUE_KEY) == 0
+
+        Settings.objects.update_or_create(key="webengage_stopped_events", defaults={"value": "[]"})
+        with mock.patch.object(Settings, 'get_list') as mock_get_list:
+            self._send_order_event()
+        mock_get_list.assert_not_called()
+        assert self.redis.llen(EVENTS_QUEUE_KEY) == 0
+
+        WebEngageKnownUserEvent._stopped_events_checked_at = 0.0
+        self._send_order_event()
+        assert self.redis.llen(EVENTS_QUEUE_KEY) == 1
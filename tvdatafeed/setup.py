@@ -23,6 +23,7 @@ setup(
     long_description=long_description,
     install_requires=[
         "setuptools",
+        "numpy",
         "pandas",
         "websocket-client",
         "requests"
@@ -0,0 +1,136 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from tvDatafeed.main import Interval, SeriesBuffer, TvDatafeed
+
+split_frames = TvDatafeed._TvDatafeed__split_frames
+
+
+def frame(message):
+    text = message if isinstance(message, str) else json.dumps(message)
+    return f"~m~{len(text)}~m~{text}"
+
+
+def timescale_update(chart_session, bars):
+    return {"m": "timescale_update", "p": [chart_session, {"s1": {"s": bars}}]}
+
+
+def bar(i, timestamp, *values):
+    return {"i": i, "v": [timestamp, *values]}
+
+
+class FakeWebSocket:
+    def __init__(self, payloads):
+        self.payloads = list(payloads)
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def recv(self):
+        if not self.payloads:
+            raise TimeoutError("no more payloads")
+        return self.payloads.pop(0)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def chart_sessions():
+    sessions = ["cs_1", "cs_2"]
+    with patch.object(TvDatafeed, "_TvDatafeed__generate_chart_session", side_effect=sessions):
+        yield sessions
+
+
+def get_hist_many(payloads, symbols, **kwargs):
+    ws = FakeWebSocket(payloads)
+    with patch("tvDatafeed.main.create_connection", return_value=ws):
+        return TvDatafeed().get_hist_many(symbols, exchange="BINANCE", **kwargs), ws
+
+
+def test_split_frames():
+    assert split_frames(frame("~h~1") + frame({"m": "a"}) + frame({"m": "b"})) == [
+        "~h~1",
+        '{"m": "a"}',
+        '{"m": "b"}',
+    ]
+    assert split_frames("") == []
+
+
+def test_series_buffer_add():
+    bars = SeriesBuffer(2)
+    bars.add([bar(1, 200, 2, 3, 1, 2.5, 10), bar(0, 100, 1, 2, 0.5, 1.5)])
+    # Bars beyond the expected count grow the columns
+    bars.add([bar(4, 500, 5, 6, 4, 5.5, 50)])
+    assert bars.size == 5
+    assert list(bars.timestamps[:2]) == [100, 200]
+    assert list(bars.values[0]) == [1, 2, 0.5, 1.5, 0]
+    assert list(bars.values[1]) == [2, 3, 1, 2.5, 10]
+    assert list(bars.values[4]) == [5, 6, 4, 5.5, 50]
+    # Slots of bars never received are skipped
+    timestamps, values = bars.received()
+    assert list(timestamps) == [100, 200, 500]
+    assert [list(row) for row in values] == [[1, 2, 0.5, 1.5, 0], [2, 3, 1, 2.5, 10], [5, 6, 4, 5.5, 50]]
+
+
+def test_get_hist_multi_frame_payloads(chart_sessions):
+    payloads = [
+        frame({"m": "qsd", "p": ["qs_x", {"n": "BINANCE:BTCUSDT"}]})
+        + frame("~h~1")
+        + frame(timescale_update("cs_1", [bar(0, 100, 1, 2, 0.5, 1.5, 10)])),
+        frame(timescale_update("cs_1", [bar(1, 200, 2, 3, 1, 2.5, 20)]))
+        + frame({"m": "series_completed", "p": ["cs_1", "s1"]}),
+    ]
+    data, ws = get_hist_many(payloads, ["BTCUSDT"], interval=Interval.in_1_hour, n_bars=2)
+
+    df = data["BTCUSDT"]
+    assert list(df.columns) == ["symbol", "open", "high", "low", "close", "volume"]
+    assert list(df["symbol"]) == ["BINANCE:BTCUSDT"] * 2
+    assert list(df["close"]) == [1.5, 2.5]
+    assert list(df["volume"]) == [10, 20]
+    # Heartbeats are echoed back
+    assert frame("~h~1") in ws.sent
+
+
+def test_get_hist_partial_frames(chart_sessions):
+    truncated = frame(timescale_update("cs_1", [bar(0, 100, 1, 2, 0.5, 1.5, 10)]))[:-10]
+    payloads = [
+        truncated + frame(timescale_update("cs_1", [bar(1, 200, 2, 3, 1, 2.5, 20)])),
+        frame({"m": "series_completed", "p": ["cs_1", "s1"]}),
+    ]
+    data, _ = get_hist_many(payloads, ["BTCUSDT"], n_bars=2)
+
+    # The truncated frame is skipped, and other frames of the payload are still parsed
+    df = data["BTCUSDT"]
+    assert list(df["close"]) == [2.5]
+    assert list(df["volume"]) == [20]
+
+
+def test_get_hist_error_frames(chart_sessions):
+    payloads = [
+        frame({"m": "symbol_error", "p": ["cs_1", "symbol_1", "invalid symbol"]}),
+        frame({"m": "critical_error", "p": ["cs_2", "error"]}),
+    ]
+    data, _ = get_hist_many(payloads, ["UNKNOWN", "BTCUSDT"])
+
+    # Errors end each request without waiting for the receive timeout
+    assert data == {"UNKNOWN": None, "BTCUSDT": None}
+
+
+def test_get_hist_many_separates_chart_sessions(chart_sessions):
+    payloads = [
+        frame(timescale_update("cs_1", [bar(0, 100, 1, 2, 0.5, 1.5, 10)]))
+        + frame(timescale_update("cs_other", [bar(0, 100, 9, 9, 9, 9, 9)]))
+        + frame({"m": "series_completed", "p": ["cs_1", "s1"]}),
+        frame(timescale_update("cs_2", [bar(0, 100, 3, 4, 2.5, 3.5, 30)]))
+        + frame({"m": "series_completed", "p": ["cs_2", "s1"]}),
+    ]
+    data, ws = get_hist_many(payloads, ["BTCUSDT", "ETHUSDT"])
+
+    assert list(data["BTCUSDT"]["close"]) == [1.5]
+    assert list(data["ETHUSDT"]["close"]) == [3.5]
+    assert list(data["ETHUSDT"]["symbol"]) == ["BINANCE:ETHUSDT"]
+    assert sum('"chart_delete_session"' in message for message in ws.sent) == 2
@@ -1,11 +1,12 @@
-import datetime
 import enum
 import json
 import logging
 import random
 import re
 import string
+import numpy as np
 import pandas as pd
+from dateutil import tz
 from websocket import create_connection
 import requests
 import json
@@ -29,6 +30,47 @@ class Interval(enum.Enum):
     in_monthly = "1M"
 
 
+class SeriesBuffer:
+    """Preallocated numpy columns for the bars of a series"""
+
+    def __init__(self, n_bars: int) -> None:
+        capacity = max(n_bars, 1)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, 5), dtype=np.float64)
+        self.filled = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def __grow(self, capacity):
+        timestamps = np.zeros(capacity, dtype=np.float64)
+        timestamps[: self.size] = self.timestamps[: self.size]
+        values = np.zeros((capacity, 5), dtype=np.float64)
+        values[: self.size] = self.values[: self.size]
+        filled = np.zeros(capacity, dtype=bool)
+        filled[: self.size] = self.filled[: self.size]
+        self.timestamps, self.values, self.filled = timestamps, values, filled
+
+    def add(self, bars: list) -> None:
+        """write bars of a timescale_update into the columns, in place by their index
+
+        each bar is {"i": index, "v": [timestamp, open, high, low, close, volume]},
+        volume is missing for some symbols and is left as 0.0
+        """
+        for bar in bars:
+            i, v = bar["i"], bar["v"]
+            if i >= len(self.timestamps):
+                self.__grow(max(i + 1, 2 * len(self.timestamps)))
+            n_values = min(len(v) - 1, 5)
+            self.timestamps[i] = v[0]
+            self.values[i, :n_values] = v[1 : n_values + 1]
+            self.filled[i] = True
+            self.size = max(self.size, i + 1)
+
+    def received(self):
+        """return timestamps and values of received bars, skipping slots of bars never received"""
+        filled = self.filled[: self.size]
+        return self.timestamps[: self.size][filled], self.values[: self.size][filled]
+
+
 class TvDatafeed:
     __sign_in_url = 'https://www.tradingview.com/accounts/signin/'
     __search_url = 'https://symbol-search.tradingview.com/symbol_search/?text={}&hl=1&exchange={}&lang=en&type=&domain=production'
@@ -60,7 +102,6 @@ class TvDatafeed:
 
         self.ws = None
         self.session = self.__generate_session()
-        self.chart_session = self.__generate_chart_session()
 
     def __auth(self, username, password):
 
@@ -131,43 +172,25 @@ class TvDatafeed:
         self.ws.send(m)
 
     @staticmethod
-    def __create_df(raw_data, symbol):
-        try:
-            out = re.search('"s":\[(.+?)\}\]', raw_data).group(1)
-            x = out.split(',{"')
-            data = list()
-            volume_data = True
-
-            for xi in x:
-                xi = re.split("\[|:|,|\]", xi)
-                ts = datetime.datetime.fromtimestamp(float(xi[4]))
-
-                row = [ts]
-
-                for i in range(5, 10):
-
-                    # skip converting volume data if does not exists
-                    if not volume_data and i == 9:
-                        row.append(0.0)
-                        continue
-                    try:
-                        row.append(float(xi[i]))
-
-                    except ValueError:
-                        volume_data = False
-                        row.append(0.0)
-                        logger.debug('no volume data')
-
-                data.append(row)
-
-            data = pd.DataFrame(
-                data, columns=["datetime", "open",
-                               "high", "low", "close", "volume"]
-            ).set_index("datetime")
-            data.insert(0, "symbol", value=symbol)
-            return data
-        except AttributeError:
+    def __split_frames(result):
+        """split a websocket payload into its ~m~<length>~m~ framed messages"""
+        return [frame for frame in re.split(r"~m~\d+~m~", result) if frame]
+
+    @staticmethod
+    def __create_df(bars, symbol):
+        timestamps, values = bars.received()
+        if len(timestamps) == 0:
             logger.error("no data, please check the exchange and symbol")
+            return None
+
+        index = pd.to_datetime(timestamps, unit="s", utc=True)
+        data = pd.DataFrame(
+            values,
+            index=index.tz_convert(tz.tzlocal()).tz_localize(None).rename("datetime"),
+            columns=["open", "high", "low", "close", "volume"],
+        )
+        data.insert(0, "symbol", value=symbol)
+        return data
 
     @staticmethod
     def __format_symbol(symbol, exchange, contract: int = None):
@@ -185,38 +208,10 @@ class TvDatafeed:
 
         return symbol
 
-    def get_hist(
-        self,
-        symbol: str,
-        exchange: str = "NSE",
-        interval: Interval = Interval.in_daily,
-        n_bars: int = 10,
-        fut_contract: int = None,
-        extended_session: bool = False,
-    ) -> pd.DataFrame:
-        """get historical data
-
-        Args:
-            symbol (str): symbol name
-            exchange (str, optional): exchange, not required if symbol is in format EXCHANGE:SYMBOL. Defaults to None.
-            interval (str, optional): chart interval. Defaults to 'D'.
-            n_bars (int, optional): no of bars to download, max 5000. Defaults to 10.
-            fut_contract (int, optional): None for cash, 1 for continuous current contract in front, 2 for continuous next contract in front . Defaults to None.
-            extended_session (bool, optional): regular session if False, extended session if True, Defaults to False.
-
-        Returns:
-            pd.Dataframe: dataframe with sohlcv as columns
-        """
-        symbol = self.__format_symbol(
-            symbol=symbol, exchange=exchange, contract=fut_contract
-        )
-
-        interval = interval.value
-
+    def __open_session(self):
         self.__create_connection()
 
         self.__send_message("set_auth_token", [self.token])
-        self.__send_message("chart_create_session", [self.chart_session, ""])
         self.__send_message("quote_create_session", [self.session])
         self.__send_message(
             "quote_set_fields",
@@ -248,6 +243,18 @@ class TvDatafeed:
             ],
         )
 
+    def __close_session(self):
+        try:
+            self.ws.close()
+        except Exception as e:
+            logger.debug(e)
+        self.ws = None
+
+    def __request_series(self, symbol, interval, n_bars, extended_session):
+        """request bars of a symbol on the open websocket and parse them while they arrive"""
+        chart_session = self.__generate_chart_session()
+
+        self.__send_message("chart_create_session", [chart_session, ""])
         self.__send_message(
             "quote_add_symbols", [self.session, symbol,
                                   {"flags": ["force_permission"]}]
@@ -257,7 +264,7 @@ class TvDatafeed:
         self.__send_message(
             "resolve_symbol",
             [
-                self.chart_session,
+                chart_session,
                 "symbol_1",
                 '={"symbol":"'
                 + symbol
@@ -268,26 +275,114 @@ class TvDatafeed:
         )
         self.__send_message(
             "create_series",
-            [self.chart_session, "s1", "s1", "symbol_1", interval, n_bars],
+            [chart_session, "s1", "s1", "symbol_1", interval, n_bars],
         )
         self.__send_message("switch_timezone", [
-                            self.chart_session, "exchange"])
+                            chart_session, "exchange"])
 
-        raw_data = ""
+        bars = SeriesBuffer(n_bars)
 
         logger.debug(f"getting data for {symbol}...")
-        while True:
+        completed = False
+        while not completed:
             try:
                 result = self.ws.recv()
-                raw_data = raw_data + result + "\n"
             except Exception as e:
                 logger.error(e)
                 break
 
-            if "series_completed" in result:
-                break
+            for frame in self.__split_frames(result):
+                if frame.startswith("~h~"):
+                    # heartbeat, echo it to keep the connection alive
+                    self.ws.send(self.__prepend_header(frame))
+                    continue
+                try:
+                    message = json.loads(frame)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict) or (message.get("p") or [None])[0] != chart_session:
+                    continue
+                if message.get("m") == "timescale_update":
+                    bars.add(message["p"][1].get("s1", {}).get("s", []))
+                elif message.get("m") == "series_completed":
+                    completed = True
+                elif message.get("m") in ("symbol_error", "series_error", "critical_error"):
+                    logger.error(f"{message['m']} for {symbol}")
+                    completed = True
+
+        self.__send_message("quote_remove_symbols", [self.session, symbol])
+        self.__send_message("chart_delete_session", [chart_session])
+
+        return self.__create_df(bars, symbol)
+
+    def get_hist(
+        self,
+        symbol: str,
+        exchange: str = "NSE",
+        interval: Interval = Interval.in_daily,
+        n_bars: int = 10,
+        fut_contract: int = None,
+        extended_session: bool = False,
+    ) -> pd.DataFrame:
+        """get historical data
+
+        Args:
+            symbol (str): symbol name
+            exchange (str, optional): exchange, not required if symbol is in format EXCHANGE:SYMBOL. Defaults to None.
+            interval (str, optional): chart interval. Defaults to 'D'.
+            n_bars (int, optional): no of bars to download, max 5000. Defaults to 10.
+            fut_contract (int, optional): None for cash, 1 for continuous current contract in front, 2 for continuous next contract in front . Defaults to None.
+            extended_session (bool, optional): regular session if False, extended session if True, Defaults to False.
+
+        Returns:
+            pd.Dataframe: dataframe with sohlcv as columns
+        """
+        return self.get_hist_many(
+            [symbol],
+            exchange=exchange,
+            interval=interval,
+            n_bars=n_bars,
+            fut_contract=fut_contract,
+            extended_session=extended_session,
+        )[symbol]
+
+    def get_hist_many(
+        self,
+        symbols: list,
+        exchange: str = "NSE",
+        interval: Interval = Interval.in_daily,
+        n_bars: int = 10,
+        fut_contract: int = None,
+        extended_session: bool = False,
+    ) -> dict:
+        """get historical data of several symbols over a single authenticated websocket
 
-        return self.__create_df(raw_data, symbol)
+        Args:
+            symbols (list): symbol names
+            exchange (str, optional): exchange, not required if symbols are in format EXCHANGE:SYMBOL. Defaults to None.
+            interval (str, optional): chart interval. Defaults to 'D'.
+            n_bars (int, optional): no of bars to download per symbol, max 5000. Defaults to 10.
+            fut_contract (int, optional): None for cash, 1 for continuous current contract in front, 2 for continuous next contract in front . Defaults to None.
+            extended_session (bool, optional): regular session if False, extended session if True, Defaults to False.
+
+        Returns:
+            dict: mapping of each given symbol to its dataframe with sohlcv as columns, or None if no data
+        """
+        interval = interval.value
+
+        self.__open_session()
+        try:
+            return {
+                symbol: self.__request_series(
+                    self.__format_symbol(symbol=symbol, exchange=exchange, contract=fut_contract),
+                    interval,
+                    n_bars,
+                    extended_session,
+                )
+                for symbol in symbols
+            }
+        finally:
+            self.__close_session()
 
     def search_symbol(self, text: str, exchange: str = ''):
         url = self.__search_url.format(text, exchange)